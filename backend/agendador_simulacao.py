@@ -0,0 +1,189 @@
+import os
+import uuid
+import time
+import math
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# NumPy e o simulador (eleicoesalternativo) só são importados na primeira
+# simulação, para não pesar na partida do backend
+from metricas import Histograma, LIMITES_LONGOS
+
+logger = logging.getLogger(__name__)
+
+
+class FilaSimulacaoCheia(Exception):
+    """Já existem simulações demais em andamento."""
+
+
+def simular_bloco(populacoes, num_partidos, semente):
+    """Executado nos processos do pool: devolve só a matriz de votos do bloco."""
+    import numpy as np
+    from eleicoesalternativo import eleicao
+    return eleicao.simular_cidades(populacoes, num_partidos, np.random.default_rng(semente))
+
+
+class TrabalhoSimulacao:
+    def __init__(self, num_cidades, partidos, populacao_total, semente):
+        self.id = uuid.uuid4().hex[:12]
+        self.num_cidades = num_cidades
+        self.partidos = partidos
+        self.populacao_total = populacao_total
+        self.semente = semente
+        self.status = "na_fila"
+        self.blocos_total = 0
+        self.blocos_concluidos = 0
+        self.cidades_enviadas = 0
+        self.erro = None
+        self.criado_em = time.time()
+        self.iniciado_em = None
+        self.concluido_em = None
+
+    def como_dict(self):
+        fim = self.concluido_em or time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "num_cidades": self.num_cidades,
+            "populacao_total": self.populacao_total,
+            "blocos_total": self.blocos_total,
+            "blocos_concluidos": self.blocos_concluidos,
+            "cidades_enviadas": self.cidades_enviadas,
+            "progresso": round(self.blocos_concluidos / self.blocos_total * 100, 2) if self.blocos_total else 0,
+            "duracao": round(fim - self.iniciado_em, 3) if self.iniciado_em else None,
+            "erro": self.erro
+        }
+
+
+class AgendadorSimulacao:
+    """
+    Executa simulações em um pool de processos limitado.
+
+    Cada simulação é dividida em blocos de cidades; os blocos rodam em paralelo
+    nos processos e, à medida que ficam prontos, são formatados e entregues ao
+    consumidor (o processador de lotes) sem esperar o resultado completo.
+    """
+
+    def __init__(self, processos=None, max_trabalhos=4, tamanho_bloco=5000, historico=100, max_cidades=100_000):
+        """
+        Args:
+            processos (int): Processos do pool (padrão: núcleos - 1, deixando um para o waitress)
+            max_trabalhos (int): Simulações simultâneas aceitas antes de recusar novas
+            tamanho_bloco (int): Cidades por bloco enviado a um processo
+            historico (int): Quantos trabalhos concluídos manter para consulta
+            max_cidades (int): Cidades aceitas em uma simulação; as populações ficam todas em memória
+        """
+        self.processos = processos or max(1, (os.cpu_count() or 2) - 1)
+        self.max_trabalhos = max_trabalhos
+        self.max_cidades = max_cidades
+        self.tamanho_bloco = tamanho_bloco
+        self.historico = historico
+        self.trabalhos = OrderedDict()
+        # Duração das simulações terminadas, por status final
+        self.duracoes = {"concluido": Histograma(LIMITES_LONGOS), "falhou": Histograma(LIMITES_LONGOS)}
+        self.lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self):
+        with self.lock:
+            if self._executor is None:
+                # O pool nasce com o servidor já rodando (publicador, WAL, logs...): 'fork'
+                # copiaria locks presos por essas threads. 'forkserver' e 'spawn' partem de
+                # um interpretador limpo e só precisam importar este módulo (`simular_bloco`)
+                # e o __main__, e o app.py só cria os componentes em `criar_app`.
+                metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processos,
+                    mp_context=multiprocessing.get_context(metodo)
+                )
+            return self._executor
+
+    def ativos(self):
+        return sum(1 for t in self.trabalhos.values() if t.status in ("na_fila", "executando"))
+
+    def submeter(self, num_cidades, partidos, populacao_total, consumidor, semente=None):
+        """
+        Agenda uma simulação e devolve o trabalho criado.
+
+        Args:
+            consumidor: Função chamada com a lista de resultados de cada bloco pronto
+
+        Raises:
+            ValueError: Se `num_cidades` estiver fora de 1..`max_cidades`
+            FilaSimulacaoCheia: Se já houver `max_trabalhos` simulações em andamento
+        """
+        if not 0 < num_cidades <= self.max_cidades:
+            raise ValueError(f"num_cidades deve estar entre 1 e {self.max_cidades}")
+        trabalho = TrabalhoSimulacao(num_cidades, partidos, populacao_total, semente)
+        with self.lock:
+            if self.ativos() >= self.max_trabalhos:
+                raise FilaSimulacaoCheia(f"Limite de {self.max_trabalhos} simulações simultâneas atingido")
+            self.trabalhos[trabalho.id] = trabalho
+            self._limpar_historico()
+        threading.Thread(target=self._executar, args=(trabalho, consumidor), daemon=True).start()
+        return trabalho
+
+    def consultar(self, job_id):
+        return self.trabalhos.get(job_id)
+
+    def _limpar_historico(self):
+        concluidos = [i for i, t in self.trabalhos.items() if t.status in ("concluido", "falhou")]
+        for job_id in concluidos[:max(0, len(concluidos) - self.historico)]:
+            del self.trabalhos[job_id]
+
+    def _executar(self, trabalho, consumidor):
+        trabalho.status = "executando"
+        trabalho.iniciado_em = time.time()
+        try:
+            import numpy as np
+            from eleicoesalternativo import eleicao
+            raiz = np.random.SeedSequence(trabalho.semente)
+            rng = np.random.default_rng(raiz)
+            populacoes = eleicao.dividir_populacao_vetorizada(trabalho.populacao_total, trabalho.num_cidades, rng)
+
+            num_blocos = math.ceil(trabalho.num_cidades / self.tamanho_bloco)
+            trabalho.blocos_total = num_blocos
+            pool = self._pool()
+            futuros = {}
+            for indice, semente in enumerate(raiz.spawn(num_blocos)):
+                inicio = indice * self.tamanho_bloco
+                bloco = populacoes[inicio:inicio + self.tamanho_bloco]
+                futuro = pool.submit(simular_bloco, bloco, len(trabalho.partidos), semente)
+                futuros[futuro] = inicio
+
+            for futuro in as_completed(futuros):
+                inicio = futuros[futuro]
+                votos = futuro.result()
+                nomes = [f"Cidade {i+1}" for i in range(inicio, inicio + len(votos))]
+                resultados = eleicao.formatar_resultados(
+                    nomes, populacoes[inicio:inicio + len(votos)], votos, trabalho.partidos
+                )
+                consumidor(resultados)
+                trabalho.blocos_concluidos += 1
+                trabalho.cidades_enviadas += len(resultados)
+
+            trabalho.status = "concluido"
+            logger.info("[SIMULAÇÃO] Trabalho %s concluído: %s cidades em %.2fs.",
+                        trabalho.id, trabalho.num_cidades, time.time() - trabalho.iniciado_em)
+        except Exception as e:
+            trabalho.status = "falhou"
+            trabalho.erro = str(e)
+            logger.error("[SIMULAÇÃO] Erro no trabalho %s: %s", trabalho.id, e)
+        finally:
+            trabalho.concluido_em = time.time()
+            with self.lock:
+                self.duracoes[trabalho.status].observar(trabalho.concluido_em - trabalho.iniciado_em)
+
+    def histogramas_duracao(self):
+        """Cópia dos histogramas de duração, por status final."""
+        with self.lock:
+            return {status: h.copia() for status, h in self.duracoes.items()}
+
+    def desligar(self):
+        with self.lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
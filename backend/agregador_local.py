@@ -0,0 +1,349 @@
+import os
+import json
+import time
+import heapq
+import logging
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+
+from metricas import Histograma
+
+logger = logging.getLogger(__name__)
+
+
+class Mediana:
+    """
+    Mediana exata em fluxo com dois heaps: um de máximo com a metade de baixo
+    e um de mínimo com a de cima.
+
+    Os heaps guardam valores distintos e `contagens` a multiplicidade de cada
+    um, então um valor repetido (o voto de valor 1) custa O(1) e a memória é
+    proporcional aos valores distintos, não às observações. O equilíbrio é
+    por peso: o topo da metade de baixo é sempre a mediana inferior.
+    """
+    __slots__ = ('baixos', 'altos', 'contagens', 'peso_baixos', 'peso_altos')
+
+    def __init__(self):
+        self.baixos = []  # heap de máximo (valores negados)
+        self.altos = []
+        self.contagens = {}
+        self.peso_baixos = 0
+        self.peso_altos = 0
+
+    def adicionar(self, valor, vezes=1):
+        if valor in self.contagens:
+            self.contagens[valor] += vezes
+            if valor <= -self.baixos[0]:
+                self.peso_baixos += vezes
+            else:
+                self.peso_altos += vezes
+        else:
+            self.contagens[valor] = vezes
+            if not self.baixos or valor <= -self.baixos[0]:
+                heapq.heappush(self.baixos, -valor)
+                self.peso_baixos += vezes
+            else:
+                heapq.heappush(self.altos, valor)
+                self.peso_altos += vezes
+        self._equilibrar()
+
+    def _equilibrar(self):
+        # Posição (a partir de 1) da mediana inferior
+        alvo = (self.peso_baixos + self.peso_altos + 1) // 2
+        while self.peso_baixos - self.contagens[-self.baixos[0]] >= alvo:
+            valor = -heapq.heappop(self.baixos)
+            heapq.heappush(self.altos, valor)
+            self.peso_baixos -= self.contagens[valor]
+            self.peso_altos += self.contagens[valor]
+        while self.peso_baixos < alvo:
+            valor = heapq.heappop(self.altos)
+            heapq.heappush(self.baixos, -valor)
+            self.peso_baixos += self.contagens[valor]
+            self.peso_altos -= self.contagens[valor]
+
+    def valor(self):
+        total = self.peso_baixos + self.peso_altos
+        if total == 0:
+            return 0
+        inferior = -self.baixos[0]
+        if total % 2 or self.peso_baixos > total // 2:
+            return inferior
+        return (inferior + self.altos[0]) / 2
+
+    def distintos(self):
+        return len(self.contagens)
+
+
+class EstatisticaObjeto:
+    """Somatório, contagem e mediana dos valores de um objectIdentifier."""
+    __slots__ = ('soma', 'contagem', 'mediana')
+
+    def __init__(self):
+        self.soma = 0
+        self.contagem = 0
+        self.mediana = Mediana()
+
+    def adicionar(self, valor, vezes=1):
+        self.soma += valor * vezes
+        self.contagem += vezes
+        self.mediana.adicionar(valor, vezes)
+
+
+class AgregadorLocal:
+    """
+    Agregador dentro do backend, com as mesmas estatísticas do Aggregator Node
+    (somatório, média, mediana, contagem e porcentagem por `type` e
+    `objectIdentifier`) e a mesma resposta de /api/aggregator/results.
+
+    Consome lotes no formato de `lotes_de_dados` e atualiza as estatísticas
+    por incremento: somatório e contagem são somas e a mediana vem de
+    `Mediana`, sem reordenar nada. Lotes repetidos (mesmo batchId) são
+    ignorados, como na tabela processed_batches do agregador.
+
+    O estado fica em memória e é gravado de tempos em tempos em
+    `agregador_local.json`; itens processados depois do último snapshot se
+    perdem se o processo cair. Serve para testes de carga e para rodar sem o
+    agregador remoto, não para substituí-lo em produção.
+    """
+
+    def __init__(self, diretorio, intervalo_snapshot=5.0, intervalo_notificacao=0.5, lotes_lembrados=10_000):
+        """
+        Args:
+            diretorio: Pasta onde fica o snapshot `agregador_local.json`
+            intervalo_snapshot (float): Segundos entre gravações do snapshot
+            intervalo_notificacao (float): Espera mínima (s) entre avisos de resultados novos aos ouvintes
+            lotes_lembrados (int): Quantos batchIds recentes guardar para descartar repetidos
+        """
+        self.caminho = os.path.join(diretorio, 'agregador_local.json')
+        self.intervalo_snapshot = intervalo_snapshot
+        self.intervalo_notificacao = intervalo_notificacao
+        self.lotes_lembrados = lotes_lembrados
+        self.tipos = {}
+        self.lotes_vistos = OrderedDict()
+        self.total_lotes = 0
+        self.total_itens = 0
+        self.lotes_repetidos = 0
+        self.versao = 0
+        self.ouvintes = []
+        self.condicao = threading.Condition()
+        self._gravado = None
+        self._parar = threading.Event()
+
+        os.makedirs(diretorio, exist_ok=True)
+        self._recuperar()
+        threading.Thread(target=self._gravar_periodicamente, name="agregador-local", daemon=True).start()
+        threading.Thread(target=self._notificar, name="agregador-local-avisos", daemon=True).start()
+
+    def _estatistica(self, tipo, objeto):
+        objetos = self.tipos.get(tipo)
+        if objetos is None:
+            objetos = self.tipos[tipo] = {}
+        estatistica = objetos.get(objeto)
+        if estatistica is None:
+            estatistica = objetos[objeto] = EstatisticaObjeto()
+        return estatistica
+
+    def _recuperar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                salvo = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error("Snapshot do agregador local ilegível em %s: %s. Começando do zero.", self.caminho, e)
+            return
+        for tipo, objetos in salvo.get("tipos", {}).items():
+            for objeto, valores in objetos.items():
+                estatistica = self._estatistica(tipo, objeto)
+                for valor, vezes in valores:
+                    estatistica.adicionar(valor, vezes)
+        self.total_lotes = salvo.get("total_lotes", 0)
+        self.total_itens = salvo.get("total_itens", 0)
+        for batch_id in salvo.get("lotes_recentes", []):
+            self.lotes_vistos[batch_id] = None
+        self._gravado = self.versao
+        logger.info("🧮 Agregador local carregado com %s itens de %s lotes.", self.total_itens, self.total_lotes)
+
+    # === Entrada ===
+
+    def processar_lote(self, pacote):
+        """
+        Agrega os dataPoints de um lote.
+
+        Returns:
+            bool: False se o lote já tinha sido processado
+        """
+        batch_id = pacote.get("batchId")
+        # Agrupa valores iguais antes de pegar o lock: um lote de votos vira poucas atualizações
+        grupos = Counter()
+        for item in pacote.get("dataPoints", []):
+            tipo, objeto, valor = item.get("type"), item.get("objectIdentifier"), item.get("valor", 1)
+            if tipo is None or objeto is None or isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                continue
+            grupos[(tipo, objeto, valor)] += 1
+        with self.condicao:
+            if batch_id is not None:
+                if batch_id in self.lotes_vistos:
+                    self.lotes_repetidos += 1
+                    return False
+                self.lotes_vistos[batch_id] = None
+                if len(self.lotes_vistos) > self.lotes_lembrados:
+                    self.lotes_vistos.popitem(last=False)
+            for (tipo, objeto, valor), vezes in grupos.items():
+                self._estatistica(tipo, objeto).adicionar(valor, vezes)
+            self.total_lotes += 1
+            self.total_itens += sum(grupos.values())
+            self.versao += 1
+            self.condicao.notify_all()
+        return True
+
+    # === Saída ===
+
+    def resultados(self):
+        """Mesma estrutura de GET /api/aggregator/results do Aggregator Node."""
+        with self.condicao:
+            dados_agregados = []
+            for tipo, objetos in self.tipos.items():
+                total = sum(e.soma for e in objetos.values())
+                dados_agregados.append({
+                    "type": tipo,
+                    "lista": [
+                        {
+                            "objectIdentifier": objeto,
+                            "somatorio": e.soma,
+                            "media": e.soma / e.contagem if e.contagem else 0,
+                            "mediana": e.mediana.valor(),
+                            "contagem": e.contagem,
+                            "porcentagem": round(e.soma / total * 100, 2) if total else 0
+                        }
+                        for objeto, e in objetos.items()
+                    ]
+                })
+            return {
+                "dadosAgregados": dados_agregados,
+                "totalLotesProcessadosGlobal": self.total_lotes,
+                "totalItensDeDadosProcessadosGlobal": self.total_itens
+            }
+
+    def adicionar_ouvinte(self, ouvinte):
+        """Registra uma função sem argumentos chamada (no máximo a cada `intervalo_notificacao`) quando há lotes novos."""
+        self.ouvintes.append(ouvinte)
+
+    def _notificar(self):
+        avisada = self.versao
+        while not self._parar.is_set():
+            with self.condicao:
+                while self.versao == avisada and not self._parar.is_set():
+                    self.condicao.wait(1.0)
+                avisada = self.versao
+            for ouvinte in self.ouvintes:
+                try:
+                    ouvinte()
+                except Exception as e:
+                    logger.error("Erro ao avisar resultados do agregador local: %s", e)
+            self._parar.wait(self.intervalo_notificacao)
+
+    # === Snapshot ===
+
+    def gravar(self):
+        with self.condicao:
+            if self._gravado == self.versao:
+                return
+            versao = self.versao
+            salvo = {
+                "tipos": {
+                    tipo: {objeto: list(e.mediana.contagens.items()) for objeto, e in objetos.items()}
+                    for tipo, objetos in self.tipos.items()
+                },
+                "total_lotes": self.total_lotes,
+                "total_itens": self.total_itens,
+                "lotes_recentes": list(self.lotes_vistos)
+            }
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(salvo, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho)
+        self._gravado = versao
+
+    def _gravar_periodicamente(self):
+        while not self._parar.wait(self.intervalo_snapshot):
+            try:
+                self.gravar()
+            except OSError as e:
+                logger.error("💥 Falha ao gravar snapshot do agregador local: %s", e)
+
+    def parar(self):
+        self._parar.set()
+        with self.condicao:
+            self.condicao.notify_all()
+        try:
+            self.gravar()
+        except OSError as e:
+            logger.error("💥 Falha ao gravar snapshot do agregador local: %s", e)
+
+    def metricas(self):
+        with self.condicao:
+            return {
+                "tipos": len(self.tipos),
+                "objetos": sum(len(objetos) for objetos in self.tipos.values()),
+                "valores_distintos": sum(e.mediana.distintos() for objetos in self.tipos.values()
+                                         for e in objetos.values()),
+                "lotes": self.total_lotes,
+                "itens": self.total_itens,
+                "lotes_repetidos": self.lotes_repetidos
+            }
+
+
+class PublicadorLocal:
+    """
+    Substitui o FilaRabbit quando não há RabbitMQ: entrega cada lote direto ao
+    AgregadorLocal e confirma na hora. Tem a mesma interface usada pelo
+    EnviadorLote, pelo spool e pelas métricas.
+    """
+
+    def __init__(self, agregador):
+        self.agregador = agregador
+        self.confirmados = 0
+        self.rejeitados = 0
+        self.falhas = 0
+        self.latencia_confirmacao = Histograma()
+        self.lock = threading.Lock()
+
+    def publicar(self, pacote):
+        inicio = time.monotonic()
+        self.agregador.processar_lote(pacote)
+        with self.lock:
+            self.confirmados += 1
+            self.latencia_confirmacao.observar(time.monotonic() - inicio)
+        futuro = Future()
+        futuro.set_result(True)
+        return futuro
+
+    def mandar(self, pacote, timeout=30):
+        return self.publicar(pacote).result()
+
+    @property
+    def conectado(self):
+        return True
+
+    @property
+    def iniciando(self):
+        return False
+
+    def estado(self):
+        return {
+            "conectado": True,
+            "modo": "local",
+            "iniciando": False,
+            "pendentes": 0,
+            "em_voo": 0,
+            "confirmados": self.confirmados,
+            "rejeitados": self.rejeitados,
+            "falhas": self.falhas
+        }
+
+    def fechar(self):
+        pass
@@ -1,20 +1,37 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request
+from werkzeug.middleware.proxy_fix import ProxyFix
 import waitress
-import requests
-import threading
-from eleicoesalternativo import eleicao
+from registro_votantes import RegistroVotantes
+from agendador_simulacao import AgendadorSimulacao, FilaSimulacaoCheia
+from fila_rabbit import FilaRabbit
+from codec_lote import CodecLote
+from cache_resultados import CacheResultados, criar_snapshot
+from transmissao_resultados import TransmissorResultados, LimiteConexoesAtingido
+from tickets_stream import EmissorTickets
+from assinante_agregador import AssinanteAgregador
+from enviador_lote import EnviadorLote
+from log_antecipado import LogAntecipado
+from spool_reenvio import SpoolReenvio
+from controle_admissao import ControleAdmissao, AdmissaoRecusada
+from apuracao_local import ApuracaoLocal
+from registro_candidatos import RegistroCandidatos, ELEICAO_PADRAO
+from cliente_agregador import ClienteAgregador, FECHADO
+from agregador_local import AgregadorLocal, PublicadorLocal
+from sonda_saude import SondaSaude
+from logs_estruturados import SaidaLogs
+from metricas import (RegistroMetricas, CONTENT_TYPE as CONTENT_TYPE_METRICAS, LIMITES_RAPIDOS,
+                      TIPO_CONTADOR, TIPO_MEDIDOR, TIPO_HISTOGRAMA)
 from datetime import datetime, timedelta
+from collections import Counter
 import logging
 import json
-import sys
-import uuid
-import pika
 import os
-import ssl
 import atexit
+import shutil
 import time
+import threading
 from config import ADMIN_USERNAME, ADMIN_PASSWORD, JWT_SECRET_KEY, JWT_ACCESS_TOKEN_EXPIRES
 
 app = Flask(__name__)
@@ -26,13 +43,44 @@ app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=JWT_ACCESS_TOKEN_EXPI
 jwt = JWTManager(app)
 
 # Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# 'texto' (padrão) ou 'json' (um objeto por linha, para coletores de log)
+LOG_FORMATO = os.getenv('LOG_FORMATO', 'texto')
+LOG_NIVEL = os.getenv('LOG_NIVEL', 'INFO')
+# Formata e escreve no stdout numa thread de fundo, fora da thread da requisição
+LOG_ASSINCRONO = os.getenv('LOG_ASSINCRONO', 'true').lower() == 'true'
+# Mensagens por segundo de uma mesma categoria (mesmo texto-modelo); 0 desliga o limite.
+# ERROR e CRITICAL nunca são limitados
+LOG_TAXA_CATEGORIA = float(os.getenv('LOG_TAXA_CATEGORIA', 10))
+LOG_RAJADA_CATEGORIA = int(os.getenv('LOG_RAJADA_CATEGORIA', 20))
+LOG_TAMANHO_FILA = int(os.getenv('LOG_TAMANHO_FILA', 10000))
+# 'false' deixa cada log mais barato sem procurar arquivo/linha da chamada, para todo o processo
+LOG_LOCALIZAR_CHAMADA = os.getenv('LOG_LOCALIZAR_CHAMADA', 'true').lower() == 'true'
 logger = logging.getLogger(__name__)
 
+# === MÉTRICAS (formato Prometheus, em /metrics) ===
+# No caminho das requisições só há incrementos; o resto é lido dos componentes na coleta
+registro_metricas = RegistroMetricas(prefixo='votacao_')
+duracao_requisicoes = registro_metricas.histograma(
+    "http_requisicao_duracao_segundos", "Tempo até a resposta, por rota", ("rota", "metodo", "status"))
+votos_processados = registro_metricas.contador("votos_total", "Votos recebidos, por resultado", ("resultado",))
+duracao_verificacao_cpf = registro_metricas.histograma(
+    "verificacao_cpf_duracao_segundos", "Tempo da consulta e do registro do CPF", ("etapa",), LIMITES_RAPIDOS)
+# Resultado em votos_total para cada status de processar_voto
+RESULTADO_VOTO = {200: "aceito", 403: "cpf_duplicado"}
+
+@app.before_request
+def marcar_inicio_requisicao():
+    g.inicio_requisicao = time.perf_counter()
+
+@app.after_request
+def medir_requisicao(resposta):
+    inicio = g.get('inicio_requisicao')
+    if inicio is not None:
+        # A regra (/electionalternative/<job_id>) e não a URL, para não criar uma série por job
+        rota = request.url_rule.rule if request.url_rule is not None else "nao_encontrada"
+        duracao_requisicoes.observar(time.perf_counter() - inicio, rota, request.method, resposta.status_code)
+    return resposta
+
 # === CONFIGURAÇÕES MODULARES DO RABBITMQ ===
 RABBITMQ_HOST = os.getenv('RABBITMQ_HOST', 'chimpanzee.rmq.cloudamqp.com')
 RABBITMQ_PORT = int(os.getenv('RABBITMQ_PORT', 5671))
@@ -40,279 +88,185 @@ RABBITMQ_USERNAME = os.getenv('RABBITMQ_USERNAME', 'edxgujmk')
 RABBITMQ_PASSWORD = os.getenv('RABBITMQ_PASSWORD', 'Wm1vy2ea99LIfZh-ZZyl3DhWlLDlNcdH')
 RABBITMQ_QUEUE = os.getenv('RABBITMQ_QUEUE', 'lotes_de_dados')
 RABBITMQ_VIRTUAL_HOST = os.getenv('RABBITMQ_VIRTUAL_HOST', 'edxgujmk')  # importante!
+RABBITMQ_SSL = os.getenv('RABBITMQ_SSL', str(RABBITMQ_PORT == 5671)).lower() == 'true'
+RABBITMQ_MAX_EM_VOO = int(os.getenv('RABBITMQ_MAX_EM_VOO', 256))
+RABBITMQ_MAX_PENDENTES = int(os.getenv('RABBITMQ_MAX_PENDENTES', 1000))
+# 'json' (padrão, entendido por qualquer consumidor) ou 'colunar' (binário comprimido, ver codec_lote.py)
+RABBITMQ_FORMATO = os.getenv('RABBITMQ_FORMATO', 'json')
+RABBITMQ_COMPRESSAO = os.getenv('RABBITMQ_COMPRESSAO', 'zstd')
 
 
 CORE_URL = os.getenv('CORE_URL', 'https://agregador-node.onrender.com')
 AGGREGATOR_URL = CORE_URL
-
-logger.info(f"=== CONFIGURAÇÕES CARREGADAS ===")
-logger.info(f"RABBITMQ_HOST: {RABBITMQ_HOST}")
-logger.info(f"RABBITMQ_PORT: {RABBITMQ_PORT}")
-logger.info(f"RABBITMQ_USERNAME: {RABBITMQ_USERNAME}")
-logger.info(f"RABBITMQ_QUEUE: {RABBITMQ_QUEUE}")
-logger.info(f"CORE_URL: {CORE_URL}")
-logger.info(f"AGGREGATOR_URL: {AGGREGATOR_URL}")
-logger.info(f"===============================")
+AGREGADOR_TIMEOUT_CONEXAO = float(os.getenv('AGREGADOR_TIMEOUT_CONEXAO', 3.0))
+AGREGADOR_TIMEOUT_LEITURA = float(os.getenv('AGREGADOR_TIMEOUT_LEITURA', 10.0))
+AGREGADOR_TAMANHO_POOL = int(os.getenv('AGREGADOR_TAMANHO_POOL', 10))
+AGREGADOR_MAX_RETENTATIVAS = int(os.getenv('AGREGADOR_MAX_RETENTATIVAS', 2))
+AGREGADOR_FALHAS_PARA_ABRIR = int(os.getenv('AGREGADOR_FALHAS_PARA_ABRIR', 5))
+AGREGADOR_TEMPO_ABERTO = float(os.getenv('AGREGADOR_TEMPO_ABERTO', 30.0))
+# 'remoto' (padrão): resultados do Aggregator Node em CORE_URL; 'local': agregador dentro do backend
+AGREGADOR_MODO = os.getenv('AGREGADOR_MODO', 'remoto')
+# No modo local, 'true' continua publicando no RabbitMQ e agrega só os lotes que o broker confirmou
+AGREGADOR_LOCAL_RABBITMQ = os.getenv('AGREGADOR_LOCAL_RABBITMQ', 'false').lower() == 'true'
+AGREGADOR_LOCAL_INTERVALO_SNAPSHOT = float(os.getenv('AGREGADOR_LOCAL_INTERVALO_SNAPSHOT', 5.0))
+AGREGADOR_LOCAL_INTERVALO_AVISO = float(os.getenv('AGREGADOR_LOCAL_INTERVALO_AVISO', 0.5))
+# Verificações de saúde em segundo plano (os endpoints /health* só leem o resultado)
+SAUDE_INTERVALO_LOCAL = float(os.getenv('SAUDE_INTERVALO_LOCAL', 5.0))
+SAUDE_INTERVALO_AGREGADOR = float(os.getenv('SAUDE_INTERVALO_AGREGADOR', 30.0))
+SAUDE_TIMEOUT_AGREGADOR = float(os.getenv('SAUDE_TIMEOUT_AGREGADOR', 5.0))
+SAUDE_DISCO_MIN_MB = int(os.getenv('SAUDE_DISCO_MIN_MB', 100))
+# Sem RabbitMQ os votos continuam aceitos (WAL + spool); 'true' tira a instância de "pronta" mesmo assim
+SAUDE_RABBITMQ_CRITICO = os.getenv('SAUDE_RABBITMQ_CRITICO', 'false').lower() == 'true'
 
 CACHE_DURACAO = 30
-CANDIDATOS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'candidatos.json')
+CACHE_DURACAO_NEGATIVO = int(os.getenv('CACHE_DURACAO_NEGATIVO', 5))
+CACHE_MAX_OBSOLETO = int(os.getenv('CACHE_MAX_OBSOLETO', 300))
+# Busca periódica dos resultados em segundo plano (0 desliga e volta à busca sob demanda)
+RESULTADOS_INTERVALO_POLLER = float(os.getenv('RESULTADOS_INTERVALO_POLLER', 5))
+# Conexões SSE em /resultados/stream: cada uma ocupa uma thread do waitress enquanto aberta.
+# O waitress sobe com WAITRESS_THREADS + SSE_MAX_CONEXOES threads: com o SSE no limite ainda
+# sobram WAITRESS_THREADS para as outras rotas. Para muitos espectadores, use o modo ASGI
+SSE_MAX_CONEXOES = int(os.getenv('SSE_MAX_CONEXOES', 32))
+SSE_DURACAO_MAX = int(os.getenv('SSE_DURACAO_MAX', 300))
+# Validade (s) do ticket de uso único que abre /resultados/stream no lugar do JWT na URL
+SSE_TICKET_VALIDADE = float(os.getenv('SSE_TICKET_VALIDADE', 30))
+WAITRESS_THREADS = int(os.getenv('WAITRESS_THREADS', 64))
+# Aviso de atualização do agregador (STOMP em /ws); precisa do pacote opcional websocket-client
+AGREGADOR_WS_ATIVO = os.getenv('AGREGADOR_WS_ATIVO', 'true').lower() == 'true'
+AGREGADOR_WS_URL = os.getenv('AGREGADOR_WS_URL', CORE_URL.replace('https://', 'wss://').replace('http://', 'ws://') + '/ws/websocket')
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+CANDIDATOS_PATH = os.path.join(DATA_DIR, 'candidatos.json')
+CANDIDATOS_INTERVALO_VERIFICACAO = float(os.getenv('CANDIDATOS_INTERVALO_VERIFICACAO', 2.0))
 MAX_BATCH = 30
 INTERVALO_ENVIO = 20
-PENDENTES_PATH = os.path.join(os.path.dirname(__file__), 'data', 'lotes_pendentes.json')
-ARQUIVO_LOCK = threading.Lock()
-INTERVALO_REENVIO = 60
-
-class FilaRabbit:
-    def __init__(self):
-        self.conn = None
-        self.ch = None
-        self._conectar()
-
-    def _conectar(self):
-        if self.conn and self.conn.is_open:
-            return
-        try:
-            logger.info("🔌 Conectando ao RabbitMQ...")
-            cred = pika.PlainCredentials(RABBITMQ_USERNAME, RABBITMQ_PASSWORD)
-            ssl_ctx = ssl.create_default_context()
-            params = pika.ConnectionParameters(
-                host=RABBITMQ_HOST,
-                port=RABBITMQ_PORT,
-                virtual_host=RABBITMQ_VIRTUAL_HOST,
-                credentials=cred,
-                ssl_options=pika.SSLOptions(ssl_ctx),
-                heartbeat=300,
-                blocked_connection_timeout=150
-            )
-            self.conn = pika.BlockingConnection(params)
-            self.ch = self.conn.channel()
-            self.ch.queue_declare(queue=RABBITMQ_QUEUE, durable=True)
-            logger.info("✅ Conectado com sucesso!")
-        except Exception as e:
-            logger.error(f"💥 Erro na conexão: {e}")
-            self.conn = None
-            self.ch = None
-
-    def _checar_conexao(self):
-        if not self.conn or not self.conn.is_open or not self.ch or not self.ch.is_open:
-            logger.warning("⚠️ Conexão perdida. Tentando reconectar...")
-            self._conectar()
-
-    def mandar(self, pacote):
-        self._checar_conexao()
-        if not self.ch:
-            logger.error("❌ Canal indisponível. Mensagem não enviada.")
-            return False
-        try:
-            corpo = json.dumps(pacote)
-            self.ch.basic_publish(
-                exchange='',
-                routing_key=RABBITMQ_QUEUE,
-                body=corpo,
-                properties=pika.BasicProperties(delivery_mode=2)
-            )
-            logger.info(f"📨 Lote enviado: {pacote['batchId']}")
-            return True
-        except Exception as e:
-            logger.error(f"❌ Erro no envio: {e}")
-            self.conn = None
-            self.ch = None
-            return False
-
-    def fechar(self):
-        if self.conn and self.conn.is_open:
-            logger.info("Encerrando conexão com RabbitMQ...")
-            self.conn.close()
-
-class EnviadorLote:
-    def __init__(self, fila, tamanho_max, intervalo):
-        self.fila = fila
-        self.tamanho_max = tamanho_max
-        self.intervalo = intervalo
-        self.buffer = []
-        self.lock = threading.RLock()
-        self.timer = None
-        self._agendar()
-
-    def _agendar(self):
-        self.timer = threading.Timer(self.intervalo, self.enviar)
-        self.timer.daemon = True
-        self.timer.start()
-
-    def adicionar(self, item):
-        with self.lock:
-            self.buffer.append(item)
-            if len(self.buffer) >= self.tamanho_max:
-                logger.info(f"🔄 Lote cheio ({self.tamanho_max}). Enviando...")
-                self.enviar(por_tamanho=True)
-
-    def enviar(self, por_tamanho=False):
-        with self.lock:
-            if self.timer:
-                self.timer.cancel()
-            if not self.buffer:
-                self._agendar()
-                return
-            dados = list(self.buffer)
-            self.buffer.clear()
-            self._agendar()
-
-        pacote = {
-            "batchId": f"BATCH_{uuid.uuid4().hex[:12]}",
-            "sourceNodeId": "GRUPO_1",
-            "dataPoints": dados
-        }
-
-        origem = "tamanho" if por_tamanho else "tempo"
-        if self.fila.mandar(pacote):
-            logger.info(f"📤 {len(dados)} itens enviados ({origem})")
-        else:
-            logger.error(f"❌ Falha no envio. {len(dados)} itens serão persistidos.")
-            self.persistir_lote(pacote)
-
-    def persistir_lote(self, pacote):
-        with ARQUIVO_LOCK:
-            try:
-                with open(PENDENTES_PATH, 'a') as f:
-                    f.write(json.dumps(pacote) + '\n')
-                logger.info(f"💾 Lote {pacote['batchId']} salvo para reenvio futuro.")
-            except Exception as e:
-                logger.error(f"CRÍTICO: Não foi possível persistir o lote no disco: {e}")
-
-    def desligar(self):
-        logger.info("Finalizando EnviadorLote. Enviando o restante...")
-        with self.lock:
-            if self.timer:
-                self.timer.cancel()
-            if self.buffer:
-                pacote = {
-                    "batchId": f"SHUTDOWN_{uuid.uuid4().hex[:12]}",
-                    "sourceNodeId": "GRUPO_1",
-                    "dataPoints": list(self.buffer)
-                }
-                if self.fila.mandar(pacote):
-                    logger.info(f"📤 Lote final com {len(self.buffer)} itens enviado.")
-                else:
-                    logger.error(f"❌ Falha no envio do lote final. {len(self.buffer)} itens serão persistidos.")
-                    self.persistir_lote(pacote)
-
-class Reenviador:
-    def __init__(self, fila, caminho_arquivo, lock, intervalo):
-        self.fila = fila
-        self.caminho_arquivo = caminho_arquivo
-        self.lock = lock
-        self.intervalo = intervalo
-
-    def rodar(self):
-        logger.info(f"🔄 Reenviador ativo. Verificando pendências a cada {self.intervalo}s.")
-        while True:
-            time.sleep(self.intervalo)
-
-            try:
-                if not os.path.exists(self.caminho_arquivo):
-                    continue
-                if os.path.getsize(self.caminho_arquivo) == 0:
-                    continue
-            except OSError as e:
-                logger.warning(f"⚠️ Erro ao acessar o arquivo de pendências: {e}")
-                continue
-
-            lotes = []
-            with self.lock:
-                try:
-                    with open(self.caminho_arquivo, 'r') as f:
-                        for linha in f:
-                            linha = linha.strip()
-                            if linha:
-                                lotes.append(json.loads(linha))
-                    # Limpa o arquivo depois de carregar os lotes
-                    open(self.caminho_arquivo, 'w').close()
-                except Exception as e:
-                    logger.error(f"💥 Falha ao ler ou limpar {self.caminho_arquivo}: {e}")
-                    continue
-
-            if not lotes:
-                continue
-
-            logger.info(f"🔁 Tentando reenviar {len(lotes)} lote(s)...")
-
-            falhas = []
-            for lote in lotes:
-                id_lote = lote.get('batchId', 'SEM_ID')
-                if not self.fila.mandar(lote):
-                    logger.warning(f"❌ Falha ao reenviar lote {id_lote}.")
-                    falhas.append(lote)
-                else:
-                    logger.info(f"📤 Lote {id_lote} reenviado com sucesso.")
-
-            if falhas:
-                with self.lock:
-                    try:
-                        with open(self.caminho_arquivo, 'a') as f:
-                            for lote in falhas:
-                                f.write(json.dumps(lote) + '\n')
-                        logger.warning(f"{len(falhas)} lote(s) devolvidos para a fila de pendências.")
-                    except Exception as e:
-                        logger.error(f"💥 Erro ao tentar reescrever pendências: {e}")
-            else:
-                logger.info("✅ Todos os lotes foram reenviados com sucesso.")
-
-
-fila = FilaRabbit()
-lote = EnviadorLote(fila, MAX_BATCH, INTERVALO_ENVIO)
-atexit.register(lote.desligar)
-
-# Inicia o reenviador em uma thread separada
-reenviador = Reenviador(fila, PENDENTES_PATH, ARQUIVO_LOCK, INTERVALO_REENVIO)
-thread_reenvio = threading.Thread(target=reenviador.rodar, daemon=True)
-thread_reenvio.start()
-
-def carregar_candidatos():
-    try:
-        with open(CANDIDATOS_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Erro ao carregar candidatos: {e}")
-        return []
-
-def candidato_existe(candidato_id):
-    candidatos = carregar_candidatos()
-    return any(c["id"] == candidato_id for c in candidatos)
-
-def criar_voto(tipo, candidato_nome):
+# 'adaptativo': tamanho e espera dos lotes seguem a carga; 'fixo': MAX_BATCH itens ou INTERVALO_ENVIO s
+LOTE_MODO = os.getenv('LOTE_MODO', 'adaptativo')
+LOTE_ATRASO_ALVO = float(os.getenv('LOTE_ATRASO_ALVO', 1.0))  # segundos, da chegada à confirmação
+LOTE_TAMANHO_MIN = int(os.getenv('LOTE_TAMANHO_MIN', 1))
+LOTE_TAMANHO_MAX = int(os.getenv('LOTE_TAMANHO_MAX', 1000))
+LOTE_PUBLICACOES_ALVO = float(os.getenv('LOTE_PUBLICACOES_ALVO', 50.0))
+PENDENTES_PATH = os.path.join(DATA_DIR, 'lotes_pendentes.json')  # formato antigo, migrado para o spool
+SPOOL_DIR = os.path.join(DATA_DIR, 'spool')
+SPOOL_BACKOFF_BASE = float(os.getenv('SPOOL_BACKOFF_BASE', 1.0))
+SPOOL_BACKOFF_MAX = float(os.getenv('SPOOL_BACKOFF_MAX', 300.0))
+SPOOL_TAXA_MAX = float(os.getenv('SPOOL_TAXA_MAX', 50.0))
+SPOOL_MAX_EM_VOO = int(os.getenv('SPOOL_MAX_EM_VOO', 32))
+# 'agregado': um data point por cidade/partido com valor = votos; 'individual': um por voto
+SIMULACAO_MODO_ENVIO = os.getenv('SIMULACAO_MODO_ENVIO', 'agregado')
+SIMULACAO_PROCESSOS = int(os.getenv('SIMULACAO_PROCESSOS', 0)) or None
+SIMULACAO_MAX_TRABALHOS = int(os.getenv('SIMULACAO_MAX_TRABALHOS', 4))
+SIMULACAO_TAMANHO_BLOCO = int(os.getenv('SIMULACAO_TAMANHO_BLOCO', 5000))
+# Limites de uma simulação pedida em /electionalternative (acima deles: 400)
+SIMULACAO_MAX_CIDADES = int(os.getenv('SIMULACAO_MAX_CIDADES', 100_000))
+SIMULACAO_MAX_POPULACAO = int(os.getenv('SIMULACAO_MAX_POPULACAO', 250_000_000))
+# O modo 'individual' cria um data point por voto: só até esta população
+SIMULACAO_MAX_VOTOS_INDIVIDUAL = int(os.getenv('SIMULACAO_MAX_VOTOS_INDIVIDUAL', 1_000_000))
+LIMITE_COMPACTACAO_CPFS = int(os.getenv('LIMITE_COMPACTACAO_CPFS', 100_000))
+FRAGMENTOS_CPFS = int(os.getenv('FRAGMENTOS_CPFS', 32))
+BLOOM_CAPACIDADE = int(os.getenv('BLOOM_CAPACIDADE', 10_000_000))
+BLOOM_TAXA_FP = float(os.getenv('BLOOM_TAXA_FP', 0.001))
+# WAL do EnviadorLote: votos aceitos só se perdem se o disco se perder
+WAL_ATIVO = os.getenv('WAL_ATIVO', 'true').lower() == 'true'
+WAL_DIR = os.path.join(DATA_DIR, 'wal')
+WAL_TAMANHO_SEGMENTO = int(os.getenv('WAL_TAMANHO_SEGMENTO', 4 * 1024 * 1024))
+# Contagem local dos votos aceitos, para /resultados/provisorios
+APURACAO_FAIXAS = int(os.getenv('APURACAO_FAIXAS', 16))
+APURACAO_INTERVALO_SNAPSHOT = float(os.getenv('APURACAO_INTERVALO_SNAPSHOT', 5.0))
+# Votos aceitos por requisição em /votar/lote
+VOTOS_LOTE_MAX = int(os.getenv('VOTOS_LOTE_MAX', 50_000))
+TIPOS_NDJSON = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+# Controle de admissão de /votar, /votar/lote e /electionalternative: acima destes limites
+# as escritas novas recebem 429 com Retry-After em vez de crescer as filas (0 desliga cada um)
+ADMISSAO_MAX_BUFFER = int(os.getenv('ADMISSAO_MAX_BUFFER', 100_000))  # itens no buffer do EnviadorLote
+ADMISSAO_MAX_SPOOL_LOTES = int(os.getenv('ADMISSAO_MAX_SPOOL_LOTES', 10_000))
+ADMISSAO_MAX_SPOOL_MB = int(os.getenv('ADMISSAO_MAX_SPOOL_MB', 1024))
+ADMISSAO_RETRY_AFTER = float(os.getenv('ADMISSAO_RETRY_AFTER', 5.0))
+# Limite por cliente (endereço IP), em requisições por segundo; desligado por padrão
+ADMISSAO_TAXA_CLIENTE = float(os.getenv('ADMISSAO_TAXA_CLIENTE', 0))
+ADMISSAO_RAJADA_CLIENTE = float(os.getenv('ADMISSAO_RAJADA_CLIENTE', 0)) or None
+ADMISSAO_MAX_CLIENTES = int(os.getenv('ADMISSAO_MAX_CLIENTES', 10_000))
+# Proxies confiáveis na frente do backend (o nginx do frontend é 1). Com 0 o cliente é o
+# endereço da conexão; acima de 0 vale o X-Forwarded-For, que um cliente com acesso direto
+# à porta do backend poderia forjar
+PROXIES_CONFIAVEIS = int(os.getenv('PROXIES_CONFIAVEIS', 0))
+if PROXIES_CONFIAVEIS:
+    # request.remote_addr passa a ser o cliente visto pelo proxy: é a chave do limite por cliente
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXIES_CONFIAVEIS, x_proto=PROXIES_CONFIAVEIS)
+
+# === COMPONENTES ===
+# Criados por criar_app() (no fim do arquivo), não na importação: importar este
+# módulo só lê a configuração e registra as rotas, sem threads, arquivos nem rede.
+saida_logs = None
+cliente_agregador = None
+agregador_local = None
+fila = None
+wal = None
+spool = None
+lote = None
+controle_admissao = None
+registro_votantes = None
+agendador_simulacao = None
+apuracao_local = None
+registro_candidatos = None
+cache_resultados = None
+transmissor_resultados = None
+tickets_stream = None
+assinante_agregador = None
+sonda_saude = None
+_lock_criacao = threading.Lock()
+
+def criar_voto(tipo, candidato_nome, valor=1, momento=None):
     return {
         "type": tipo,
         "objectIdentifier": candidato_nome,
-        "valor": 1,
-        "eventDatetime": datetime.now().isoformat()
+        "valor": valor,
+        "eventDatetime": momento or datetime.now().isoformat()
     }
 
-resultados_cache = {
-    "timestamp": None,
-    "dados": None
-}
+def enviar_resultados(resultados, modo=SIMULACAO_MODO_ENVIO):
+    """
+    Envia os votos simulados ao processador de lotes.
+
+    No modo 'agregado' cada par cidade/partido vira um único data point com
+    `valor` igual ao número de votos. O modo 'individual' mantém o formato antigo,
+    um data point com valor 1 por voto, para consumidores que precisam dele.
+
+    Os itens entram no EnviadorLote em pedaços de até um lote cheio (com WAL,
+    um commit em grupo por pedaço), sem montar o bloco inteiro na memória.
+    Enquanto o controle de admissão estiver saturado a simulação espera, como
+    as requisições de voto esperariam o Retry-After.
+    """
+    momento = datetime.now().isoformat()
+    por_partido = Counter()
+    itens = []
+    total_itens = 0
+
+    def descarregar():
+        while controle_admissao.saturacao() is not None:
+            time.sleep(ADMISSAO_RETRY_AFTER / 10)
+        lote.adicionar_varios(itens)
+        itens.clear()
 
-def processar_eleicao(data):
-    try:
-        candidatos = [c["id"] for c in carregar_candidatos()]
-        logger.info(f"[SIMULAÇÃO] Candidatos disponíveis: {candidatos}")
-        resultados_cidades = eleicao.processar_eleicao(data["num_cidades"], candidatos, data["populacao_total"])
-        enviar_resultados(resultados_cidades)
-    except Exception as e:
-        logger.error(f"[SIMULAÇÃO] Erro durante a simulação: {str(e)}")
-
-def enviar_resultados(resultados):
-    total_enviados = 0
-    total_itens_adicionados = 0
     for cidade in resultados:
         votos_por_partido = cidade.get("votos_por_partido", {})
         for partido, votos in votos_por_partido.items():
-            for _ in range(votos):
-                voto = criar_voto("eleicao", partido)
-                lote.adicionar(voto)
-                total_itens_adicionados += 1
-            logger.info(f"[SIMULAÇÃO] Adicionados {votos} votos para {partido} ao lote.")
-    logger.info(f"[SIMULAÇÃO] Total de {total_itens_adicionados} votos adicionados ao processador de lotes.")
+            if votos <= 0:
+                continue
+            repeticoes, valor = (votos, 1) if modo == 'individual' else (1, votos)
+            for _ in range(repeticoes):
+                itens.append(criar_voto("eleicao", partido, valor, momento))
+                if len(itens) >= lote.tamanho_max:
+                    total_itens += len(itens)
+                    descarregar()
+        por_partido.update(votos_por_partido)
+    if itens:
+        total_itens += len(itens)
+        descarregar()
+    for partido, votos in por_partido.items():
+        apuracao_local.registrar("eleicao", partido, votos)
+    logger.info("[SIMULAÇÃO] Total de %s votos adicionados ao processador de lotes em %s itens (modo %s).",
+                sum(por_partido.values()), total_itens, modo)
 
 @app.route('/')
 def index():
@@ -341,7 +295,7 @@ def login():
             return jsonify({"erro": "Credenciais inválidas"}), 401
             
     except Exception as e:
-        logger.error(f"Erro no login: {str(e)}")
+        logger.error("Erro no login: %s", e)
         return jsonify({"erro": "Erro interno no servidor"}), 500
 
 @app.route('/verify-token', methods=['GET'])
@@ -354,150 +308,330 @@ def verify_token():
             "username": current_user
         }), 200
     except Exception as e:
-        logger.error(f"Erro na verificação do token: {str(e)}")
+        logger.error("Erro na verificação do token: %s", e)
         return jsonify({"erro": "Token inválido"}), 401
 
 # === PROTEGER ROTAS EXISTENTES ===
 
+def processar_voto(dados):
+    """
+    Valida e registra um voto. Usado pelo servidor WSGI (Flask) e pelo ASGI (app_async.py).
+
+    Args:
+        dados (dict): Corpo da requisição (cpf, candidato_id e, opcionalmente, eleicao)
+
+    Returns:
+        tuple: (corpo da resposta, status HTTP)
+    """
+    corpo, status = registrar_voto(dados)
+    votos_processados.incrementar(RESULTADO_VOTO.get(status, "rejeitado"))
+    return corpo, status
+
+def chave_votante(cpf, tipo):
+    """Chave do CPF no registro de votantes: só dígitos, mais a eleição se não for a padrão."""
+    # Limpa o CPF de caracteres não numéricos
+    cpf = ''.join(filter(str.isdigit, str(cpf)))
+    # Um voto por CPF em cada eleição (a padrão mantém a chave antiga, só o CPF)
+    if tipo != ELEICAO_PADRAO:
+        cpf = f"{cpf}@{tipo}"
+    return cpf
+
+def registrar_voto(dados):
+    if not isinstance(dados, dict):
+        return {"erro": "Voto inválido"}, 400
+    cpf = dados.get('cpf')
+    candidato = dados.get('candidato_id')
+    tipo = dados.get('eleicao') or ELEICAO_PADRAO
+
+    if not candidato:
+        return {"erro": "Candidato não informado"}, 400
+
+    if not cpf or not candidato:
+        return {"erro": "CPF e candidato_id são obrigatórios"}, 400
+
+    if registro_candidatos.eleicao(tipo) is None:
+        return {"erro": "Eleição inválida"}, 400
+
+    cpf = chave_votante(cpf, tipo)
+
+    inicio = time.perf_counter()
+    ja_votou = registro_votantes.contem(cpf)
+    duracao_verificacao_cpf.observar(time.perf_counter() - inicio, "consulta")
+    if ja_votou:
+        return {"erro": "CPF já votou"}, 403
+
+    if not registro_candidatos.existe(candidato, tipo):
+        return {"erro": "Candidato inválido"}, 400
+
+    # Persiste o CPF localmente PRIMEIRO para garantir que não haja votos duplicados.
+    # No pior caso (crash após esta linha), um voto é perdido, mas a integridade é mantida.
+    # O registro é atômico: se duas requisições chegarem com o mesmo CPF, só uma passa.
+    inicio = time.perf_counter()
+    registrado = registro_votantes.registrar(cpf)
+    duracao_verificacao_cpf.observar(time.perf_counter() - inicio, "registro")
+    if not registrado:
+        return {"erro": "CPF já votou"}, 403
+
+    # Adiciona o voto ao processador de lotes
+    voto = criar_voto(tipo, candidato)
+    lote.adicionar(voto)
+    apuracao_local.registrar(tipo, candidato)
+
+    return {"status": "Voto recebido e agendado para envio em lote."}, 200
+
+def responder_recusa(recusa):
+    """Resposta 429 de uma AdmissaoRecusada, com o Retry-After sugerido."""
+    resposta = jsonify({"erro": str(recusa), "motivo": recusa.motivo})
+    resposta.status_code = 429
+    resposta.headers['Retry-After'] = str(recusa.retry_after_s)
+    return resposta
+
 @app.route('/votar', methods=['POST'])
 @jwt_required()
 def votar():
     try:
-        dados = request.get_json()
-        cpf = dados.get('cpf')
-        candidato = dados.get('candidato_id')
-        tipo = 'eleicao'
-
-        if not candidato:
-            return jsonify({"erro": "Candidato não informado"}), 400
+        controle_admissao.admitir(request.remote_addr)
+        corpo, status = processar_voto(request.get_json())
+        return jsonify(corpo), status
+    except AdmissaoRecusada as e:
+        return responder_recusa(e)
+    except Exception as e:
+        logger.error("Erro ao processar voto: %s", e)
+        return jsonify({"erro": "Erro interno"}), 500
 
+def ler_votos_ndjson(linhas, limite=VOTOS_LOTE_MAX):
+    """
+    Lê votos em NDJSON (um objeto JSON por linha), sem montar o corpo inteiro na memória.
+
+    Args:
+        linhas: Iterável de linhas (bytes ou str); linhas em branco são ignoradas
+        limite (int): Para de ler depois de `limite` + 1 votos (o excesso já recusa o lote)
+
+    Returns:
+        list: Um item por linha; None nas linhas que não são JSON válido
+    """
+    votos = []
+    for linha in linhas:
+        if not linha.strip():
+            continue
+        if len(votos) > limite:
+            break
+        try:
+            votos.append(json.loads(linha))
+        except ValueError:
+            votos.append(None)
+    return votos
+
+def processar_votos_lote(dados):
+    """
+    Valida e registra um lote de votos (urnas que sincronizam depois de votar offline).
+
+    Cada voto passa pelas mesmas regras de /votar, mas o trabalho é feito uma
+    vez para o lote: CPFs repetidos no próprio lote e já registrados são
+    recusados, os novos entram no registro de votantes com um único fsync e os
+    votos aceitos vão para o EnviadorLote (e o WAL) de uma vez.
+
+    Args:
+        dados: Lista de votos ({"cpf", "candidato_id", "eleicao"?}), ou {"votos": [...]}
+
+    Returns:
+        tuple: (corpo com a situação de cada voto, na ordem do envio, e status HTTP)
+    """
+    if isinstance(dados, dict):
+        dados = dados.get('votos')
+    if not isinstance(dados, list) or not dados:
+        return {"erro": "Envie uma lista de votos (JSON) ou um voto por linha (NDJSON)"}, 400
+    if len(dados) > VOTOS_LOTE_MAX:
+        return {"erro": f"Lote acima do limite de {VOTOS_LOTE_MAX} votos"}, 413
+
+    resultados = [None] * len(dados)
+    candidatos = []  # (posição, chave do CPF, eleição, candidato)
+    vistos = set()
+    for posicao, voto in enumerate(dados):
+        if not isinstance(voto, dict):
+            resultados[posicao] = {"status": "rejeitado", "erro": "Voto inválido"}
+            continue
+        cpf = voto.get('cpf')
+        candidato = voto.get('candidato_id')
+        tipo = voto.get('eleicao') or ELEICAO_PADRAO
         if not cpf or not candidato:
-            return jsonify({"erro": "CPF e candidato_id são obrigatórios"}), 400
+            resultados[posicao] = {"status": "rejeitado", "erro": "CPF e candidato_id são obrigatórios"}
+        elif registro_candidatos.eleicao(tipo) is None:
+            resultados[posicao] = {"status": "rejeitado", "erro": "Eleição inválida"}
+        else:
+            chave = chave_votante(cpf, tipo)
+            if chave in vistos:
+                resultados[posicao] = {"status": "cpf_duplicado", "erro": "CPF repetido no lote"}
+            elif registro_votantes.contem(chave):
+                resultados[posicao] = {"status": "cpf_duplicado", "erro": "CPF já votou"}
+            elif not registro_candidatos.existe(candidato, tipo):
+                resultados[posicao] = {"status": "rejeitado", "erro": "Candidato inválido"}
+            else:
+                vistos.add(chave)
+                candidatos.append((posicao, chave, tipo, candidato))
+
+    # CPF primeiro, como em /votar; o registro é atômico contra votos simultâneos do mesmo CPF
+    inicio = time.perf_counter()
+    registrados = registro_votantes.registrar_varios([chave for _, chave, _, _ in candidatos])
+    duracao_verificacao_cpf.observar(time.perf_counter() - inicio, "registro_lote")
+    momento = datetime.now().isoformat()
+    aceitos = []
+    for (posicao, _, tipo, candidato), registrado in zip(candidatos, registrados):
+        if registrado:
+            resultados[posicao] = {"status": "aceito"}
+            aceitos.append(criar_voto(tipo, candidato, momento=momento))
+        else:
+            resultados[posicao] = {"status": "cpf_duplicado", "erro": "CPF já votou"}
+    lote.adicionar_varios(aceitos)
+    apuracao_local.registrar_varios(aceitos)
+
+    contagem = Counter(r["status"] for r in resultados)
+    for resultado, quantidade in contagem.items():
+        votos_processados.incrementar(resultado, quantidade=quantidade)
+    logger.info("🗳️ Lote de %s votos: %s aceitos, %s CPFs repetidos, %s rejeitados.", len(dados),
+                contagem["aceito"], contagem["cpf_duplicado"], contagem["rejeitado"])
+    return {
+        "total": len(dados),
+        "aceitos": contagem["aceito"],
+        "cpf_duplicados": contagem["cpf_duplicado"],
+        "rejeitados": contagem["rejeitado"],
+        "resultados": resultados
+    }, 200
+
+@app.route('/votar/lote', methods=['POST'])
+@jwt_required()
+def votar_lote():
+    """Vários votos numa requisição: lista JSON ou NDJSON (Content-Type application/x-ndjson)."""
+    try:
+        # Antes de ler o corpo: um lote recusado não custa nem o parse
+        controle_admissao.admitir(request.remote_addr)
+        if request.mimetype in TIPOS_NDJSON:
+            dados = ler_votos_ndjson(request.stream)
+        else:
+            dados = request.get_json(silent=True)
+        corpo, status = processar_votos_lote(dados)
+        return jsonify(corpo), status
+    except AdmissaoRecusada as e:
+        return responder_recusa(e)
+    except Exception as e:
+        logger.error("Erro ao processar lote de votos: %s", e)
+        return jsonify({"erro": "Erro interno"}), 500
 
-        # Limpa o CPF de caracteres não numéricos
-        cpf = ''.join(filter(str.isdigit, str(cpf)))
 
-        # Caminho do arquivo persistente
-        arquivo_cpfs = os.path.join(os.path.dirname(__file__), 'data', 'cpfs_votantes.json')
+# Eleição da resposta de /resultados para cada `type` do agregador
+TIPOS_ELEICAO = {
+    "eleicao": "eleicao1",
+    "eleicao-gp2": "eleicao2",
+    "pokemon": "eleicao3",
+    "votacao_melhor_ator": "eleicao4",
+    "melhor-filme-2025": "eleicao5",
+    "iot": "eleicao6",
+}
 
+def obter_dados_agregador():
+    """
+    Busca GET /api/aggregator/results no Aggregator Node.
 
-        # Garante que o arquivo exista e leia os dados
-        if not os.path.exists(arquivo_cpfs):
-            with open(arquivo_cpfs, 'w') as f:
-                json.dump([], f)
+    Returns:
+        dict: JSON do agregador, ou None em erro ou resposta vazia
+    """
+    logger.info("Buscando novos resultados do Aggregator Node...")
+    response = cliente_agregador.get("/api/aggregator/results")
 
-        with open(arquivo_cpfs, 'r') as f:
-            try:
-                cpfs_votantes = json.load(f)
-            except json.JSONDecodeError:
-                cpfs_votantes = []
+    if response.status_code != 200:
+        logger.warning("Erro ao buscar resultados do agregador. Status: %s, Body: %s",
+                       response.status_code, response.text)
+        return None
 
-        if cpf in cpfs_votantes:
-            return jsonify({"erro": "CPF já votou"}), 403
+    try:
+        dados_gerais = response.json()
+        if not dados_gerais:
+            logger.warning("Resposta JSON vazia do agregador.")
+            return None
+    except json.JSONDecodeError:
+        logger.error("Falha ao decodificar JSON do agregador.")
+        return None
+    return dados_gerais
+
+def buscar_resultados_agregador():
+    """
+    Busca os resultados no agregador (remoto ou local) e monta a resposta de /resultados.
+
+    Returns:
+        dict: Resposta formatada, ou None se o agregador não tiver resultados
+    """
+    if agregador_local is not None:
+        dados_gerais = agregador_local.resultados()
+    else:
+        dados_gerais = obter_dados_agregador()
+    if dados_gerais is None:
+        return None
 
-        if not candidato_existe(candidato):
-            return jsonify({"erro": "Candidato inválido"}), 400
+    dados_agregados = dados_gerais.get("dadosAgregados", [])
 
-        # Persiste o CPF localmente PRIMEIRO para garantir que não haja votos duplicados.
-        # No pior caso (crash após esta linha), um voto é perdido, mas a integridade é mantida.
-        cpfs_votantes.append(cpf)
-        with open(arquivo_cpfs, 'w') as f:
-            json.dump(cpfs_votantes, f)
-        
-        # Adiciona o voto ao processador de lotes
-        voto = criar_voto(tipo, candidato)
-        lote.adicionar(voto)
+    resultados_por_eleicao = {chave: [] for chave in TIPOS_ELEICAO.values()}
+
+    for item in dados_agregados:
+        tipo = item.get("type")
+        lista_dados = item.get("lista", [])
         
-        return jsonify({"status": "Voto recebido e agendado para envio em lote."}), 200
+        if tipo not in TIPOS_ELEICAO or not isinstance(lista_dados, list):
+            continue
+
+        if tipo == "iot":
+            resultados_formatados = [
+                {
+                    "id": r.get("objectIdentifier"), "nome": r.get("objectIdentifier"), 
+                    "votos": r.get("somatorio", 0), "media": r.get("media", 0),
+                    "mediana": r.get("mediana", 0), "contagem": r.get("contagem", 0),
+                    "porcentagem": r.get("porcentagem", 0)
+                } for r in lista_dados
+            ]
+        else:
+            resultados_formatados = [
+                {"id": r.get("objectIdentifier"), "nome": r.get("objectIdentifier"), "votos": r.get("somatorio", 0)}
+                for r in lista_dados
+            ]
+        resultados_por_eleicao[TIPOS_ELEICAO[tipo]] = resultados_formatados
+
+    resposta_final = {
+        "eleicao1": {"titulo": "Eleição Atual", "resultados": resultados_por_eleicao["eleicao1"], "total": sum(r["votos"] for r in resultados_por_eleicao["eleicao1"])},
+        "eleicao2": {"titulo": "Eleição Grupo 2", "resultados": resultados_por_eleicao["eleicao2"], "total": sum(r["votos"] for r in resultados_por_eleicao["eleicao2"])},
+        "eleicao3": {"titulo": "Melhor Pokemon", "resultados": resultados_por_eleicao["eleicao3"], "total": sum(r["votos"] for r in resultados_por_eleicao["eleicao3"])},
+        "eleicao4": {"titulo": "Melhor Ator", "resultados": resultados_por_eleicao["eleicao4"], "total": sum(r["votos"] for r in resultados_por_eleicao["eleicao4"])},
+        "eleicao5": {"titulo": "Melhor Filme 2025", "resultados": resultados_por_eleicao["eleicao5"], "total": sum(r["votos"] for r in resultados_por_eleicao["eleicao5"])},
+        "eleicao6": {"titulo": "IoT - Dados Estatísticos", "resultados": resultados_por_eleicao["eleicao6"], "total": sum(r.get("votos", r.get("contagem", 0)) for r in resultados_por_eleicao["eleicao6"])},
+        "eleicaoativa": True
+    }
 
-    except Exception as e:
-        logger.error(f"Erro ao processar voto: {str(e)}")
-        return jsonify({"erro": "Erro interno"}), 500
+    # Sem resultados: o cache guarda como negativo e mantém o último resultado válido
+    if not any(resposta_final[f'eleicao{i}']['resultados'] for i in range(1, 7)):
+        return None
+    return resposta_final
+
+def buscar_resultados_com_base():
+    """Busca no agregador marcando antes a contagem local que o snapshot pode cobrir."""
+    apuracao_local.marcar_leitura()
+    return buscar_resultados_agregador()
 
+def responder_snapshot(snapshot):
+    """Devolve o corpo já serializado do snapshot, ou 304 se o cliente já tem essa versão."""
+    if request.if_none_match.contains(snapshot.etag):
+        resposta = Response(status=304)
+    else:
+        resposta = Response(snapshot.corpo, mimetype='application/json')
+    resposta.set_etag(snapshot.etag)
+    # Resposta depende do token: o navegador pode guardar, mas sempre revalida
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
 
 @app.route('/resultados', methods=['GET'])
 @jwt_required()
 def resultados():
     try:
-        agora = datetime.now()
-        if resultados_cache["timestamp"] and agora - resultados_cache["timestamp"] < timedelta(seconds=CACHE_DURACAO):
-            logger.info("Retornando resultados do cache.")
-            return jsonify(resultados_cache["dados"])
-        
-        logger.info("Buscando novos resultados do Aggregator Node...")
-        response = requests.get(f"{AGGREGATOR_URL}/api/aggregator/results", timeout=10)
-
-        if response.status_code != 200:
-            logger.warning(f"Erro ao buscar resultados do agregador. Status: {response.status_code}, Body: {response.text}")
-            return jsonify(gerar_resposta_vazia_estruturada())
-        
-        try:
-            dados_gerais = response.json()
-            if not dados_gerais:
-                logger.warning("Resposta JSON vazia do agregador.")
-                return jsonify(gerar_resposta_vazia_estruturada())
-        except json.JSONDecodeError:
-            logger.error("Falha ao decodificar JSON do agregador.")
-            return jsonify(gerar_resposta_vazia_estruturada())
-
-        dados_agregados = dados_gerais.get("dadosAgregados", [])
-
-        eleicao1_resultados, eleicao2_resultados, eleicao3_resultados, eleicao4_resultados, eleicao5_resultados, eleicao6_resultados = [], [], [], [], [], []
-
-        for item in dados_agregados:
-            tipo = item.get("type")
-            lista_dados = item.get("lista", [])
-            
-            if not tipo or not isinstance(lista_dados, list):
-                continue
-
-            if tipo == "iot":
-                resultados_formatados = [
-                    {
-                        "id": r.get("objectIdentifier"), "nome": r.get("objectIdentifier"), 
-                        "votos": r.get("somatorio", 0), "media": r.get("media", 0),
-                        "mediana": r.get("mediana", 0), "contagem": r.get("contagem", 0),
-                        "porcentagem": r.get("porcentagem", 0)
-                    } for r in lista_dados
-                ]
-                eleicao6_resultados = resultados_formatados
-            else:
-                resultados_formatados = [
-                    {"id": r.get("objectIdentifier"), "nome": r.get("objectIdentifier"), "votos": r.get("somatorio", 0)}
-                    for r in lista_dados
-                ]
-                
-                if tipo == "eleicao": eleicao1_resultados = resultados_formatados
-                elif tipo == "eleicao-gp2": eleicao2_resultados = resultados_formatados
-                elif tipo == "pokemon": eleicao3_resultados = resultados_formatados
-                elif tipo == "votacao_melhor_ator": eleicao4_resultados = resultados_formatados
-                elif tipo == "melhor-filme-2025": eleicao5_resultados = resultados_formatados
-
-        resposta_final = {
-            "eleicao1": {"titulo": "Eleição Atual", "resultados": eleicao1_resultados, "total": sum(r["votos"] for r in eleicao1_resultados)},
-            "eleicao2": {"titulo": "Eleição Grupo 2", "resultados": eleicao2_resultados, "total": sum(r["votos"] for r in eleicao2_resultados)},
-            "eleicao3": {"titulo": "Melhor Pokemon", "resultados": eleicao3_resultados, "total": sum(r["votos"] for r in eleicao3_resultados)},
-            "eleicao4": {"titulo": "Melhor Ator", "resultados": eleicao4_resultados, "total": sum(r["votos"] for r in eleicao4_resultados)},
-            "eleicao5": {"titulo": "Melhor Filme 2025", "resultados": eleicao5_resultados, "total": sum(r["votos"] for r in eleicao5_resultados)},
-            "eleicao6": {"titulo": "IoT - Dados Estatísticos", "resultados": eleicao6_resultados, "total": sum(r.get("votos", r.get("contagem", 0)) for r in eleicao6_resultados)},
-            "eleicaoativa": True
-        }
-
-        # Cache inteligente: só armazena se houver dados.
-        if any(resposta_final[f'eleicao{i}']['resultados'] for i in range(1, 7)):
-            resultados_cache["dados"] = resposta_final
-            resultados_cache["timestamp"] = agora
-            logger.info("Resultados válidos armazenados no cache.")
-        else:
-            logger.info("Resultados vazios. Cache não foi atualizado.")
-        
-        return jsonify(resposta_final)
-
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Erro de conexão ao buscar resultados: {e}")
-        return jsonify(gerar_resposta_vazia_estruturada())
+        return responder_snapshot(cache_resultados.obter_snapshot() or SNAPSHOT_VAZIO)
     except Exception as e:
-        logger.error(f"Erro inesperado ao buscar resultados: {str(e)}")
+        logger.error("Erro inesperado ao buscar resultados: %s", e)
         return jsonify(gerar_resposta_vazia_estruturada())
 
 def gerar_resposta_vazia_estruturada():
@@ -512,73 +646,516 @@ def gerar_resposta_vazia_estruturada():
         "eleicaoativa": True
     }
 
+SNAPSHOT_VAZIO = criar_snapshot(gerar_resposta_vazia_estruturada())
+
+def emitir_ticket_stream(identidade):
+    """Corpo de /resultados/stream/ticket. Usado pelo servidor WSGI e pelo ASGI."""
+    return {"ticket": tickets_stream.emitir(identidade), "validade_s": tickets_stream.validade}
+
+@app.route('/resultados/stream/ticket', methods=['POST'])
+@jwt_required()
+def resultados_stream_ticket():
+    """Troca o JWT (no header) por um ticket de uso único para abrir /resultados/stream."""
+    return jsonify(emitir_ticket_stream(get_jwt_identity()))
+
+@app.route('/resultados/stream', methods=['GET'])
+def resultados_stream():
+    """
+    Resultados ao vivo via Server-Sent Events.
+
+    O EventSource não envia headers, então o navegador autentica com
+    ?ticket= (ver /resultados/stream/ticket) em vez de pôr o JWT na URL.
+    Clientes que mandam headers continuam usando Authorization. Como uma
+    reconexão manual não manda Last-Event-ID, ?ultimo_id= faz o mesmo papel.
+    """
+    ticket = request.args.get('ticket')
+    if ticket is not None:
+        if tickets_stream.resgatar(ticket) is None:
+            return jsonify({"msg": "Ticket inválido, vencido ou já usado"}), 401
+    else:
+        verify_jwt_in_request()
+    snapshot = cache_resultados.obter_snapshot()
+    if snapshot is not None:
+        transmissor_resultados.publicar(snapshot)
+    try:
+        eventos = transmissor_resultados.assinar(request.headers.get('Last-Event-ID') or request.args.get('ultimo_id'))
+    except LimiteConexoesAtingido as e:
+        logger.warning("[RESULTADOS] %s", e)
+        resposta = jsonify({"erro": str(e)})
+        resposta.status_code = 503
+        resposta.headers['Retry-After'] = '30'
+        return resposta
+    resposta = Response(eventos, mimetype='text/event-stream')
+    resposta.headers['Cache-Control'] = 'no-cache'
+    resposta.headers['X-Accel-Buffering'] = 'no'  # Nginx não deve segurar os eventos
+    return resposta
+
+def mesclar_provisorios(dados, pendentes):
+    """
+    Soma aos resultados do agregador os votos aceitos aqui que ele ainda não contou.
+
+    Args:
+        dados (dict): Resposta no formato de /resultados (não é modificada)
+        pendentes (dict): {(type, objectIdentifier): votos} da apuração local
+
+    Returns:
+        dict: Nova resposta com os votos pendentes somados e os totais refeitos
+    """
+    mesclado = dict(dados)
+    for (tipo, objeto), votos in pendentes.items():
+        chave = TIPOS_ELEICAO.get(tipo)
+        if chave is None or chave == "eleicao6":  # IoT traz estatísticas, não contagens
+            continue
+        if mesclado[chave] is dados[chave]:
+            mesclado[chave] = dict(dados[chave], resultados=[dict(r) for r in dados[chave]["resultados"]])
+        eleicao = mesclado[chave]
+        existente = next((r for r in eleicao["resultados"] if r["id"] == objeto), None)
+        if existente is None:
+            eleicao["resultados"].append({"id": objeto, "nome": objeto, "votos": votos})
+        else:
+            existente["votos"] += votos
+        eleicao["total"] += votos
+    return mesclado
+
+@app.route('/resultados/provisorios', methods=['GET'])
+@jwt_required()
+def resultados_provisorios():
+    """Último resultado do agregador mais os votos aceitos aqui depois dele (sem esperar lote nem agregador)."""
+    try:
+        pendentes = apuracao_local.pendentes()
+        snapshot = cache_resultados.obter_snapshot() or SNAPSHOT_VAZIO
+        resposta = mesclar_provisorios(snapshot.dados, pendentes)
+        resposta["provisorio"] = True
+        resposta["votos_pendentes"] = sum(pendentes.values())
+        return jsonify(resposta)
+    except Exception as e:
+        logger.error("Erro ao montar resultados provisórios: %s", e)
+        return jsonify({"erro": "Erro interno"}), 500
+
+def iniciar_simulacao(data):
+    """
+    Agenda uma simulação de eleição. Usado pelo servidor WSGI e pelo ASGI.
+
+    Returns:
+        tuple: (corpo da resposta, status HTTP)
+    """
+    try:
+        logger.info("[SIMULAÇÃO] Dados recebidos: %s", data)
+        try:
+            num_cidades = int(data["num_cidades"])
+            populacao_total = int(data["populacao_total"])
+        except (KeyError, TypeError, ValueError):
+            return {"erro": "num_cidades e populacao_total devem ser inteiros"}, 400
+        if not 0 < num_cidades <= SIMULACAO_MAX_CIDADES:
+            return {"erro": f"num_cidades deve estar entre 1 e {SIMULACAO_MAX_CIDADES}"}, 400
+        if not 0 <= populacao_total <= SIMULACAO_MAX_POPULACAO:
+            return {"erro": f"populacao_total deve estar entre 0 e {SIMULACAO_MAX_POPULACAO}"}, 400
+        modo = data.get("modo_envio", SIMULACAO_MODO_ENVIO)
+        if modo not in ('agregado', 'individual'):
+            return {"erro": "modo_envio deve ser 'agregado' ou 'individual'"}, 400
+        if modo == 'individual' and populacao_total > SIMULACAO_MAX_VOTOS_INDIVIDUAL:
+            return {"erro": f"modo_envio 'individual' aceita até {SIMULACAO_MAX_VOTOS_INDIVIDUAL} votos; "
+                            "use 'agregado'"}, 400
+
+        candidatos = registro_candidatos.ids()
+        logger.info("[SIMULAÇÃO] Candidatos disponíveis: %s", candidatos)
+        trabalho = agendador_simulacao.submeter(
+            num_cidades, candidatos, populacao_total,
+            consumidor=lambda resultados: enviar_resultados(resultados, modo),
+            semente=data.get("semente")
+        )
+        return {
+            "message": "Simulação iniciada em background",
+            "job_id": trabalho.id,
+            "status_url": f"/electionalternative/{trabalho.id}"
+        }, 202
+    except FilaSimulacaoCheia as e:
+        logger.warning("[SIMULAÇÃO] %s", e)
+        return {"erro": str(e)}, 429
+    except ValueError as e:
+        return {"erro": str(e)}, 400
+    except Exception as e:
+        logger.error("[SIMULAÇÃO] Erro ao iniciar simulação: %s", e)
+        return {"erro": "Erro ao iniciar simulação"}, 500
+
 @app.route('/electionalternative', methods=['POST'])
 @jwt_required()
 def electionalternative():
     try:
-        data = request.json
-        logger.info(f"[SIMULAÇÃO] Dados recebidos: {data}")
-        threading.Thread(target=processar_eleicao, args=(data,), daemon=True).start()
-        return jsonify({"message": "Simulação iniciada em background"})
-    except Exception as e:
-        logger.error(f"[SIMULAÇÃO] Erro ao iniciar simulação: {e}")
-        return jsonify({"erro": "Erro ao iniciar simulação"}), 500
+        controle_admissao.admitir(request.remote_addr)
+    except AdmissaoRecusada as e:
+        return responder_recusa(e)
+    corpo, status = iniciar_simulacao(request.get_json(silent=True))
+    return jsonify(corpo), status
+
+
+@app.route('/electionalternative/<job_id>', methods=['GET'])
+@jwt_required()
+def electionalternative_status(job_id):
+    trabalho = agendador_simulacao.consultar(job_id)
+    if trabalho is None:
+        return jsonify({"erro": "Simulação não encontrada"}), 404
+    return jsonify(trabalho.como_dict())
 
 
 @app.route('/candidatos', methods=['GET'])
 @jwt_required()
 def get_candidatos():
     try:
-        candidatos = carregar_candidatos()
-        logger.info(f"[CANDIDATOS] Lista enviada com {len(candidatos)} candidatos.")
-        return jsonify(candidatos)
+        eleicao = registro_candidatos.eleicao(request.args.get('eleicao', ELEICAO_PADRAO))
+        if eleicao is None:
+            return jsonify({"erro": "Eleição não encontrada"}), 404
+        logger.info("[CANDIDATOS] Lista enviada com %s candidatos.", len(eleicao.candidatos))
+        return responder_snapshot(eleicao.snapshot)
     except Exception as e:
-        logger.error(f"[CANDIDATOS] Erro ao obter candidatos: {e}")
+        logger.error("[CANDIDATOS] Erro ao obter candidatos: %s", e)
         return jsonify({"erro": "Erro interno ao obter candidatos"}), 500
 
 
 
-@app.route('/health', methods=['GET'])
-def health():
-    try:
-        # Verifica conexão com RabbitMQ
-        if fila.ch and fila.ch.is_open:
-            rabbitmq_status = "connected"
-        else:
-            rabbitmq_status = "disconnected"
+# === SAÚDE ===
 
-        # Verifica conexão com o agregador
-        try:
-            response = requests.get(f"{AGGREGATOR_URL}/actuator/health", timeout=5)
-            aggregator_status = "connected" if response.status_code == 200 else "disconnected"
-        except:
-            aggregator_status = "disconnected"
+def verificar_agregador():
+    if agregador_local is not None:
+        return True, "agregador local"
+    # Só o endpoint leve do agregador; com o disjuntor aberto falha sem fazer a chamada
+    resposta = cliente_agregador.get("/actuator/health", timeout_leitura=SAUDE_TIMEOUT_AGREGADOR)
+    return resposta.status_code == 200, f"HTTP {resposta.status_code}"
 
-        # Verifica se consegue buscar resultados
-        try:
-            response = requests.get(f"{AGGREGATOR_URL}/api/aggregator/results", timeout=5)
-            results_status = "accessible" if response.status_code == 200 else "inaccessible"
-        except:
-            results_status = "inaccessible"
+def verificar_rabbitmq():
+    return fila.conectado, "conectado" if fila.conectado else "desconectado"
 
-        return jsonify({
-            "status": "healthy",
-            "rabbitmq": rabbitmq_status,
-            "aggregator_node": aggregator_status,
-            "results_endpoint": results_status,
-            "cache_status": "active" if resultados_cache["timestamp"] else "empty"
-        })
+def verificar_resultados():
+    # Estado da última busca do cache: nenhuma chamada extra ao agregador
+    if cache_resultados.obtido_em is None:
+        return False, "nenhum resultado obtido ainda"
+    idade = round(time.monotonic() - cache_resultados.obtido_em, 1)
+    return cache_resultados.falhou_em is None, f"último resultado há {idade}s"
+
+def verificar_disco():
+    livre_mb = shutil.disk_usage(DATA_DIR).free // (1024 * 1024)
+    return livre_mb >= SAUDE_DISCO_MIN_MB, f"{livre_mb} MB livres"
+
+def verificar_fsync():
+    # Erro guardado pelo último fsync de cada log: sem E/S aqui
+    erros = {nome: commit.erro for nome, commit in
+             (("votantes", registro_votantes.commit), ("wal", wal.commit if wal is not None else None))
+             if commit is not None and commit.erro is not None}
+    if erros:
+        return False, "; ".join(f"{nome}: {erro}" for nome, erro in erros.items())
+    return True, "ok"
+
+def metricas_componentes():
+    """Métricas internas de /health, comuns aos servidores WSGI e ASGI."""
+    return {
+        "cliente_agregador": cliente_agregador.metricas(),
+        "publicador": fila.estado(),
+        "lote": lote.metricas(),
+        "spool_reenvio": spool.metricas(),
+        "admissao": controle_admissao.metricas(),
+        "cache_status": cache_resultados.metricas()["status"],
+        "cache_resultados": cache_resultados.metricas(),
+        "transmissao_resultados": transmissor_resultados.metricas(),
+        "tickets_stream": tickets_stream.metricas(),
+        "assinante_agregador": assinante_agregador.metricas(),
+        "registro_votantes": registro_votantes.metricas(),
+        "apuracao_local": apuracao_local.metricas(),
+        "registro_candidatos": registro_candidatos.metricas(),
+        "agregador_local": agregador_local.metricas() if agregador_local is not None else None,
+        "logs": saida_logs.metricas()
+    }
+
+def estado_saude():
+    """Corpo de /health: resultado guardado das verificações mais as métricas internas."""
+    verificacoes = sonda_saude.estado()
+    return {
+        "status": "healthy",
+        "rabbitmq": "connected" if fila.conectado else "disconnected",
+        "aggregator_node": "connected" if verificacoes["agregador"]["ok"] else "disconnected",
+        "results_endpoint": "accessible" if verificacoes["resultados"]["ok"] else "inaccessible",
+        "verificacoes": verificacoes,
+        **metricas_componentes()
+    }
+
+def estado_prontidao():
+    """
+    Corpo e status de /health/ready: verificações, fila interna, spool e publicador.
+
+    A instância só fica pronta depois da primeira tentativa de conexão com o
+    RabbitMQ, dando certo ou não: o balanceador não manda tráfego enquanto o
+    publicador ainda está conectando na partida.
+
+    Returns:
+        tuple: (corpo, 200 se pronta ou 503 se não)
+    """
+    pronto = sonda_saude.pronto() and not fila.iniciando
+    spool_metricas = spool.metricas()
+    return {
+        "status": "ready" if pronto else "not_ready",
+        "verificacoes": sonda_saude.estado(),
+        "publicador": fila.estado(),
+        "buffer_lote": len(lote.buffer),
+        "spool": {"profundidade": spool_metricas["profundidade"], "bytes": spool_metricas["bytes"]},
+        "admissao_saturada": controle_admissao.metricas()["saturado"]
+    }, 200 if pronto else 503
+
+# Leituras feitas só na coleta de /metrics, a partir dos contadores que os componentes já mantêm
+registro_metricas.registrar("lote_buffer_itens", "Itens aguardando o fechamento de um lote", TIPO_MEDIDOR,
+                            lambda: len(lote.buffer))
+registro_metricas.registrar("lote_tamanho_alvo", "Tamanho alvo atual dos lotes", TIPO_MEDIDOR,
+                            lambda: lote.tamanho_alvo)
+registro_metricas.registrar("lote_envios_total", "Lotes fechados, por motivo (tamanho, tempo ou desligamento)",
+                            TIPO_CONTADOR, lambda: dict(lote.envios), ("motivo",))
+registro_metricas.registrar("lote_itens_enviados_total", "Itens em lotes confirmados pelo broker", TIPO_CONTADOR,
+                            lambda: lote.itens_enviados)
+registro_metricas.registrar("publicador_conectado", "Conexão com o RabbitMQ pronta (1) ou não (0)", TIPO_MEDIDOR,
+                            lambda: fila.conectado)
+registro_metricas.registrar("publicador_pendentes", "Lotes na fila interna do publicador", TIPO_MEDIDOR,
+                            lambda: fila.estado()["pendentes"])
+registro_metricas.registrar("publicador_em_voo", "Lotes publicados aguardando confirmação", TIPO_MEDIDOR,
+                            lambda: fila.estado()["em_voo"])
+registro_metricas.registrar("publicador_lotes_total", "Lotes por resultado da publicação", TIPO_CONTADOR,
+                            lambda: {"confirmado": fila.confirmados, "rejeitado": fila.rejeitados,
+                                     "falha": fila.falhas}, ("resultado",))
+registro_metricas.registrar("publicador_confirmacao_duracao_segundos",
+                            "Tempo entre publicar e a confirmação do broker", TIPO_HISTOGRAMA,
+                            lambda: fila.latencia_confirmacao.copia())
+registro_metricas.registrar("spool_lotes", "Lotes no spool aguardando reenvio", TIPO_MEDIDOR,
+                            lambda: len(spool.indice))
+registro_metricas.registrar("spool_bytes", "Tamanho do spool em disco", TIPO_MEDIDOR,
+                            lambda: spool.bytes)
+registro_metricas.registrar("spool_reenvios_total", "Reenvios do spool, por resultado", TIPO_CONTADOR,
+                            lambda: {"confirmado": spool.reenviados, "falha": spool.falhas}, ("resultado",))
+registro_metricas.registrar("admissao_recusas_total", "Escritas recusadas com 429, por motivo", TIPO_CONTADOR,
+                            lambda: dict(controle_admissao.recusas), ("motivo",))
+registro_metricas.registrar("admissao_saturado", "Buffer ou spool acima do limite de admissão (1) ou não (0)",
+                            TIPO_MEDIDOR, lambda: controle_admissao.saturacao() is not None)
+registro_metricas.registrar("cache_resultados_leituras_total",
+                            "Leituras do cache de /resultados (acerto, obsoleto ou falta)", TIPO_CONTADOR,
+                            lambda: {"acerto": cache_resultados.acertos, "obsoleto": cache_resultados.obsoletos,
+                                     "falta": cache_resultados.faltas}, ("resultado",))
+registro_metricas.registrar("cache_resultados_buscas_total", "Buscas de resultados no agregador, por resultado",
+                            TIPO_CONTADOR,
+                            lambda: {"ok": cache_resultados.buscas - cache_resultados.falhas,
+                                     "falha": cache_resultados.falhas}, ("resultado",))
+registro_metricas.registrar("simulacao_duracao_segundos", "Duração das simulações, por status final",
+                            TIPO_HISTOGRAMA, lambda: agendador_simulacao.histogramas_duracao(), ("status",))
+registro_metricas.registrar("simulacao_trabalhos_ativos", "Simulações na fila ou executando", TIPO_MEDIDOR,
+                            lambda: agendador_simulacao.ativos())
+registro_metricas.registrar("agregador_requisicao_duracao_segundos", "Latência das chamadas ao agregador",
+                            TIPO_HISTOGRAMA, lambda: cliente_agregador.histogramas_latencia(), ("caminho",))
+registro_metricas.registrar("agregador_disjuntor_aberto", "Disjuntor do agregador aberto (1) ou não (0)",
+                            TIPO_MEDIDOR, lambda: cliente_agregador.estado != FECHADO)
+registro_metricas.registrar("sse_conexoes", "Clientes conectados em /resultados/stream (WSGI)", TIPO_MEDIDOR,
+                            lambda: transmissor_resultados.conexoes)
+registro_metricas.registrar("saude_verificacao_ok", "Último resultado de cada verificação de saúde",
+                            TIPO_MEDIDOR, lambda: {nome: bool(v["ok"]) for nome, v in sonda_saude.estado().items()},
+                            ("verificacao",))
+registro_metricas.registrar("logs_descartados_total", "Registros de log descartados com a fila de escrita cheia",
+                            TIPO_CONTADOR, lambda: saida_logs.metricas()["descartados"])
+registro_metricas.registrar("logs_suprimidos_total", "Registros de log suprimidos pelo limite por categoria",
+                            TIPO_CONTADOR, lambda: saida_logs.metricas()["suprimidas"])
+registro_metricas.registrar("tempo_no_ar_segundos", "Segundos desde o início do processo", TIPO_MEDIDOR,
+                            lambda: sonda_saude.tempo_no_ar())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registro_metricas.exportar(), content_type=CONTENT_TYPE_METRICAS)
+
+@app.route('/health/live', methods=['GET'])
+def health_live():
+    """Processo vivo e atendendo: não consulta nenhuma dependência."""
+    return jsonify({"status": "alive", "tempo_no_ar_s": round(sonda_saude.tempo_no_ar(), 1)})
+
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    corpo, status = estado_prontidao()
+    return jsonify(corpo), status
+
+@app.route('/health', methods=['GET'])
+def health():
+    try:
+        return jsonify(estado_saude())
     except Exception as e:
         return jsonify({
             "status": "unhealthy",
             "error": str(e)
         }), 500
 
+def criar_app():
+    """
+    Cria os componentes (logs, publicador, lotes, spool, controle de admissão, registros, cache,
+    transmissão e sonda de saúde), inicia as threads de fundo e devolve o app
+    Flask. Chamadas seguintes devolvem o mesmo app sem recriar nada.
+
+    Nada aqui espera a rede: o RabbitMQ conecta na thread do publicador e o
+    agregador é consultado pelo poller e pela sonda. Até a primeira tentativa
+    de conexão com o broker terminar, /health/ready responde 503.
+
+    Returns:
+        Flask: O app com as rotas e os componentes prontos
+    """
+    global saida_logs, cliente_agregador, agregador_local, fila, wal, spool, lote, controle_admissao, registro_votantes
+    global agendador_simulacao, apuracao_local, registro_candidatos, cache_resultados
+    global transmissor_resultados, tickets_stream, assinante_agregador, sonda_saude
+    with _lock_criacao:
+        if sonda_saude is not None:
+            return app
+        inicio = time.perf_counter()
+        saida_logs = SaidaLogs(
+            formato=LOG_FORMATO,
+            nivel=LOG_NIVEL,
+            assincrono=LOG_ASSINCRONO,
+            taxa_categoria=LOG_TAXA_CATEGORIA,
+            rajada_categoria=LOG_RAJADA_CATEGORIA,
+            tamanho_fila=LOG_TAMANHO_FILA,
+            localizar_chamada=LOG_LOCALIZAR_CHAMADA
+        )
+        atexit.register(saida_logs.parar)
+
+        logger.info("=== CONFIGURAÇÕES CARREGADAS ===")
+        logger.info("RABBITMQ_HOST: %s", RABBITMQ_HOST)
+        logger.info("RABBITMQ_PORT: %s", RABBITMQ_PORT)
+        logger.info("RABBITMQ_USERNAME: %s", RABBITMQ_USERNAME)
+        logger.info("RABBITMQ_QUEUE: %s", RABBITMQ_QUEUE)
+        logger.info("RABBITMQ_FORMATO: %s", RABBITMQ_FORMATO)
+        logger.info("CORE_URL: %s", CORE_URL)
+        logger.info("AGGREGATOR_URL: %s", AGGREGATOR_URL)
+        logger.info("AGREGADOR_MODO: %s", AGREGADOR_MODO)
+        logger.info("===============================")
+
+        # Conexões keep-alive com o agregador, reaproveitadas pelo cache de resultados e pelo /health
+        cliente_agregador = ClienteAgregador(
+            AGGREGATOR_URL,
+            timeout_conexao=AGREGADOR_TIMEOUT_CONEXAO,
+            timeout_leitura=AGREGADOR_TIMEOUT_LEITURA,
+            tamanho_pool=AGREGADOR_TAMANHO_POOL,
+            max_retentativas=AGREGADOR_MAX_RETENTATIVAS,
+            falhas_para_abrir=AGREGADOR_FALHAS_PARA_ABRIR,
+            tempo_aberto=AGREGADOR_TEMPO_ABERTO
+        )
+        atexit.register(cliente_agregador.fechar)
+
+        if AGREGADOR_MODO == 'local':
+            agregador_local = AgregadorLocal(DATA_DIR, AGREGADOR_LOCAL_INTERVALO_SNAPSHOT,
+                                             AGREGADOR_LOCAL_INTERVALO_AVISO)
+            atexit.register(agregador_local.parar)
+
+        if agregador_local is not None and not AGREGADOR_LOCAL_RABBITMQ:
+            # Sem broker: os lotes vão direto para o agregador local e são confirmados na hora
+            fila = PublicadorLocal(agregador_local)
+        else:
+            fila = FilaRabbit(
+                RABBITMQ_HOST, RABBITMQ_PORT, RABBITMQ_USERNAME, RABBITMQ_PASSWORD, RABBITMQ_VIRTUAL_HOST,
+                RABBITMQ_QUEUE,
+                usar_ssl=RABBITMQ_SSL,
+                max_pendentes=RABBITMQ_MAX_PENDENTES,
+                max_em_voo=RABBITMQ_MAX_EM_VOO,
+                codec=CodecLote(RABBITMQ_FORMATO, RABBITMQ_COMPRESSAO)
+            )
+            if agregador_local is not None:
+                fila.adicionar_ouvinte(agregador_local.processar_lote)
+        atexit.register(fila.fechar)
+        wal = LogAntecipado(WAL_DIR, WAL_TAMANHO_SEGMENTO) if WAL_ATIVO else None
+        # Lotes que falharam ficam no spool e são reenviados em segundo plano, com backoff
+        spool = SpoolReenvio(
+            SPOOL_DIR, fila,
+            backoff_base=SPOOL_BACKOFF_BASE,
+            backoff_max=SPOOL_BACKOFF_MAX,
+            taxa_max=SPOOL_TAXA_MAX,
+            max_em_voo=SPOOL_MAX_EM_VOO,
+            caminho_legado=PENDENTES_PATH
+        )
+        atexit.register(spool.parar)
+        if LOTE_MODO == 'adaptativo':
+            lote = EnviadorLote(
+                fila, LOTE_TAMANHO_MAX, LOTE_ATRASO_ALVO, spool, wal=wal,
+                adaptativo=True,
+                tamanho_min=LOTE_TAMANHO_MIN,
+                publicacoes_alvo=LOTE_PUBLICACOES_ALVO
+            )
+        else:
+            lote = EnviadorLote(fila, MAX_BATCH, INTERVALO_ENVIO, spool, wal=wal)
+        atexit.register(lote.desligar)
+        # Limites de entrada: com o broker fora, buffer e spool param de crescer e as escritas recebem 429
+        controle_admissao = ControleAdmissao(
+            lote, spool,
+            max_buffer=ADMISSAO_MAX_BUFFER,
+            max_spool_lotes=ADMISSAO_MAX_SPOOL_LOTES,
+            max_spool_bytes=ADMISSAO_MAX_SPOOL_MB * 1024 * 1024,
+            taxa_cliente=ADMISSAO_TAXA_CLIENTE,
+            rajada_cliente=ADMISSAO_RAJADA_CLIENTE,
+            max_clientes=ADMISSAO_MAX_CLIENTES,
+            retry_after=ADMISSAO_RETRY_AFTER
+        )
+
+        registro_votantes = RegistroVotantes(
+            DATA_DIR,
+            limite_compactacao=LIMITE_COMPACTACAO_CPFS,
+            num_fragmentos=FRAGMENTOS_CPFS,
+            capacidade_filtro=BLOOM_CAPACIDADE,
+            taxa_fp_filtro=BLOOM_TAXA_FP
+        )
+        atexit.register(registro_votantes.fechar)
+
+        agendador_simulacao = AgendadorSimulacao(SIMULACAO_PROCESSOS, SIMULACAO_MAX_TRABALHOS,
+                                                 SIMULACAO_TAMANHO_BLOCO, max_cidades=SIMULACAO_MAX_CIDADES)
+        atexit.register(agendador_simulacao.desligar)
+
+        apuracao_local = ApuracaoLocal(DATA_DIR, APURACAO_FAIXAS, APURACAO_INTERVALO_SNAPSHOT)
+        atexit.register(apuracao_local.parar)
+
+        # Candidatos em memória; o arquivo é relido sozinho quando muda
+        registro_candidatos = RegistroCandidatos(CANDIDATOS_PATH, CANDIDATOS_INTERVALO_VERIFICACAO)
+        atexit.register(registro_candidatos.parar)
+
+        # Uma busca por vez ao agregador; as requisições recebem o último resultado sem esperar
+        cache_resultados = CacheResultados(
+            buscar_resultados_com_base,
+            ttl=CACHE_DURACAO,
+            ttl_negativo=CACHE_DURACAO_NEGATIVO,
+            max_obsoleto=CACHE_MAX_OBSOLETO
+        )
+        cache_resultados.adicionar_ouvinte(apuracao_local.fixar_base)
+
+        if RESULTADOS_INTERVALO_POLLER > 0:
+            cache_resultados.iniciar_poller(RESULTADOS_INTERVALO_POLLER)
+            atexit.register(cache_resultados.parar)
+
+        # Um único fluxo de atualizações (poller + aviso do agregador) alimenta todos os clientes SSE
+        transmissor_resultados = TransmissorResultados(
+            SNAPSHOT_VAZIO,
+            max_conexoes=SSE_MAX_CONEXOES,
+            duracao_max=SSE_DURACAO_MAX
+        )
+        cache_resultados.adicionar_ouvinte(transmissor_resultados.publicar)
+        tickets_stream = EmissorTickets(SSE_TICKET_VALIDADE)
+        assinante_agregador = AssinanteAgregador(AGREGADOR_WS_URL, cache_resultados.atualizar_agora)
+        if agregador_local is not None:
+            # O agregador local avisa direto quando chegam lotes novos, sem WebSocket
+            agregador_local.adicionar_ouvinte(cache_resultados.atualizar_agora)
+        elif AGREGADOR_WS_ATIVO:
+            assinante_agregador.iniciar()
+            atexit.register(assinante_agregador.parar)
+
+        sonda_saude = SondaSaude(SAUDE_INTERVALO_LOCAL)
+        sonda_saude.registrar("agregador", verificar_agregador, intervalo=SAUDE_INTERVALO_AGREGADOR)
+        sonda_saude.registrar("rabbitmq", verificar_rabbitmq, critica=SAUDE_RABBITMQ_CRITICO)
+        sonda_saude.registrar("resultados", verificar_resultados)
+        sonda_saude.registrar("disco", verificar_disco, critica=True)
+        sonda_saude.registrar("fsync", verificar_fsync, critica=True)
+        sonda_saude.iniciar()
+        atexit.register(sonda_saude.parar)
+
+        logger.info("🚀 Componentes criados em %.0f ms.", (time.perf_counter() - inicio) * 1000)
+    return app
+
 if __name__ == "__main__":
     print("INICIANDO SCRIPT app.py")
-    if fila.ch:
+    criar_app()
+    if fila.conectado:
         logger.info("Backend iniciado com conexão ao RabbitMQ estabelecida.")
     else:
-        logger.warning("Backend iniciado, mas sem conexão com RabbitMQ. Tentativas de reconexão ocorrerão.")
+        logger.warning("Backend iniciado; a conexão com o RabbitMQ está sendo estabelecida em segundo plano.")
     
-    waitress.serve(app, host='0.0.0.0', port=5001, threads=32)
+    waitress.serve(app, host='0.0.0.0', port=5001, threads=WAITRESS_THREADS + SSE_MAX_CONEXOES)
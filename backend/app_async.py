@@ -0,0 +1,467 @@
+"""
+Servidor ASGI opcional (Starlette + uvicorn) com as mesmas rotas e a mesma
+autenticação JWT do app.py.
+
+No modo WSGI cada requisição ocupa uma thread do waitress enquanto dura,
+inclusive as que esperam o agregador (/health) ou ficam abertas
+(/resultados/stream); um agregador lento pode deixar /votar sem threads. Aqui
+as requisições rodam em um único event loop:
+
+- /health e /health/ready só leem as verificações guardadas pela sonda de
+  saúde do app.py, sem chamar o agregador;
+- /resultados/stream é um gerador assíncrono, então milhares de clientes SSE
+  custam só memória (limite em ASGI_SSE_MAX_CONEXOES);
+- /votar, /votar/lote e /electionalternative usam as mesmas funções do app.py
+  (`processar_voto`, `processar_votos_lote`, `iniciar_simulacao`); o fsync em grupo do registro de
+  votantes e do WAL roda no threadpool, fora do loop; o controle de admissão
+  (429 com Retry-After) é o mesmo objeto do app.py;
+- os componentes (fila, lote, spool, caches, registros) são os mesmos
+  objetos criados pelo app.py, e /metrics exporta o mesmo registro de métricas.
+
+Os tokens são criados e validados pelo flask_jwt_extended com a configuração
+do app Flask, então um token vale nos dois modos.
+
+Importar este módulo não cria nada: os componentes e o app Starlette saem
+de `criar_app_asgi`, a fábrica passada ao uvicorn. Rode com um único processo
+(os componentes guardam estado em arquivos locais):
+
+    pip install -r requirements-async.txt
+    python -u app_async.py
+    # ou: uvicorn app_async:criar_app_asgi --factory --port 5001
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import uvicorn
+from jwt import ExpiredSignatureError, InvalidTokenError
+from flask_jwt_extended import create_access_token, decode_token
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import app as nucleo
+from controle_admissao import AdmissaoRecusada
+from metricas import CONTENT_TYPE as CONTENT_TYPE_METRICAS, TIPO_MEDIDOR
+from config import ADMIN_USERNAME, ADMIN_PASSWORD
+
+logger = logging.getLogger(__name__)
+
+ASGI_PORTA = int(os.getenv('ASGI_PORTA', 5001))
+# Conexões SSE simultâneas: no modo ASGI cada uma custa só memória, não uma thread
+ASGI_SSE_MAX_CONEXOES = int(os.getenv('ASGI_SSE_MAX_CONEXOES', 5000))
+# Com PROXIES_CONFIAVEIS (app.py) o uvicorn lê o X-Forwarded-For só das conexões vindas destes
+# endereços (separados por vírgula) e usa o endereço mais à direita que não é um deles, como o
+# ProxyFix. Nunca '*': com ele o uvicorn usa o primeiro endereço do header, que o cliente escolhe
+ASGI_IPS_PROXY = os.getenv('ASGI_IPS_PROXY', '127.0.0.1')
+
+
+# === AUTENTICAÇÃO ===
+
+def _erro_jwt(mensagem, status):
+    # Mesmo formato das respostas de erro do flask_jwt_extended
+    return JSONResponse({"msg": mensagem}, status_code=status)
+
+
+def _token(request):
+    cabecalho = request.headers.get('Authorization')
+    if cabecalho is None:
+        return None, _erro_jwt("Missing Authorization Header", 401)
+    partes = cabecalho.split()
+    if len(partes) != 2 or partes[0] != 'Bearer':
+        return None, _erro_jwt("Bad Authorization header. Expected 'Authorization: Bearer <JWT>'", 422)
+    return partes[1], None
+
+
+def jwt_obrigatorio(handler=None, aceitar_ticket=False):
+    """
+    Equivalente a @jwt_required(): guarda a identidade do token em request.state.identidade.
+
+    Com `aceitar_ticket`, um ?ticket= de /resultados/stream/ticket vale no lugar do header.
+    """
+    if handler is None:
+        return lambda h: jwt_obrigatorio(h, aceitar_ticket)
+
+    async def protegido(request):
+        ticket = request.query_params.get('ticket') if aceitar_ticket else None
+        if ticket is not None:
+            identidade = nucleo.tickets_stream.resgatar(ticket)
+            if identidade is None:
+                return _erro_jwt("Ticket inválido, vencido ou já usado", 401)
+            request.state.identidade = identidade
+            return await handler(request)
+        token, erro = _token(request)
+        if erro is not None:
+            return erro
+        try:
+            with nucleo.app.app_context():
+                claims = decode_token(token)
+        except ExpiredSignatureError:
+            return _erro_jwt("Token has expired", 401)
+        except InvalidTokenError as e:
+            return _erro_jwt(str(e), 422)
+        if claims.get('type') != 'access':
+            return _erro_jwt("Only non-refresh tokens are allowed", 422)
+        request.state.identidade = claims[nucleo.app.config['JWT_IDENTITY_CLAIM']]
+        return await handler(request)
+
+    return protegido
+
+
+async def _json(request):
+    """Corpo JSON da requisição, ou None se não for JSON válido."""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def responder_snapshot(request, snapshot):
+    """Devolve o corpo já serializado do snapshot, ou 304 se o cliente já tem essa versão."""
+    cabecalhos = {"ETag": f'"{snapshot.etag}"', "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get('If-None-Match', '')
+    etags = {valor.strip().removeprefix('W/').strip('"') for valor in if_none_match.split(',')}
+    if snapshot.etag in etags or '*' in etags:
+        return Response(status_code=304, headers=cabecalhos)
+    return Response(snapshot.corpo, media_type='application/json', headers=cabecalhos)
+
+
+# === RESULTADOS AO VIVO ===
+
+class TransmissaoAsync:
+    """
+    Clientes SSE do modo ASGI sobre o mesmo TransmissorResultados do modo WSGI.
+
+    Os eventos são os já serializados pelo transmissor; em vez de uma thread
+    por cliente presa na Condition, cada cliente é um gerador assíncrono que
+    espera um asyncio.Event, trocado a cada nova versão.
+    """
+
+    def __init__(self, transmissor, max_conexoes):
+        self.transmissor = transmissor
+        self.max_conexoes = max_conexoes
+        self.conexoes = 0
+        self._loop = None
+        self._mudou = None
+
+    def iniciar(self):
+        """Chamada dentro do event loop (lifespan)."""
+        self._loop = asyncio.get_running_loop()
+        self._mudou = asyncio.Event()
+        self.transmissor.adicionar_ouvinte(lambda: self._loop.call_soon_threadsafe(self._acordar))
+
+    def _acordar(self):
+        mudou, self._mudou = self._mudou, asyncio.Event()
+        mudou.set()
+
+    def disponivel(self):
+        # Limite aproximado: a vaga só é ocupada quando o gerador começa a rodar
+        return self.conexoes < self.max_conexoes
+
+    async def eventos(self, ultimo_id):
+        transmissor = self.transmissor
+        self.conexoes += 1
+        try:
+            fim = self._loop.time() + transmissor.duracao_max
+            yield b"retry: 3000\n\n"
+            with transmissor.condicao:
+                versao, evento = transmissor.primeiro_evento(ultimo_id)
+            while True:
+                if evento:
+                    transmissor.eventos_enviados += 1
+                    yield evento
+                restante = fim - self._loop.time()
+                if restante <= 0:
+                    return
+                mudou = self._mudou
+                if transmissor.versao == versao:
+                    try:
+                        await asyncio.wait_for(mudou.wait(), min(transmissor.intervalo_keepalive, restante))
+                    except asyncio.TimeoutError:
+                        pass
+                with transmissor.condicao:
+                    evento, versao = transmissor.proximo_evento(versao)
+        finally:
+            self.conexoes -= 1
+
+    def metricas(self):
+        return {"conexoes": self.conexoes, "max_conexoes": self.max_conexoes}
+
+
+# Criado por criar_app_asgi, junto com os componentes do app.py
+transmissao_async = None
+
+
+# === MÉTRICAS ===
+
+class MedirRequisicoes:
+    """
+    Middleware ASGI que observa o tempo até o início da resposta de cada rota
+    no mesmo histograma do app.py (para o SSE, o tempo até abrir o stream).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._rotas = None
+
+    def _rota(self, scope):
+        if self._rotas is None:
+            self._rotas = {rota.endpoint: rota.path for rota in scope["app"].routes}
+        return self._rotas.get(scope.get("endpoint"), "nao_encontrada")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                nucleo.duracao_requisicoes.observar(time.perf_counter() - inicio, self._rota(scope),
+                                                    scope["method"], mensagem["status"])
+            await send(mensagem)
+
+        await self.app(scope, receive, enviar)
+
+
+# === ROTAS ===
+
+async def index(request):
+    return JSONResponse({"message": "API de votação rodando!"})
+
+
+async def login(request):
+    try:
+        data = await _json(request) or {}
+        username = data.get('username')
+        password = data.get('password')
+
+        if not username or not password:
+            return JSONResponse({"erro": "Usuário e senha são obrigatórios"}, 400)
+
+        if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
+            with nucleo.app.app_context():
+                access_token = create_access_token(identity=username)
+            return JSONResponse({
+                "message": "Login realizado com sucesso",
+                "access_token": access_token,
+                "username": username
+            })
+        return JSONResponse({"erro": "Credenciais inválidas"}, 401)
+
+    except Exception as e:
+        logger.error("Erro no login: %s", e)
+        return JSONResponse({"erro": "Erro interno no servidor"}, 500)
+
+
+@jwt_obrigatorio
+async def verify_token(request):
+    return JSONResponse({"valid": True, "username": request.state.identidade})
+
+
+def _recusa(recusa):
+    return JSONResponse({"erro": str(recusa), "motivo": recusa.motivo}, 429,
+                        headers={"Retry-After": str(recusa.retry_after_s)})
+
+
+def _cliente(request):
+    return request.client.host if request.client else None
+
+
+@jwt_obrigatorio
+async def votar(request):
+    try:
+        nucleo.controle_admissao.admitir(_cliente(request))
+        # O registro do CPF e o WAL esperam fsync: fora do event loop
+        corpo, status = await run_in_threadpool(nucleo.processar_voto, await _json(request))
+        return JSONResponse(corpo, status)
+    except AdmissaoRecusada as e:
+        return _recusa(e)
+    except Exception as e:
+        logger.error("Erro ao processar voto: %s", e)
+        return JSONResponse({"erro": "Erro interno"}, 500)
+
+
+def _votar_lote(corpo, ndjson):
+    if ndjson:
+        dados = nucleo.ler_votos_ndjson(corpo.splitlines())
+    else:
+        try:
+            dados = json.loads(corpo)
+        except ValueError:
+            dados = None
+    resposta, status = nucleo.processar_votos_lote(dados)
+    return json.dumps(resposta, ensure_ascii=False).encode(), status
+
+
+@jwt_obrigatorio
+async def votar_lote(request):
+    try:
+        # Antes de ler o corpo: um lote recusado não custa nem o parse
+        nucleo.controle_admissao.admitir(_cliente(request))
+        ndjson = request.headers.get('content-type', '').split(';')[0].strip() in nucleo.TIPOS_NDJSON
+        # Ler, validar, registrar e serializar dezenas de milhares de votos: tudo fora do event loop
+        corpo, status = await run_in_threadpool(_votar_lote, await request.body(), ndjson)
+        return Response(corpo, status, media_type='application/json')
+    except AdmissaoRecusada as e:
+        return _recusa(e)
+    except Exception as e:
+        logger.error("Erro ao processar lote de votos: %s", e)
+        return JSONResponse({"erro": "Erro interno"}, 500)
+
+
+@jwt_obrigatorio
+async def resultados(request):
+    try:
+        # Com o cache frio a leitura pode esperar a busca ao agregador: fora do event loop
+        snapshot = await run_in_threadpool(nucleo.cache_resultados.obter_snapshot)
+        return responder_snapshot(request, snapshot or nucleo.SNAPSHOT_VAZIO)
+    except Exception as e:
+        logger.error("Erro inesperado ao buscar resultados: %s", e)
+        return JSONResponse(nucleo.gerar_resposta_vazia_estruturada())
+
+
+@jwt_obrigatorio
+async def resultados_provisorios(request):
+    try:
+        pendentes = nucleo.apuracao_local.pendentes()
+        snapshot = await run_in_threadpool(nucleo.cache_resultados.obter_snapshot) or nucleo.SNAPSHOT_VAZIO
+        resposta = nucleo.mesclar_provisorios(snapshot.dados, pendentes)
+        resposta["provisorio"] = True
+        resposta["votos_pendentes"] = sum(pendentes.values())
+        return JSONResponse(resposta)
+    except Exception as e:
+        logger.error("Erro ao montar resultados provisórios: %s", e)
+        return JSONResponse({"erro": "Erro interno"}, 500)
+
+
+@jwt_obrigatorio
+async def resultados_stream_ticket(request):
+    return JSONResponse(nucleo.emitir_ticket_stream(request.state.identidade))
+
+
+@jwt_obrigatorio(aceitar_ticket=True)
+async def resultados_stream(request):
+    snapshot = nucleo.cache_resultados.snapshot
+    if snapshot is not None:
+        nucleo.transmissor_resultados.publicar(snapshot)
+    if not transmissao_async.disponivel():
+        mensagem = f"Limite de {transmissao_async.max_conexoes} conexões de resultados atingido"
+        logger.warning("[RESULTADOS] %s", mensagem)
+        return JSONResponse({"erro": mensagem}, 503, headers={"Retry-After": "30"})
+    return StreamingResponse(
+        transmissao_async.eventos(request.headers.get('Last-Event-ID') or request.query_params.get('ultimo_id')),
+        media_type='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@jwt_obrigatorio
+async def electionalternative(request):
+    try:
+        nucleo.controle_admissao.admitir(_cliente(request))
+    except AdmissaoRecusada as e:
+        return _recusa(e)
+    corpo, status = await run_in_threadpool(nucleo.iniciar_simulacao, await _json(request))
+    return JSONResponse(corpo, status)
+
+
+@jwt_obrigatorio
+async def electionalternative_status(request):
+    trabalho = nucleo.agendador_simulacao.consultar(request.path_params['job_id'])
+    if trabalho is None:
+        return JSONResponse({"erro": "Simulação não encontrada"}, 404)
+    return JSONResponse(trabalho.como_dict())
+
+
+@jwt_obrigatorio
+async def get_candidatos(request):
+    try:
+        eleicao = nucleo.registro_candidatos.eleicao(request.query_params.get('eleicao', nucleo.ELEICAO_PADRAO))
+        if eleicao is None:
+            return JSONResponse({"erro": "Eleição não encontrada"}, 404)
+        return responder_snapshot(request, eleicao.snapshot)
+    except Exception as e:
+        logger.error("[CANDIDATOS] Erro ao obter candidatos: %s", e)
+        return JSONResponse({"erro": "Erro interno ao obter candidatos"}, 500)
+
+
+async def health_live(request):
+    return JSONResponse({"status": "alive", "tempo_no_ar_s": round(nucleo.sonda_saude.tempo_no_ar(), 1)})
+
+
+async def health_ready(request):
+    corpo, status = nucleo.estado_prontidao()
+    return JSONResponse(corpo, status)
+
+
+async def health(request):
+    try:
+        return JSONResponse({**nucleo.estado_saude(), "servidor": "asgi",
+                             "transmissao_async": transmissao_async.metricas()})
+    except Exception as e:
+        return JSONResponse({"status": "unhealthy", "error": str(e)}, 500)
+
+
+async def metrics(request):
+    return Response(nucleo.registro_metricas.exportar(), headers={"Content-Type": CONTENT_TYPE_METRICAS})
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    transmissao_async.iniciar()
+    yield
+
+
+ROTAS = [
+    Route('/', index),
+    Route('/login', login, methods=['POST']),
+    Route('/verify-token', verify_token),
+    Route('/votar', votar, methods=['POST']),
+    Route('/votar/lote', votar_lote, methods=['POST']),
+    Route('/resultados', resultados),
+    Route('/resultados/provisorios', resultados_provisorios),
+    Route('/resultados/stream', resultados_stream),
+    Route('/resultados/stream/ticket', resultados_stream_ticket, methods=['POST']),
+    Route('/electionalternative', electionalternative, methods=['POST']),
+    Route('/electionalternative/{job_id}', electionalternative_status),
+    Route('/candidatos', get_candidatos),
+    Route('/health', health),
+    Route('/health/live', health_live),
+    Route('/health/ready', health_ready),
+    Route('/metrics', metrics),
+]
+
+
+def criar_app_asgi():
+    """
+    Fábrica do app Starlette (`uvicorn.run(..., factory=True)`).
+
+    Cria os componentes do app.py (fila, lote, spool, caches, registros), que
+    ficam compartilhados com o app Flask, e a transmissão SSE assíncrona sobre
+    o mesmo TransmissorResultados. Como `nucleo.criar_app`, pode ser chamada
+    mais de uma vez: os componentes só são criados na primeira.
+    """
+    global transmissao_async
+    nucleo.criar_app()
+    if transmissao_async is None:
+        transmissao_async = TransmissaoAsync(nucleo.transmissor_resultados, ASGI_SSE_MAX_CONEXOES)
+        nucleo.registro_metricas.registrar("asgi_sse_conexoes", "Clientes conectados em /resultados/stream (ASGI)",
+                                           TIPO_MEDIDOR, lambda: transmissao_async.conexoes)
+    return Starlette(
+        routes=ROTAS,
+        middleware=[Middleware(MedirRequisicoes),
+                    Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+        lifespan=ciclo_de_vida
+    )
+
+
+if __name__ == "__main__":
+    logger.info("Backend iniciado em modo ASGI (uvicorn).")
+    uvicorn.run("app_async:criar_app_asgi", factory=True, host='0.0.0.0', port=ASGI_PORTA, log_level='warning',
+                proxy_headers=nucleo.PROXIES_CONFIAVEIS > 0, forwarded_allow_ips=ASGI_IPS_PROXY)
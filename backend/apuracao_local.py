@@ -0,0 +1,161 @@
+import os
+import json
+import logging
+import threading
+import itertools
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class Faixa:
+    """Parte da contagem: um Counter de (type, objectIdentifier) com o próprio lock."""
+    __slots__ = ('contagem', 'lock')
+
+    def __init__(self):
+        self.contagem = Counter()
+        self.lock = threading.Lock()
+
+
+class ApuracaoLocal:
+    """
+    Contagem em memória dos votos aceitos por este backend, por `type` e
+    `objectIdentifier`, para resultados provisórios sem esperar o lote, o
+    RabbitMQ e o agregador.
+
+    A contagem é dividida em faixas, uma por thread (atribuídas em rodízio na
+    primeira escrita), então as threads do waitress quase nunca disputam o
+    mesmo lock; a leitura soma as faixas. Os totais são gravados de tempos em
+    tempos em `apuracao_local.json` e recarregados na inicialização.
+
+    Para mesclar com o agregador sem contar duas vezes, a apuração guarda uma
+    base: os totais locais no início da busca que gerou o snapshot em uso.
+    Os votos pendentes são os aceitos depois dessa base. Votos aceitos antes da
+    busca que o agregador ainda não tinha processado ficam de fora até o
+    próximo snapshot (a contagem provisória erra para menos, nunca para mais).
+    """
+
+    def __init__(self, diretorio, num_faixas=16, intervalo_snapshot=5.0):
+        """
+        Args:
+            diretorio: Pasta onde fica o snapshot `apuracao_local.json`
+            num_faixas (int): Quantidade de faixas da contagem
+            intervalo_snapshot (float): Segundos entre gravações do snapshot
+        """
+        self.caminho = os.path.join(diretorio, 'apuracao_local.json')
+        self.intervalo_snapshot = intervalo_snapshot
+        self.faixas = [Faixa() for _ in range(num_faixas)]
+        self._proxima_faixa = itertools.count()
+        self._local = threading.local()
+        self.lock = threading.Lock()
+        self.base = Counter()
+        self._base_leitura = Counter()
+        self.snapshots = 0
+        self._gravado = None
+        self._parar = threading.Event()
+
+        os.makedirs(diretorio, exist_ok=True)
+        self._recuperar()
+        threading.Thread(target=self._gravar_periodicamente, name="apuracao-local", daemon=True).start()
+
+    def _faixa(self):
+        faixa = getattr(self._local, 'faixa', None)
+        if faixa is None:
+            faixa = self._local.faixa = self.faixas[next(self._proxima_faixa) % len(self.faixas)]
+        return faixa
+
+    def _recuperar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                salvos = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error("Snapshot da apuração local ilegível em %s: %s. Começando do zero.",
+                         self.caminho, e)
+            return
+        contagem = self.faixas[0].contagem
+        for tipo, objetos in salvos.items():
+            for objeto, valor in objetos.items():
+                contagem[(tipo, objeto)] += valor
+        self._gravado = self.totais()
+        logger.info("🧮 Apuração local carregada com %s votos.", sum(contagem.values()))
+
+    def registrar(self, tipo, objeto, valor=1):
+        faixa = self._faixa()
+        with faixa.lock:
+            faixa.contagem[(tipo, objeto)] += valor
+
+    def registrar_varios(self, votos):
+        """Conta uma lista de votos no formato de `criar_voto` (type, objectIdentifier, valor)."""
+        faixa = self._faixa()
+        with faixa.lock:
+            for voto in votos:
+                faixa.contagem[(voto["type"], voto["objectIdentifier"])] += voto.get("valor", 1)
+
+    def totais(self):
+        """Soma das faixas: {(type, objectIdentifier): votos}."""
+        totais = Counter()
+        for faixa in self.faixas:
+            with faixa.lock:
+                totais.update(faixa.contagem)
+        return totais
+
+    def marcar_leitura(self):
+        """Chamada no início de cada busca ao agregador: guarda os totais do momento."""
+        totais = self.totais()
+        with self.lock:
+            self._base_leitura = totais
+
+    def fixar_base(self, *_):
+        """Ouvinte do cache: o snapshot novo do agregador passa a cobrir os votos até a última leitura."""
+        with self.lock:
+            self.base = self._base_leitura
+
+    def pendentes(self):
+        """Votos aceitos depois da base: {(type, objectIdentifier): votos}."""
+        totais = self.totais()
+        with self.lock:
+            totais.subtract(self.base)
+        return +totais
+
+    def gravar(self):
+        """Grava os totais no snapshot (arquivo temporário + fsync + rename), se mudaram."""
+        totais = self.totais()
+        if totais == self._gravado:
+            return
+        salvos = {}
+        for (tipo, objeto), valor in totais.items():
+            salvos.setdefault(tipo, {})[objeto] = valor
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(salvos, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho)
+        self._gravado = totais
+        self.snapshots += 1
+
+    def _gravar_periodicamente(self):
+        while not self._parar.wait(self.intervalo_snapshot):
+            try:
+                self.gravar()
+            except Exception as e:
+                logger.error("💥 Falha ao gravar snapshot da apuração local: %s", e)
+
+    def parar(self):
+        self._parar.set()
+        try:
+            self.gravar()
+        except Exception as e:
+            logger.error("💥 Falha ao gravar snapshot da apuração local: %s", e)
+
+    def metricas(self):
+        totais = self.totais()
+        return {
+            "votos": sum(totais.values()),
+            "chaves": len(totais),
+            "pendentes": sum(self.pendentes().values()),
+            "faixas": len(self.faixas),
+            "snapshots": self.snapshots
+        }
@@ -0,0 +1,102 @@
+import logging
+import threading
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+logger = logging.getLogger(__name__)
+
+
+def _quadro_stomp(comando, cabecalhos):
+    linhas = [comando] + [f"{chave}:{valor}" for chave, valor in cabecalhos.items()]
+    return "\n".join(linhas) + "\n\n\x00"
+
+
+class AssinanteAgregador:
+    """
+    Assina as atualizações em tempo real do Aggregator Node (STOMP sobre WebSocket).
+
+    O agregador publica no tópico `/topic/aggregated` a cada lote processado. A
+    mensagem é usada só como aviso de mudança: `ao_notificar` dispara uma busca
+    coalescida dos resultados, assim o formato servido continua o mesmo do REST.
+    Usa o pacote opcional `websocket-client`; sem ele (ou sem conexão), os
+    resultados seguem chegando pelo poller.
+    """
+
+    def __init__(self, url, ao_notificar, topico='/topic/aggregated', intervalo_reconexao=5, intervalo_max=60):
+        """
+        Args:
+            url: Endereço WebSocket do endpoint STOMP (ex.: wss://host/ws/websocket)
+            ao_notificar: Função chamada a cada mensagem recebida
+            topico (str): Destino STOMP assinado
+            intervalo_reconexao (float): Espera inicial (s) entre reconexões
+            intervalo_max (float): Espera máxima (s) entre reconexões
+        """
+        self.url = url
+        self.ao_notificar = ao_notificar
+        self.topico = topico
+        self.intervalo_reconexao = intervalo_reconexao
+        self.intervalo_max = intervalo_max
+        self.conectado = False
+        self.mensagens = 0
+        self._ws = None
+        self._conectou = False
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        if websocket is None:
+            logger.info("Pacote websocket-client não instalado. Resultados seguem só pelo poller.")
+            return False
+        threading.Thread(target=self._rodar, name="assinante-agregador", daemon=True).start()
+        return True
+
+    def _rodar(self):
+        espera = self.intervalo_reconexao
+        while not self._parar.is_set():
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._ao_abrir,
+                on_message=self._ao_receber,
+                on_error=lambda ws, erro: logger.warning("⚠️ WebSocket do agregador: %s", erro),
+                on_close=self._ao_fechar
+            )
+            self._conectou = False
+            self._ws.run_forever(ping_interval=30, ping_timeout=10)
+            if self._conectou:
+                espera = self.intervalo_reconexao
+            self._parar.wait(espera)
+            espera = min(self.intervalo_max, espera * 2)
+
+    def _ao_abrir(self, ws):
+        ws.send(_quadro_stomp("CONNECT", {"accept-version": "1.2,1.1", "heart-beat": "0,0"}))
+        ws.send(_quadro_stomp("SUBSCRIBE", {"id": "resultados-0", "destination": self.topico}))
+
+    def _ao_receber(self, ws, mensagem):
+        comando = mensagem.split("\n", 1)[0].strip()
+        if comando == "CONNECTED":
+            self.conectado = self._conectou = True
+            logger.info("✅ Assinando %s no agregador.", self.topico)
+        elif comando == "MESSAGE":
+            self.mensagens += 1
+            self.ao_notificar()
+        elif comando == "ERROR":
+            logger.warning("⚠️ Erro STOMP do agregador: %s", mensagem[:200])
+
+    def _ao_fechar(self, ws, codigo, motivo):
+        if self.conectado:
+            logger.warning("⚠️ Conexão WebSocket com o agregador encerrada. Tentando reconectar...")
+        self.conectado = False
+
+    def parar(self):
+        self._parar.set()
+        if self._ws is not None:
+            self._ws.close()
+
+    def metricas(self):
+        return {
+            "disponivel": websocket is not None,
+            "conectado": self.conectado,
+            "mensagens": self.mensagens
+        }
@@ -0,0 +1,53 @@
+import time
+import threading
+
+
+class BaldeFichas:
+    """
+    Limitador de taxa por balde de fichas (token bucket).
+
+    O balde enche `taxa` fichas por segundo até `capacidade`; cada operação
+    consome uma ficha. Permite rajadas curtas sem passar da taxa média.
+    """
+
+    def __init__(self, taxa, capacidade=None):
+        """
+        Args:
+            taxa (float): Fichas repostas por segundo
+            capacidade (float): Tamanho máximo da rajada (padrão: `taxa`)
+        """
+        self.taxa = float(taxa)
+        self.capacidade = float(capacidade if capacidade is not None else max(1.0, taxa))
+        self.fichas = self.capacidade
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _repor(self, agora):
+        self.fichas = min(self.capacidade, self.fichas + (agora - self.ultimo) * self.taxa)
+        self.ultimo = agora
+
+    def tentar(self, fichas=1):
+        """
+        Tenta retirar fichas sem esperar.
+
+        Returns:
+            float: 0.0 se conseguiu; senão, segundos até haver fichas suficientes
+        """
+        with self.lock:
+            self._repor(time.monotonic())
+            if self.fichas >= fichas:
+                self.fichas -= fichas
+                return 0.0
+            return (fichas - self.fichas) / self.taxa
+
+    def retirar(self, fichas=1, parar=None):
+        """Bloqueia até conseguir as fichas (ou até o Event `parar` ser ligado)."""
+        while True:
+            espera = self.tentar(fichas)
+            if espera == 0.0:
+                return True
+            if parar is not None:
+                if parar.wait(espera):
+                    return False
+            else:
+                time.sleep(espera)
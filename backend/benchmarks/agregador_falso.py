@@ -0,0 +1,82 @@
+"""
+Aggregator Node falso para testes de carga locais, no lugar do agregador-node.
+
+Responde /actuator/health e /api/aggregator/results (com uma lista fixa de
+resultados) depois de `atraso` segundos. O atraso pode ser trocado com o
+servidor rodando, para simular um agregador que fica lento no meio do teste.
+
+Uso isolado:
+    python benchmarks/agregador_falso.py --porta 8080 --atraso 2
+"""
+import time
+import json
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RESULTADOS = {
+    "dadosAgregados": [{"type": "eleicao", "lista": [{"objectIdentifier": "Bento Neves", "somatorio": 10}]}],
+    "totalLotesProcessadosGlobal": 1,
+    "totalItensDeDadosProcessadosGlobal": 10
+}
+
+
+class AgregadorFalso:
+    def __init__(self, host='127.0.0.1', porta=0, atraso=0.0):
+        self.host = host
+        self.porta = porta
+        self.atraso = atraso
+        self.requisicoes = 0
+        self._servidor = None
+
+    def iniciar(self):
+        """Sobe o servidor em uma thread própria e devolve a porta escolhida."""
+        agregador = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                agregador.requisicoes += 1
+                time.sleep(agregador.atraso)
+                corpo = RESULTADOS if self.path.startswith('/api/aggregator/results') else {"status": "UP"}
+                dados = json.dumps(corpo).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+        self._servidor = ThreadingHTTPServer((self.host, self.porta), Manipulador)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, name="agregador-falso", daemon=True).start()
+        self.porta = self._servidor.server_address[1]
+        return self.porta
+
+    def parar(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8080)
+    parser.add_argument('--atraso', type=float, default=0.0)
+    args = parser.parse_args()
+
+    agregador = AgregadorFalso(args.host, args.porta, args.atraso)
+    print(f"Agregador falso ouvindo em {args.host}:{agregador.iniciar()}")
+    try:
+        while True:
+            time.sleep(5)
+    except KeyboardInterrupt:
+        agregador.parar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark do AgendadorSimulacao: tempo para simular N cidades com 1, 2, 4...
+processos no pool, até o número de núcleos da máquina.
+
+O consumidor só conta as cidades recebidas, então o tempo medido é o da
+simulação em paralelo mais a formatação dos blocos no processo principal.
+
+Uso:
+    python benchmarks/bench_agendador_simulacao.py
+    python benchmarks/bench_agendador_simulacao.py --cidades 200000 --tamanho-bloco 2000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agendador_simulacao import AgendadorSimulacao
+
+PARTIDOS = ["Pedro Alcântara", "Maria Bragança", "João Vasconcelos", "Bento Neves"]
+
+
+def medir(processos, num_cidades, populacao_total, tamanho_bloco):
+    agendador = AgendadorSimulacao(processos=processos, tamanho_bloco=tamanho_bloco, max_cidades=num_cidades)
+    recebidas = []
+    # Aquece o pool para não medir a criação dos processos
+    agendador._pool().submit(int).result()
+
+    inicio = time.perf_counter()
+    trabalho = agendador.submeter(num_cidades, PARTIDOS, populacao_total,
+                                  consumidor=lambda r: recebidas.append(len(r)), semente=1)
+    while trabalho.status not in ("concluido", "falhou"):
+        time.sleep(0.01)
+    duracao = time.perf_counter() - inicio
+    agendador.desligar()
+    if trabalho.status == "falhou":
+        raise RuntimeError(trabalho.erro)
+    return duracao, sum(recebidas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cidades', type=int, default=100_000)
+    parser.add_argument('--eleitores-por-cidade', type=int, default=1_000)
+    parser.add_argument('--tamanho-bloco', type=int, default=5_000)
+    parser.add_argument('--max-processos', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    processos = [1]
+    while processos[-1] * 2 <= args.max_processos:
+        processos.append(processos[-1] * 2)
+    if processos[-1] != args.max_processos:
+        processos.append(args.max_processos)
+
+    print(f"{args.cidades:,} cidades, blocos de {args.tamanho_bloco:,}")
+    print(f"{'processos':>9} | {'tempo (s)':>9} | {'speedup':>7} | {'eficiência':>10}")
+    base = None
+    for n in processos:
+        duracao, cidades = medir(n, args.cidades, args.cidades * args.eleitores_por_cidade, args.tamanho_bloco)
+        assert cidades == args.cidades
+        base = base or duracao
+        print(f"{n:>9} | {duracao:>9.3f} | {base / duracao:>7.2f} | {base / duracao / n:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Mede o agregador local (agregador_local.py) contra a forma ingênua de calcular
+as estatísticas: guardar todos os valores e reordenar para achar a mediana a
+cada leitura de resultados.
+
+Cenários:
+    votos - votos individuais (valor 1) em 5 candidatos
+    iot   - leituras de sensores com valores reais variados
+
+Para cada cenário processa `--itens` itens em lotes de `--tamanho-lote`, lendo
+os resultados a cada `--leitura-a-cada` lotes (como o cache de /resultados
+faria), e mostra o custo por item, o tempo de uma leitura no fim e quantos
+valores cada forma guarda na memória.
+
+Uso:
+    python benchmarks/bench_agregador_local.py
+    python benchmarks/bench_agregador_local.py --itens 1000000 --tamanho-lote 500
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agregador_local import AgregadorLocal
+
+CANDIDATOS = ["Bento Neves", "Maria Oliveira", "João Pereira", "Ana Costa", "Voto Nulo"]
+SENSORES = [f"sensor-{i:03d}" for i in range(20)]
+
+
+def gerar_lotes(cenario, itens, tamanho):
+    for numero in range(0, itens, tamanho):
+        if cenario == "votos":
+            pontos = [{"type": "eleicao", "objectIdentifier": random.choice(CANDIDATOS), "valor": 1}
+                      for _ in range(tamanho)]
+        else:
+            pontos = [{"type": "iot", "objectIdentifier": random.choice(SENSORES),
+                       "valor": round(random.gauss(25, 5), 2)} for _ in range(tamanho)]
+        yield {"batchId": f"BATCH_{numero}", "sourceNodeId": "GRUPO_1", "dataPoints": pontos}
+
+
+class AgregadorIngenuo:
+    """Guarda todos os valores e reordena na leitura."""
+
+    def __init__(self):
+        self.valores = defaultdict(list)
+
+    def processar_lote(self, pacote):
+        for item in pacote["dataPoints"]:
+            self.valores[(item["type"], item["objectIdentifier"])].append(item["valor"])
+
+    def resultados(self):
+        return {chave: (sum(v), len(v), statistics.median(v)) for chave, v in self.valores.items()}
+
+    def guardados(self):
+        return sum(len(v) for v in self.valores.values())
+
+
+def rodar(agregador, lotes, leitura_a_cada):
+    inicio = time.perf_counter()
+    for numero, lote in enumerate(lotes, 1):
+        agregador.processar_lote(lote)
+        if numero % leitura_a_cada == 0:
+            agregador.resultados()
+    total = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    resultados = agregador.resultados()
+    return total, time.perf_counter() - inicio, resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--itens', type=int, default=200_000)
+    parser.add_argument('--tamanho-lote', type=int, default=200)
+    parser.add_argument('--leitura-a-cada', type=int, default=50, help="lotes entre leituras de resultados")
+    args = parser.parse_args()
+
+    print(f"{args.itens} itens em lotes de {args.tamanho_lote}, leitura a cada {args.leitura_a_cada} lotes")
+    print(f"{'cenário':>8} | {'forma':>8} | {'µs/item':>8} | {'leitura ms':>10} | {'valores guardados':>17}")
+    for cenario in ("votos", "iot"):
+        random.seed(42)
+        lotes = list(gerar_lotes(cenario, args.itens, args.tamanho_lote))
+        with tempfile.TemporaryDirectory() as diretorio:
+            local = AgregadorLocal(diretorio, intervalo_snapshot=3600)
+            total, leitura, resultados = rodar(local, lotes, args.leitura_a_cada)
+            guardados = local.metricas()["valores_distintos"]
+            local.parar()
+        ingenuo = AgregadorIngenuo()
+        total_i, leitura_i, resultados_i = rodar(ingenuo, lotes, args.leitura_a_cada)
+
+        # As duas formas precisam chegar à mesma mediana
+        for tipo in resultados["dadosAgregados"]:
+            for item in tipo["lista"]:
+                esperado = resultados_i[(tipo["type"], item["objectIdentifier"])][2]
+                assert abs(item["mediana"] - esperado) < 1e-9, (item, esperado)
+
+        for forma, t, l, g in (("local", total, leitura, guardados), ("ingênua", total_i, leitura_i, ingenuo.guardados())):
+            print(f"{cenario:>8} | {forma:>8} | {t / args.itens * 1e6:>8.2f} | {l * 1e3:>10.3f} | {g:>17}")
+
+
+if __name__ == '__main__':
+    main()
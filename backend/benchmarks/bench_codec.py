@@ -0,0 +1,101 @@
+"""
+Compara o formato colunar do codec_lote com json.dumps para lotes típicos.
+
+Cenários:
+    votos     - votos individuais (valor 1, um horário por voto, 5 candidatos)
+    simulacao - saída agregada da simulação (um data point por cidade/partido,
+                mesmo horário, valores variados)
+
+Para cada tamanho de lote mede bytes por voto e o tempo de serialização por
+voto (µs); a decodificação é conferida para garantir que o lote volta idêntico.
+
+Uso:
+    python benchmarks/bench_codec.py
+    python benchmarks/bench_codec.py --tamanhos 30 1000 --repeticoes 200
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codec_lote import CodecLote, decodificar, zstandard
+
+CANDIDATOS = ["Bento Neves", "Maria Oliveira", "João Pereira", "Ana Costa", "Voto Nulo"]
+
+
+def lote_votos(tamanho):
+    inicio = datetime.now()
+    return {
+        "batchId": "BATCH_0123456789ab",
+        "sourceNodeId": "GRUPO_1",
+        "dataPoints": [
+            {
+                "type": "eleicao",
+                "objectIdentifier": random.choice(CANDIDATOS),
+                "valor": 1,
+                "eventDatetime": (inicio + timedelta(microseconds=random.randint(1, 5000) * i)).isoformat()
+            }
+            for i in range(tamanho)
+        ]
+    }
+
+
+def lote_simulacao(tamanho):
+    momento = datetime.now().isoformat()
+    return {
+        "batchId": "BATCH_0123456789ab",
+        "sourceNodeId": "GRUPO_1",
+        "dataPoints": [
+            {"type": "eleicao", "objectIdentifier": CANDIDATOS[i % len(CANDIDATOS)],
+             "valor": random.randint(0, 50_000), "eventDatetime": momento}
+            for i in range(tamanho)
+        ]
+    }
+
+
+def medir(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    return (time.perf_counter() - inicio) / repeticoes, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[30, 300, 3000])
+    parser.add_argument('--repeticoes', type=int, default=100)
+    args = parser.parse_args()
+
+    codecs = {
+        "colunar": CodecLote('colunar', 'nenhuma'),
+        "colunar+zlib": CodecLote('colunar', 'zlib', nivel=1),
+    }
+    if zstandard is not None:
+        codecs["colunar+zstd"] = CodecLote('colunar', 'zstd')
+    else:
+        print("(pacote zstandard não instalado: zstd fora da comparação)")
+
+    print(f"{'cenário':>9} | {'votos':>5} | {'formato':>13} | {'bytes/voto':>10} | {'µs/voto':>8} | {'redução':>7}")
+    for cenario, gerar in (("votos", lote_votos), ("simulacao", lote_simulacao)):
+        for tamanho in args.tamanhos:
+            pacote = gerar(tamanho)
+            tempo_json, corpo_json = medir(lambda: json.dumps(pacote).encode(), args.repeticoes)
+            tempo_zlib, corpo_zlib = medir(lambda: zlib.compress(json.dumps(pacote).encode(), 1), args.repeticoes)
+            linhas = [("json", len(corpo_json), tempo_json), ("json+zlib", len(corpo_zlib), tempo_zlib)]
+            for nome, codec in codecs.items():
+                tempo, (corpo, tipo, codificacao, _) = medir(lambda: codec.codificar(pacote), args.repeticoes)
+                assert decodificar(corpo, tipo, codificacao) == pacote, f"{nome} não voltou idêntico"
+                linhas.append((nome, len(corpo), tempo))
+            for nome, tamanho_corpo, tempo in linhas:
+                print(f"{cenario:>9} | {tamanho:>5} | {nome:>13} | {tamanho_corpo / tamanho:>10.1f} | "
+                      f"{tempo / tamanho * 1e6:>8.2f} | {len(corpo_json) / tamanho_corpo:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
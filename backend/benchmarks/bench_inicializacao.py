@@ -0,0 +1,141 @@
+"""
+Mede a partida do backend em processos novos, numa cópia temporária (sem
+CPFs, WAL nem spool).
+
+Para cada repetição um processo Python novo mede:
+
+    importar   - `import app` (configuração e rotas)
+    criar      - `app.criar_app()` (componentes e threads de fundo)
+    primeira   - primeira resposta de /health/live pelo cliente de teste
+    pronta     - até /health/ready responder 200 (espera a primeira tentativa
+                 de conexão com o RabbitMQ e as verificações críticas)
+
+e se NumPy e matplotlib foram carregados. O RabbitMQ aponta por padrão para um
+endereço que não responde (`--broker`), para mostrar que a partida não espera
+a rede; só a prontidão espera o timeout da conexão.
+
+Com `--importacoes` mostra também os módulos mais caros de `import app`
+(python -X importtime).
+
+Uso:
+    python benchmarks/bench_inicializacao.py
+    python benchmarks/bench_inicializacao.py --repeticoes 10 --broker 127.0.0.1:5672 --importacoes
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import sys, time, json
+inicio = time.perf_counter()
+import app
+importado = time.perf_counter()
+flask_app = app.criar_app()
+criado = time.perf_counter()
+cliente = flask_app.test_client()
+cliente.get('/health/live')
+primeira = time.perf_counter()
+pronta = None
+while time.perf_counter() - inicio < {espera}:
+    if cliente.get('/health/ready').status_code == 200:
+        pronta = time.perf_counter() - inicio
+        break
+    time.sleep(0.05)
+with open({saida!r}, 'w') as f:
+    json.dump({{
+        "importar": importado - inicio,
+        "criar": criado - importado,
+        "primeira": primeira - inicio,
+        "pronta": pronta,
+        "numpy": "numpy" in sys.modules,
+        "matplotlib": "matplotlib" in sys.modules,
+    }}, f)
+"""
+
+
+def copiar_backend():
+    diretorio = tempfile.mkdtemp(prefix="bench_inicializacao_")
+    destino = os.path.join(diretorio, 'backend')
+    shutil.copytree(BACKEND, destino,
+                    ignore=shutil.ignore_patterns('__pycache__', 'benchmarks', 'wal', 'spool', '*.bloom', '*.log',
+                                                  'cpfs_votantes.json', 'apuracao_local.json',
+                                                  'agregador_local.json'))
+    return diretorio, destino
+
+
+def ambiente(args):
+    host, _, porta = args.broker.partition(':')
+    # Sem .pyc, como no contêiner (o dockerfile usa PYTHONDONTWRITEBYTECODE): toda partida compila o código
+    return dict(os.environ, PYTHONDONTWRITEBYTECODE='1', RABBITMQ_HOST=host, RABBITMQ_PORT=porta or '5672', RABBITMQ_SSL='false',
+                CORE_URL='http://127.0.0.1:9', AGREGADOR_WS_ATIVO='false', LOG_NIVEL='WARNING')
+
+
+def rodar(destino, args):
+    """Uma partida em processo novo; devolve as medidas e o tempo total até o processo terminar."""
+    # As medidas vão para um arquivo: o stdout do processo é dos logs
+    arquivo = os.path.join(os.path.dirname(destino), 'medidas.json')
+    inicio = time.perf_counter()
+    saida = subprocess.run([sys.executable, '-c', SCRIPT.format(espera=args.espera_pronta, saida=arquivo)],
+                           cwd=destino, env=ambiente(args), capture_output=True, text=True,
+                           timeout=args.espera_pronta + 60)
+    if saida.returncode != 0:
+        raise RuntimeError(saida.stderr)
+    with open(arquivo) as f:
+        medidas = json.load(f)
+    medidas["processo"] = time.perf_counter() - inicio
+    return medidas
+
+
+def importacoes(destino, args, quantos=15):
+    saida = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=destino,
+                           env=ambiente(args), capture_output=True, text=True, timeout=60)
+    linhas = []
+    for linha in saida.stderr.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        proprio, acumulado, modulo = linha.split(':', 1)[1].split('|')
+        linhas.append((int(acumulado), int(proprio), modulo.rstrip()))
+    linhas.sort(reverse=True)
+    print(f"\n{'acumulado ms':>12} | {'próprio ms':>10} | módulo")
+    for acumulado, proprio, modulo in linhas[:quantos]:
+        print(f"{acumulado / 1000:>12.1f} | {proprio / 1000:>10.1f} | {modulo}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--broker', default='10.255.255.1:5672', help="HOST:PORTA do RabbitMQ")
+    parser.add_argument('--espera-pronta', type=float, default=30.0, help="limite (s) para /health/ready dar 200")
+    parser.add_argument('--importacoes', action='store_true', help="mostra os módulos mais caros de importar")
+    args = parser.parse_args()
+
+    diretorio, destino = copiar_backend()
+    try:
+        resultados = [rodar(destino, args) for _ in range(args.repeticoes)]
+        if args.importacoes:
+            importacoes(destino, args)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    print(f"\n{args.repeticoes} partidas, broker em {args.broker}")
+    print(f"{'etapa':>10} | {'mediana ms':>10} | {'mín ms':>8} | {'máx ms':>8}")
+    for etapa in ("importar", "criar", "primeira", "pronta", "processo"):
+        valores = [r[etapa] * 1000 for r in resultados if r[etapa] is not None]
+        if not valores:
+            print(f"{etapa:>10} | {'não ficou pronta em ' + str(args.espera_pronta) + 's':>32}")
+            continue
+        print(f"{etapa:>10} | {statistics.median(valores):>10.1f} | {min(valores):>8.1f} | {max(valores):>8.1f}")
+    print(f"NumPy carregado: {any(r['numpy'] for r in resultados)}; "
+          f"matplotlib carregado: {any(r['matplotlib'] for r in resultados)}")
+
+
+if __name__ == '__main__':
+    main()
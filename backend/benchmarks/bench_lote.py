@@ -0,0 +1,141 @@
+"""
+Compara o EnviadorLote fixo (MAX_BATCH/INTERVALO_ENVIO) com o adaptativo
+reproduzindo curvas sintéticas de chegada de votos.
+
+O publicador é simulado: cada publicação é confirmada depois de uma latência
+fixa (RTT até o broker). Para cada curva são medidos a vazão confirmada, o
+número de publicações, o tamanho médio dos lotes e o atraso de ponta a ponta
+(p50/p99, da chegada do voto até a confirmação do lote).
+
+Curvas:
+    baixo     - 5 votos/s constantes
+    constante - 2.000 votos/s
+    pico      - 200 votos/s com um pico de 10.000 votos/s no meio
+    rampa     - de 0 a 8.000 votos/s
+
+Uso:
+    python benchmarks/bench_lote.py
+    python benchmarks/bench_lote.py --curvas pico --duracao 20 --latencia 0.05
+"""
+import os
+import sys
+import time
+import heapq
+import argparse
+import threading
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enviador_lote import EnviadorLote
+
+CURVAS = {
+    "baixo": lambda f: 5,
+    "constante": lambda f: 2000,
+    "pico": lambda f: 10_000 if 0.4 <= f < 0.6 else 200,
+    "rampa": lambda f: 8000 * f,
+}
+
+
+class FilaComLatencia:
+    """Publicador falso: confirma cada pacote `latencia` segundos depois de publicado."""
+
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.publicacoes = 0
+        self.itens = 0
+        self.agenda = []
+        self.condicao = threading.Condition()
+        threading.Thread(target=self._confirmar, daemon=True).start()
+
+    def publicar(self, pacote):
+        futuro = Future()
+        with self.condicao:
+            self.publicacoes += 1
+            self.itens += len(pacote["dataPoints"])
+            heapq.heappush(self.agenda, (time.monotonic() + self.latencia, id(futuro), futuro))
+            self.condicao.notify()
+        return futuro
+
+    def mandar(self, pacote, timeout=30):
+        return self.publicar(pacote).result(timeout)
+
+    def _confirmar(self):
+        while True:
+            with self.condicao:
+                while not self.agenda or self.agenda[0][0] > time.monotonic():
+                    self.condicao.wait(self.agenda[0][0] - time.monotonic() if self.agenda else None)
+                _, _, futuro = heapq.heappop(self.agenda)
+            futuro.set_result(True)
+
+
+def reproduzir(curva, duracao, lote):
+    """Gera votos seguindo a curva de taxa por `duracao` segundos, em passos de 10 ms."""
+    passo = 0.01
+    inicio = time.monotonic()
+    acumulado = 0.0
+    gerados = 0
+    voto = {"type": "eleicao", "objectIdentifier": "Bento Neves", "valor": 1, "eventDatetime": ""}
+    while True:
+        decorrido = time.monotonic() - inicio
+        if decorrido >= duracao:
+            return gerados
+        acumulado += curva(decorrido / duracao) * passo
+        quantidade = int(acumulado)
+        acumulado -= quantidade
+        for _ in range(quantidade):
+            lote.adicionar(voto)
+        gerados += quantidade
+        proximo = inicio + (int(decorrido / passo) + 1) * passo
+        time.sleep(max(0.0, proximo - time.monotonic()))
+
+
+def medir(nome_curva, adaptativo, args):
+    fila = FilaComLatencia(args.latencia)
+    if adaptativo:
+        lote = EnviadorLote(fila, args.tamanho_max, args.atraso_alvo, None, adaptativo=True,
+                            publicacoes_alvo=args.publicacoes_alvo)
+    else:
+        lote = EnviadorLote(fila, 30, args.intervalo_fixo, None)
+    inicio = time.monotonic()
+    gerados = reproduzir(CURVAS[nome_curva], args.duracao, lote)
+    # Espera o buffer esvaziar pelo caminho normal (tamanho ou tempo) e as confirmações chegarem
+    limite = time.monotonic() + lote.espera + args.latencia + 2
+    while time.monotonic() < limite and (lote.buffer or lote.lotes_enviados < fila.publicacoes):
+        time.sleep(0.05)
+    duracao = time.monotonic() - inicio
+    metricas = lote.metricas()
+    lote.desligar()
+    return {
+        "gerados": gerados,
+        "vazao": fila.itens / duracao,
+        "publicacoes": fila.publicacoes,
+        "tamanho_medio": fila.itens / fila.publicacoes if fila.publicacoes else 0.0,
+        "p50": metricas["atraso_p50_ms"],
+        "p99": metricas["atraso_p99_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--curvas', nargs='+', choices=list(CURVAS), default=list(CURVAS))
+    parser.add_argument('--duracao', type=float, default=10.0, help='segundos de cada curva')
+    parser.add_argument('--latencia', type=float, default=0.02, help='latência (s) de confirmação do broker')
+    parser.add_argument('--intervalo-fixo', type=float, default=20.0, help='INTERVALO_ENVIO do modo fixo')
+    parser.add_argument('--atraso-alvo', type=float, default=1.0, help='atraso alvo (s) do modo adaptativo')
+    parser.add_argument('--tamanho-max', type=int, default=1000)
+    parser.add_argument('--publicacoes-alvo', type=float, default=50.0)
+    args = parser.parse_args()
+
+    print(f"{'curva':>9} | {'modo':>10} | {'votos':>7} | {'votos/s':>8} | {'publicações':>11} | "
+          f"{'itens/lote':>10} | {'p50 ms':>8} | {'p99 ms':>8}")
+    for nome in args.curvas:
+        for adaptativo in (False, True):
+            r = medir(nome, adaptativo, args)
+            print(f"{nome:>9} | {'adaptativo' if adaptativo else 'fixo':>10} | {r['gerados']:>7,} | "
+                  f"{r['vazao']:>8,.0f} | {r['publicacoes']:>11,} | {r['tamanho_medio']:>10.1f} | "
+                  f"{r['p50']:>8.0f} | {r['p99']:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
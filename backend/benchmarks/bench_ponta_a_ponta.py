@@ -0,0 +1,407 @@
+"""
+Teste de carga de ponta a ponta do caminho do voto, com saída em JSON para
+comparar commits.
+
+Sobe o backend (waitress ou ASGI) em um subprocesso, numa cópia temporária,
+apontando para o broker local (benchmarks/broker_local.py) e para o agregador
+falso (benchmarks/agregador_falso.py). Durante `--duracao` segundos rodam:
+
+    votantes   - cada um faz /login e vota em laço em /votar, com CPFs únicos
+    leitores   - leem /resultados em laço, com `--pausa-leitor` entre leituras
+    simulação  - um POST /electionalternative a cada `--intervalo-simulacao` s
+
+Falhas injetadas (podem se repetir):
+
+    --queda-broker INICIO DURACAO             o broker fecha as conexões e recusa novas
+    --agregador-lento INICIO DURACAO ATRASO   o agregador demora ATRASO s por resposta
+
+O broker decodifica cada lote recebido e mede o atraso entre o eventDatetime
+de cada data point (criado quando o voto é aceito) e a chegada ao broker: é o
+caminho EnviadorLote -> FilaRabbit, ou EnviadorLote -> spool -> reenvio
+durante uma queda. Terminada a carga, o teste espera o buffer e o spool
+esvaziarem e confere se algum voto aceito deixou de chegar (só sem
+simulações, que publicam votos agregados).
+
+Também medidos: vazão e latência p50/p99 por rota, memória (RSS) do servidor
+no início, no fim e no pico, e contadores do /metrics do servidor.
+
+Precisa de requirements-async.txt instalado (o cliente de carga usa httpx).
+
+Uso:
+    python benchmarks/bench_ponta_a_ponta.py --saida base.json
+    python benchmarks/bench_ponta_a_ponta.py --queda-broker 5 3 --agregador-lento 2 6 1.5 \\
+        --comparar base.json --tolerancia 0.15
+    python benchmarks/bench_ponta_a_ponta.py --servidor asgi --env LOTE_MODO=fixo
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from codec_lote import decodificar
+from broker_local import BrokerLocal
+from agregador_falso import AgregadorFalso
+from bench_servidores import SERVIDORES, subir, percentil
+
+# Contadores do /metrics do servidor copiados para o resultado
+METRICAS_SERVIDOR = ("votos_total", "lote_envios_total", "publicador_lotes_total", "spool_reenvios_total",
+                     "cache_resultados_leituras_total", "logs_suprimidos_total", "logs_descartados_total")
+# Estatísticas de cada rota comparadas por --comparar; /login fica de fora (um por usuário virtual)
+COMPARADAS = ("vazao_rps", "p50_ms", "p99_ms")
+
+
+class Entregas:
+    """Observador do broker: lotes recebidos, duplicados e atraso de cada data point."""
+
+    def __init__(self):
+        self.lotes = set()
+        self.duplicados = 0
+        self.itens = 0
+        self.votos = 0
+        self.atrasos = []
+        self.erros = 0
+        self.lock = threading.Lock()
+
+    def observar(self, corpo, propriedades):
+        agora = datetime.now()
+        try:
+            pacote = decodificar(corpo, propriedades.content_type, propriedades.content_encoding)
+        except Exception:
+            self.erros += 1
+            return
+        with self.lock:
+            if pacote["batchId"] in self.lotes:
+                # Entrega pelo menos uma vez: publicado antes da queda e reenviado pelo spool
+                self.duplicados += 1
+                return
+            self.lotes.add(pacote["batchId"])
+            momento_anterior = atraso = None
+            for ponto in pacote["dataPoints"]:
+                # Os pontos de uma simulação compartilham o horário; evita reconverter
+                if ponto["eventDatetime"] != momento_anterior:
+                    momento_anterior = ponto["eventDatetime"]
+                    atraso = (agora - datetime.fromisoformat(momento_anterior)).total_seconds()
+                self.atrasos.append(atraso)
+                self.itens += 1
+                self.votos += ponto.get("valor", 1)
+
+
+class Rota:
+    def __init__(self):
+        self.latencias = []
+        self.erros = 0
+        self.status = {}
+
+    def registrar(self, inicio, resposta=None):
+        if resposta is None:
+            self.erros += 1
+            self.status["falha"] = self.status.get("falha", 0) + 1
+            return
+        self.status[str(resposta.status_code)] = self.status.get(str(resposta.status_code), 0) + 1
+        if resposta.status_code < 400:
+            self.latencias.append(time.monotonic() - inicio)
+        else:
+            self.erros += 1
+
+    def resumo(self, duracao):
+        return {
+            "requisicoes": len(self.latencias) + self.erros,
+            "erros": self.erros,
+            "status": self.status,
+            "vazao_rps": round(len(self.latencias) / duracao, 1),
+            "p50_ms": round(percentil(self.latencias, 50) * 1e3, 2) if self.latencias else None,
+            "p99_ms": round(percentil(self.latencias, 99) * 1e3, 2) if self.latencias else None,
+            "max_ms": round(max(self.latencias) * 1e3, 2) if self.latencias else None,
+        }
+
+
+def memoria_mb(pid):
+    """(RSS atual, pico de RSS) do processo em MB, lidos de /proc (só Linux)."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            campos = dict(linha.split(':', 1) for linha in f if ':' in linha)
+    except OSError:
+        return None, None
+    return int(campos['VmRSS'].split()[0]) / 1024, int(campos['VmHWM'].split()[0]) / 1024
+
+
+def ler_metricas(texto):
+    """Contadores selecionados do texto de /metrics: {'nome{rótulos}': valor}."""
+    valores = {}
+    for linha in texto.splitlines():
+        if linha.startswith('#') or not linha.strip():
+            continue
+        chave, _, valor = linha.rpartition(' ')
+        if any(chave.split('{')[0].endswith(nome) for nome in METRICAS_SERVIDOR):
+            valores[chave] = float(valor)
+    return valores
+
+
+async def injetar_falhas(args, broker, agregador, inicio):
+    async def queda(em, duracao):
+        await asyncio.sleep(max(0.0, inicio + em - time.monotonic()))
+        print(f"[falha] broker fora do ar por {duracao}s", file=sys.stderr)
+        broker.derrubar(duracao)
+
+    async def lento(em, duracao, atraso):
+        await asyncio.sleep(max(0.0, inicio + em - time.monotonic()))
+        print(f"[falha] agregador com {atraso}s de atraso por {duracao}s", file=sys.stderr)
+        agregador.atraso = atraso
+        await asyncio.sleep(duracao)
+        agregador.atraso = 0.0
+
+    await asyncio.gather(*[queda(*q) for q in args.queda_broker or []],
+                         *[lento(*a) for a in args.agregador_lento or []])
+
+
+async def carga(url, args, processo, broker, agregador):
+    limites = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    rotas = {nome: Rota() for nome in ("/login", "/votar", "/resultados", "/electionalternative")}
+    memoria = {"amostras": []}
+
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=60) as cliente:
+        async def login():
+            inicio = time.monotonic()
+            try:
+                resposta = await cliente.post('/login', json={'username': 'admin', 'password': 'admin'})
+            except httpx.HTTPError:
+                rotas["/login"].registrar(inicio)
+                return None
+            rotas["/login"].registrar(inicio, resposta)
+            if resposta.status_code != 200:
+                return None
+            return {'Authorization': f"Bearer {resposta.json()['access_token']}"}
+
+        async def chamar(rota, metodo, caminho, cabecalhos, **kwargs):
+            inicio = time.monotonic()
+            try:
+                resposta = await cliente.request(metodo, caminho, headers=cabecalhos, **kwargs)
+            except httpx.HTTPError:
+                rotas[rota].registrar(inicio)
+                return None
+            rotas[rota].registrar(inicio, resposta)
+            return resposta
+
+        aceitos = [0]
+        memoria["inicial"] = memoria_mb(processo.pid)[0]
+        inicio = time.monotonic()
+        fim = inicio + args.duracao
+
+        async def votante(indice):
+            cabecalhos = await login()
+            numero = 0
+            while cabecalhos and time.monotonic() < fim:
+                numero += 1
+                resposta = await chamar("/votar", 'POST', '/votar', cabecalhos, json={
+                    'cpf': f'{indice:04d}{numero:07d}', 'candidato_id': 'Bento Neves'})
+                if resposta is not None and resposta.status_code == 200:
+                    aceitos[0] += 1
+
+        async def leitor():
+            cabecalhos = await login()
+            while cabecalhos and time.monotonic() < fim:
+                await chamar("/resultados", 'GET', '/resultados', cabecalhos)
+                await asyncio.sleep(args.pausa_leitor)
+
+        async def simulacao():
+            cabecalhos = await login()
+            while cabecalhos and time.monotonic() < fim:
+                await chamar("/electionalternative", 'POST', '/electionalternative', cabecalhos, json={
+                    'num_cidades': args.cidades_simulacao, 'populacao_total': args.populacao_simulacao})
+                await asyncio.sleep(args.intervalo_simulacao)
+
+        async def amostrar_memoria():
+            while time.monotonic() < fim:
+                rss, _ = memoria_mb(processo.pid)
+                if rss is not None:
+                    memoria["amostras"].append(rss)
+                await asyncio.sleep(0.5)
+
+        tarefas = [votante(i) for i in range(args.votantes)] + [leitor() for _ in range(args.leitores)]
+        if args.intervalo_simulacao > 0:
+            tarefas.append(simulacao())
+        await asyncio.gather(injetar_falhas(args, broker, agregador, inicio), amostrar_memoria(), *tarefas)
+        duracao = time.monotonic() - inicio
+
+        # Espera o que ficou no buffer, no publicador e no spool chegar ao broker
+        drenado = False
+        limite = time.monotonic() + args.espera_drenagem
+        while time.monotonic() < limite:
+            try:
+                estado = (await cliente.get('/health/ready')).json()
+            except (httpx.HTTPError, ValueError):
+                estado = None
+            if estado and not estado["buffer_lote"] and not estado["spool"]["profundidade"] \
+                    and not estado["publicador"]["pendentes"] and not estado["publicador"]["em_voo"]:
+                drenado = True
+                break
+            await asyncio.sleep(0.5)
+        tempo_drenagem = time.monotonic() - fim
+
+        try:
+            metricas = ler_metricas((await cliente.get('/metrics')).text)
+        except httpx.HTTPError:
+            metricas = {}
+
+    rss, pico = memoria_mb(processo.pid)
+    return {
+        "rotas": {nome: rota.resumo(duracao) for nome, rota in rotas.items()},
+        "votos_aceitos": aceitos[0],
+        "drenado": drenado,
+        "drenagem_s": round(tempo_drenagem, 2),
+        "memoria_mb": {
+            "inicial": round(memoria["inicial"], 1) if memoria["inicial"] else None,
+            "final": round(rss, 1) if rss else None,
+            "pico": round(pico, 1) if pico else None,
+            "crescimento": round(rss - memoria["inicial"], 1) if rss and memoria["inicial"] else None,
+        },
+        "metricas_servidor": metricas,
+    }
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def comparar(base, atual, tolerancia):
+    """Mostra as diferenças para um resultado anterior e devolve as regressões acima da tolerância."""
+    regressoes = []
+    linhas = []
+
+    def conferir(nome, antes, depois, maior_melhor):
+        if antes in (None, 0) or depois is None:
+            return
+        variacao = (depois - antes) / antes
+        piorou = -variacao if maior_melhor else variacao
+        marca = ""
+        if piorou > tolerancia:
+            marca = "  << REGRESSÃO"
+            regressoes.append(nome)
+        linhas.append(f"{nome:>32} | {antes:>10.2f} | {depois:>10.2f} | {variacao * 100:>+7.1f}%{marca}")
+
+    for rota, dados in atual["rotas"].items():
+        if rota == "/login":
+            continue
+        anteriores = base.get("rotas", {}).get(rota, {})
+        for chave in COMPARADAS:
+            conferir(f"{rota} {chave}", anteriores.get(chave), dados.get(chave), chave == "vazao_rps")
+    for chave in ("p50_ms", "p99_ms"):
+        conferir(f"atraso voto->broker {chave}", base.get("atraso_publicacao", {}).get(chave),
+                 atual["atraso_publicacao"].get(chave), False)
+    conferir("memória crescimento MB", base.get("memoria_mb", {}).get("crescimento"),
+             atual["memoria_mb"].get("crescimento"), False)
+
+    print(f"\nComparação com {base.get('commit')} (tolerância {tolerancia * 100:.0f}%)", file=sys.stderr)
+    print(f"{'métrica':>32} | {'antes':>10} | {'depois':>10} | {'variação':>8}", file=sys.stderr)
+    for linha in linhas:
+        print(linha, file=sys.stderr)
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servidor', default='waitress', choices=list(SERVIDORES))
+    parser.add_argument('--duracao', type=float, default=20.0)
+    parser.add_argument('--votantes', type=int, default=20)
+    parser.add_argument('--leitores', type=int, default=5)
+    parser.add_argument('--pausa-leitor', type=float, default=0.2)
+    parser.add_argument('--intervalo-simulacao', type=float, default=0.0, help="0 desliga as simulações")
+    parser.add_argument('--cidades-simulacao', type=int, default=1000)
+    parser.add_argument('--populacao-simulacao', type=int, default=100_000)
+    parser.add_argument('--atraso-ack', type=float, default=0.0, help="atraso (s) do broker para confirmar")
+    parser.add_argument('--queda-broker', type=float, nargs=2, action='append', metavar=('INICIO', 'DURACAO'))
+    parser.add_argument('--agregador-lento', type=float, nargs=3, action='append',
+                        metavar=('INICIO', 'DURACAO', 'ATRASO'))
+    parser.add_argument('--espera-drenagem', type=float, default=60.0)
+    parser.add_argument('--threads', type=int, default=64, help="threads do waitress (WAITRESS_THREADS)")
+    parser.add_argument('--env', action='append', default=[], metavar='CHAVE=VALOR',
+                        help="variável de ambiente extra para o servidor")
+    parser.add_argument('--saida', help="arquivo JSON do resultado (padrão: stdout)")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.1, help="piora relativa aceita por --comparar")
+    args = parser.parse_args()
+
+    entregas = Entregas()
+    broker = BrokerLocal(atraso_ack=args.atraso_ack, observador=entregas.observar)
+    porta_broker = broker.iniciar()
+    agregador = AgregadorFalso()
+    porta_agregador = agregador.iniciar()
+    ambiente = dict(item.split('=', 1) for item in args.env)
+    ambiente.setdefault('SPOOL_BACKOFF_BASE', '0.5')
+
+    processo, url, diretorio = subir(args.servidor, porta_broker, porta_agregador, args.threads, ambiente)
+    try:
+        resultado = asyncio.run(carga(url, args, processo, broker, agregador))
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+        shutil.rmtree(diretorio, ignore_errors=True)
+        broker.parar()
+        agregador.parar()
+
+    atrasos = entregas.atrasos
+    resultado = {
+        "commit": commit_atual(),
+        "momento": datetime.now().isoformat(timespec='seconds'),
+        "parametros": {chave: valor for chave, valor in vars(args).items() if chave not in ("saida", "comparar")},
+        **resultado,
+        "atraso_publicacao": {
+            "amostras": len(atrasos),
+            "p50_ms": round(percentil(atrasos, 50) * 1e3, 2) if atrasos else None,
+            "p99_ms": round(percentil(atrasos, 99) * 1e3, 2) if atrasos else None,
+            "max_ms": round(max(atrasos) * 1e3, 2) if atrasos else None,
+        },
+        "entrega": {
+            "lotes": len(entregas.lotes),
+            "lotes_duplicados": entregas.duplicados,
+            "itens": entregas.itens,
+            "votos": entregas.votos,
+            "erros_decodificacao": entregas.erros,
+            # Simulações publicam votos agregados, então a conta só fecha sem elas
+            "votos_perdidos": (resultado["votos_aceitos"] - entregas.votos
+                               if args.intervalo_simulacao <= 0 else None),
+        },
+    }
+
+    rotas = resultado["rotas"]
+    print(f"{'rota':>22} | {'req/s':>8} | {'p50 ms':>8} | {'p99 ms':>8} | {'erros':>6}", file=sys.stderr)
+    for nome, dados in rotas.items():
+        if dados["requisicoes"]:
+            print(f"{nome:>22} | {dados['vazao_rps']:>8.1f} | {dados['p50_ms'] or 0:>8.1f} | "
+                  f"{dados['p99_ms'] or 0:>8.1f} | {dados['erros']:>6}", file=sys.stderr)
+    print(f"atraso voto->broker p50 {resultado['atraso_publicacao']['p50_ms']} ms, "
+          f"p99 {resultado['atraso_publicacao']['p99_ms']} ms; entrega {resultado['entrega']}; "
+          f"memória {resultado['memoria_mb']}", file=sys.stderr)
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        if comparar(base, resultado, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
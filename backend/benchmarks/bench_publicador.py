@@ -0,0 +1,81 @@
+"""
+Teste de carga do FilaRabbit contra o broker local (benchmarks/broker_local.py).
+
+Várias threads produtoras publicam lotes de 30 votos e aguardam as confirmações.
+Compara uma publicação por vez em voo (equivalente a esperar cada confirmação)
+com várias publicações em voo, para um atraso de confirmação que simula o RTT
+até o broker.
+
+Uso:
+    python benchmarks/bench_publicador.py
+    python benchmarks/bench_publicador.py --lotes 20000 --atraso-ack 0.005 --em-voo 1 64 512
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fila_rabbit import FilaRabbit
+from broker_local import BrokerLocal
+
+
+def criar_pacote(i):
+    agora = datetime.now().isoformat()
+    return {
+        "batchId": f"BATCH_{i:012d}",
+        "sourceNodeId": "GRUPO_1",
+        "dataPoints": [
+            {"type": "eleicao", "objectIdentifier": "Bento Neves", "valor": 1, "eventDatetime": agora}
+            for _ in range(30)
+        ]
+    }
+
+
+def medir(porta, em_voo, lotes, produtores):
+    fila = FilaRabbit('127.0.0.1', porta, 'guest', 'guest', '/', 'lotes_de_dados',
+                      usar_ssl=False, max_pendentes=lotes, max_em_voo=em_voo)
+    while not fila.conectado:
+        time.sleep(0.01)
+
+    por_produtor = lotes // produtores
+    confirmados = []
+
+    def produzir(indice):
+        futuros = [fila.publicar(criar_pacote(indice * por_produtor + i)) for i in range(por_produtor)]
+        confirmados.append(sum(1 for f in futuros if f.result(timeout=120)))
+
+    threads = [threading.Thread(target=produzir, args=(i,)) for i in range(produtores)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+    fila.fechar()
+    return sum(confirmados), duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lotes', type=int, default=5_000)
+    parser.add_argument('--produtores', type=int, default=8)
+    parser.add_argument('--atraso-ack', type=float, default=0.002, help='atraso (s) de cada confirmação')
+    parser.add_argument('--em-voo', type=int, nargs='+', default=[1, 16, 256])
+    args = parser.parse_args()
+
+    broker = BrokerLocal(atraso_ack=args.atraso_ack)
+    porta = broker.iniciar()
+    print(f"broker local em 127.0.0.1:{porta}, confirmação após {args.atraso_ack * 1000:.1f} ms")
+    print(f"{'em voo':>6} | {'lotes/s':>9} | {'votos/s':>10} | {'confirmados':>11}")
+    for em_voo in args.em_voo:
+        confirmados, duracao = medir(porta, em_voo, args.lotes, args.produtores)
+        print(f"{em_voo:>6} | {confirmados / duracao:>9,.0f} | {confirmados * 30 / duracao:>10,.0f} | {confirmados:>11,}")
+    broker.parar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark do registro de votantes.
+
+Mede votos/s do RegistroVotantes com o registro já contendo 10 mil a 10 milhões
+de CPFs, usando várias threads como o waitress faria. Com `--legado` também mede
+o caminho antigo (ler a lista JSON inteira, `cpf in lista`, reescrever o arquivo).
+
+Uso:
+    python benchmarks/bench_registro_votantes.py
+    python benchmarks/bench_registro_votantes.py --tamanhos 10000 100000 --legado
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registro_votantes import RegistroVotantes
+
+
+def gerar_cpfs(inicio, quantidade):
+    return (f"{i:011d}" for i in range(inicio, inicio + quantidade))
+
+
+def medir_registro(tamanho, votos, threads):
+    with tempfile.TemporaryDirectory() as pasta:
+        registro = RegistroVotantes(pasta, limite_compactacao=10**9)
+        # Simula um registro já recuperado do disco com `tamanho` CPFs
+        for cpf in gerar_cpfs(0, tamanho):
+            registro._adicionar_recuperado(cpf)
+
+        por_thread = votos // threads
+        def votar(indice):
+            for cpf in gerar_cpfs(tamanho + indice * por_thread, por_thread):
+                registro.contem(cpf)
+                registro.registrar(cpf)
+
+        trabalhadores = [threading.Thread(target=votar, args=(i,)) for i in range(threads)]
+        inicio = time.perf_counter()
+        for t in trabalhadores:
+            t.start()
+        for t in trabalhadores:
+            t.join()
+        duracao = time.perf_counter() - inicio
+        fsyncs = registro.commit.fsyncs
+        filtro = registro.metricas()["filtro"]
+        registro.fechar()
+    return por_thread * threads / duracao, por_thread * threads / max(fsyncs, 1), filtro
+
+
+def medir_legado(tamanho, votos):
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, 'cpfs_votantes.json')
+        with open(arquivo, 'w') as f:
+            json.dump(list(gerar_cpfs(0, tamanho)), f)
+
+        inicio = time.perf_counter()
+        for cpf in gerar_cpfs(tamanho, votos):
+            with open(arquivo, 'r') as f:
+                cpfs_votantes = json.load(f)
+            if cpf in cpfs_votantes:
+                continue
+            cpfs_votantes.append(cpf)
+            with open(arquivo, 'w') as f:
+                json.dump(cpfs_votantes, f)
+        return votos / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--votos', type=int, default=20_000, help='votos medidos em cada tamanho')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--legado', action='store_true', help='mede também o caminho antigo (lento)')
+    args = parser.parse_args()
+
+    print(f"{'CPFs no registro':>18} | {'votos/s':>10} | {'votos/fsync':>11} | {'FP filtro':>9} | {'legado votos/s':>14}")
+    for tamanho in args.tamanhos:
+        taxa, por_fsync, filtro = medir_registro(tamanho, args.votos, args.threads)
+        legado = '-'
+        if args.legado:
+            legado = f"{medir_legado(tamanho, max(10, args.votos // 1000)):.1f}"
+        fp = f"{filtro['taxa_falsos_positivos_observada']:.4%}"
+        print(f"{tamanho:>18,} | {taxa:>10,.0f} | {por_fsync:>11.1f} | {fp:>9} | {legado:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Teste de carga lado a lado: Flask + waitress (app.py) contra Starlette + uvicorn
+(app_async.py), com o agregador lento.
+
+Cada modo sobe em um subprocesso, numa cópia temporária do backend (para não
+mexer em data/), apontando para o broker local (benchmarks/broker_local.py) e
+para um agregador falso que demora `--atraso-agregador` segundos em cada
+resposta. Durante `--duracao` segundos rodam juntos:
+
+    lentos    - clientes chamando /health em laço (cada um espera o agregador)
+    ouvintes  - conexões abertas em /resultados/stream
+    votantes  - clientes votando em laço, com CPFs únicos
+
+Mede a vazão e a latência de /votar e quantos ouvintes SSE foram aceitos.
+
+Precisa de requirements-async.txt instalado (o cliente de carga usa httpx).
+
+Uso:
+    python benchmarks/bench_servidores.py
+    python benchmarks/bench_servidores.py --lentos 100 --ouvintes 2000 --votantes 50 --threads 16
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from broker_local import BrokerLocal
+from agregador_falso import AgregadorFalso
+
+SERVIDORES = {
+    "waitress": "import app, waitress; waitress.serve(app.criar_app(), host='127.0.0.1', port={porta}, "
+                "threads={threads} + app.SSE_MAX_CONEXOES)",
+    "asgi": "import uvicorn; uvicorn.run('app_async:criar_app_asgi', factory=True, host='127.0.0.1', "
+            "port={porta}, log_level='warning')",
+}
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def subir(modo, porta_broker, porta_agregador, threads, ambiente_extra=None):
+    diretorio = tempfile.mkdtemp(prefix=f"bench_{modo}_")
+    shutil.copytree(BACKEND, os.path.join(diretorio, 'backend'),
+                    ignore=shutil.ignore_patterns('__pycache__', 'benchmarks', 'wal', 'spool', '*.bloom',
+                                                  '*.log', 'cpfs_votantes.json', 'apuracao_local.json',
+                                                  'agregador_local.json'))
+    porta = porta_livre()
+    ambiente = dict(os.environ,
+                    RABBITMQ_HOST='127.0.0.1', RABBITMQ_PORT=str(porta_broker), RABBITMQ_SSL='false',
+                    CORE_URL=f'http://127.0.0.1:{porta_agregador}', AGREGADOR_WS_ATIVO='false',
+                    **(ambiente_extra or {}))
+    processo = subprocess.Popen(
+        [sys.executable, '-c', SERVIDORES[modo].format(porta=porta, threads=threads)],
+        cwd=os.path.join(diretorio, 'backend'), env=ambiente,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{porta}'
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        try:
+            if httpx.get(url + '/', timeout=1).status_code == 200:
+                return processo, url, diretorio
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError(f"Servidor {modo} não subiu")
+
+
+def percentil(valores, p):
+    if not valores:
+        return float('nan')
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(p / 100 * len(valores)))]
+
+
+async def carga(url, args):
+    limites = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    # Um cliente para cada tipo de carga: o pool do httpx percorre todas as conexões a cada requisição
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=30) as cliente, \
+            httpx.AsyncClient(base_url=url, limits=limites, timeout=30) as cliente_lentos, \
+            httpx.AsyncClient(base_url=url, limits=limites, timeout=30) as cliente_ouvintes:
+        token = (await cliente.post('/login', json={'username': 'admin', 'password': 'admin'})).json()['access_token']
+        cabecalhos = {'Authorization': f'Bearer {token}'}
+        fim = time.monotonic() + args.duracao
+        latencias = []
+        erros = {"votar": 0, "health": 0}
+        ouvintes = {"aceitos": 0, "recusados": 0}
+        saude = []
+
+        async def lento():
+            while time.monotonic() < fim:
+                inicio = time.monotonic()
+                try:
+                    await cliente_lentos.get('/health', timeout=args.duracao + 10)
+                    saude.append(time.monotonic() - inicio)
+                except httpx.HTTPError:
+                    erros["health"] += 1
+
+        async def ouvinte():
+            try:
+                async with cliente_ouvintes.stream('GET', '/resultados/stream', headers=cabecalhos,
+                                          timeout=args.duracao + 10) as resposta:
+                    if resposta.status_code != 200:
+                        ouvintes["recusados"] += 1
+                        return
+                    ouvintes["aceitos"] += 1
+                    async for _ in resposta.aiter_raw():
+                        if time.monotonic() >= fim:
+                            return
+            except httpx.HTTPError:
+                ouvintes["recusados"] += 1
+
+        async def votante(indice):
+            numero = 0
+            while time.monotonic() < fim:
+                numero += 1
+                inicio = time.monotonic()
+                try:
+                    resposta = await cliente.post('/votar', headers=cabecalhos, json={
+                        'cpf': f'{indice:05d}{numero:08d}', 'candidato_id': 'Bento Neves'})
+                    if resposta.status_code == 200:
+                        latencias.append(time.monotonic() - inicio)
+                    else:
+                        erros["votar"] += 1
+                except httpx.HTTPError:
+                    erros["votar"] += 1
+
+        tarefas = [asyncio.create_task(lento()) for _ in range(args.lentos)]
+        tarefas += [asyncio.create_task(ouvinte()) for _ in range(args.ouvintes)]
+        await asyncio.sleep(0.5)  # conexões lentas e SSE já abertas antes dos votos
+        fim += 0.5
+        await asyncio.gather(*(votante(i) for i in range(args.votantes)))
+        if tarefas:
+            await asyncio.wait(tarefas, timeout=args.atraso_agregador * 2 + 5)
+        for tarefa in tarefas:
+            tarefa.cancel()
+        return latencias, erros, ouvintes, saude
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modos', nargs='+', default=list(SERVIDORES), choices=list(SERVIDORES))
+    parser.add_argument('--duracao', type=float, default=10.0)
+    parser.add_argument('--atraso-agregador', type=float, default=3.0)
+    parser.add_argument('--lentos', type=int, default=50)
+    parser.add_argument('--ouvintes', type=int, default=500)
+    parser.add_argument('--votantes', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=64, help="threads do waitress (WAITRESS_THREADS)")
+    args = parser.parse_args()
+
+    broker = BrokerLocal()
+    porta_broker = broker.iniciar()
+    agregador = AgregadorFalso(atraso=args.atraso_agregador)
+    porta_agregador = agregador.iniciar()
+
+    print(f"{args.lentos} clientes em /health (agregador com {args.atraso_agregador}s de atraso), "
+          f"{args.ouvintes} ouvintes SSE, {args.votantes} votantes, {args.duracao}s")
+    print(f"{'modo':>8} | {'votos/s':>8} | {'p50 ms':>8} | {'p99 ms':>8} | {'máx ms':>8} | "
+          f"{'erros':>5} | {'SSE aceitos':>11} | {'health/s':>8}")
+    for modo in args.modos:
+        processo, url, diretorio = subir(modo, porta_broker, porta_agregador, args.threads)
+        try:
+            latencias, erros, ouvintes, saude = asyncio.run(carga(url, args))
+        finally:
+            processo.terminate()
+            processo.wait(timeout=30)
+            shutil.rmtree(diretorio, ignore_errors=True)
+        print(f"{modo:>8} | {len(latencias) / args.duracao:>8.0f} | {percentil(latencias, 50) * 1e3:>8.1f} | "
+              f"{percentil(latencias, 99) * 1e3:>8.1f} | {max(latencias, default=float('nan')) * 1e3:>8.1f} | "
+              f"{erros['votar']:>5} | {ouvintes['aceitos']:>5}/{args.ouvintes:<5} | {len(saude) / args.duracao:>8.1f}")
+    broker.parar()
+    agregador.parar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark da simulação de eleição: laço por cidade (`processar_eleicao`) contra o
+motor vetorizado (`processar_eleicao_vetorizada`).
+
+Além do tempo, compara estatísticas das duas saídas (comparecimento médio,
+porcentagem média do vencedor e participação média de cada partido) para
+mostrar que as distribuições são equivalentes.
+
+Uso:
+    python benchmarks/bench_simulacao.py
+    python benchmarks/bench_simulacao.py --cidades 10 1000 --eleitores-por-cidade 5000
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eleicoesalternativo import eleicao
+
+PARTIDOS = ["Pedro Alcântara", "Maria Bragança", "João Vasconcelos", "Bento Neves"]
+
+
+def resumir(resultados):
+    votos = np.array([[c["votos_por_partido"][p] for p in PARTIDOS] for c in resultados], dtype=float)
+    populacao = np.array([c["populacao"] for c in resultados], dtype=float)
+    totais = votos.sum(axis=1)
+    validas = totais > 0
+    return {
+        "comparecimento": float(np.mean(totais[validas] / populacao[validas])),
+        "vencedor_pct": float(np.mean([c["porcentagem_vencedor"] for c in resultados])),
+        "participacao": (votos[validas] / totais[validas, None]).mean(axis=0),
+    }
+
+
+def medir(funcao, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cidades', type=int, nargs='+', default=[10, 1_000, 100_000])
+    parser.add_argument('--eleitores-por-cidade', type=int, default=1_000)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    for num_cidades in args.cidades:
+        populacao_total = num_cidades * args.eleitores_por_cidade
+        tempo_laco, laco = medir(eleicao.processar_eleicao, num_cidades, PARTIDOS, populacao_total)
+        tempo_vetor, vetor = medir(eleicao.processar_eleicao_vetorizada, num_cidades, PARTIDOS,
+                                   populacao_total, semente=args.semente)
+
+        print(f"\n{num_cidades:,} cidades / {populacao_total:,} eleitores")
+        print(f"  laço por cidade: {tempo_laco:8.3f}s")
+        print(f"  vetorizado:      {tempo_vetor:8.3f}s  ({tempo_laco / tempo_vetor:.1f}x)")
+        for nome, resultados in (("laço", laco), ("vetorizado", vetor)):
+            resumo = resumir(resultados)
+            participacao = " ".join(f"{p:.3f}" for p in resumo["participacao"])
+            print(f"  {nome:<11} comparecimento={resumo['comparecimento']:.4f} "
+                  f"vencedor={resumo['vencedor_pct']:.2f}% participação=[{participacao}]")
+
+
+if __name__ == '__main__':
+    main()
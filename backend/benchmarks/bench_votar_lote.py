@@ -0,0 +1,128 @@
+"""
+Compara /votar (um voto por requisição) com /votar/lote (lista JSON e NDJSON)
+no servidor de verdade, em subprocesso, como em bench_servidores.py.
+
+Envia `--votos` votos com CPFs únicos de três formas:
+
+    individual - `--concorrencia` clientes chamando /votar em laço
+    lote json  - requisições /votar/lote com `--tamanho-lote` votos numa lista JSON
+    lote ndjson- o mesmo em NDJSON, um voto por linha
+
+e mostra votos/s, latência por requisição e se todos foram aceitos.
+
+Precisa de requirements-async.txt instalado (o cliente de carga usa httpx).
+
+Uso:
+    python benchmarks/bench_votar_lote.py
+    python benchmarks/bench_votar_lote.py --votos 100000 --tamanho-lote 20000 --servidor asgi
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from broker_local import BrokerLocal
+from agregador_falso import AgregadorFalso
+from bench_servidores import SERVIDORES, subir, percentil
+
+
+def votos(prefixo, quantidade):
+    return [{'cpf': f'{prefixo}{n:09d}', 'candidato_id': 'Bento Neves'} for n in range(quantidade)]
+
+
+async def individual(cliente, cabecalhos, lista, concorrencia):
+    latencias = []
+    aceitos = [0]
+    proximo = iter(lista)
+
+    async def votante():
+        for voto in proximo:
+            inicio = time.monotonic()
+            resposta = await cliente.post('/votar', json=voto, headers=cabecalhos)
+            latencias.append(time.monotonic() - inicio)
+            aceitos[0] += resposta.status_code == 200
+
+    await asyncio.gather(*[votante() for _ in range(concorrencia)])
+    return aceitos[0], latencias
+
+
+async def em_lotes(cliente, cabecalhos, lista, tamanho, ndjson):
+    latencias = []
+    aceitos = 0
+    for inicio_lote in range(0, len(lista), tamanho):
+        parte = lista[inicio_lote:inicio_lote + tamanho]
+        inicio = time.monotonic()
+        if ndjson:
+            corpo = '\n'.join(json.dumps(v) for v in parte)
+            resposta = await cliente.post('/votar/lote', content=corpo,
+                                          headers={**cabecalhos, 'Content-Type': 'application/x-ndjson'})
+        else:
+            resposta = await cliente.post('/votar/lote', json=parte, headers=cabecalhos)
+        latencias.append(time.monotonic() - inicio)
+        if resposta.status_code == 200:
+            aceitos += resposta.json()['aceitos']
+    return aceitos, latencias
+
+
+async def medir(url, args):
+    limites = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=300) as cliente:
+        token = (await cliente.post('/login', json={'username': 'admin', 'password': 'admin'})).json()['access_token']
+        cabecalhos = {'Authorization': f'Bearer {token}'}
+        formas = (
+            ("individual", lambda lista: individual(cliente, cabecalhos, lista, args.concorrencia)),
+            ("lote json", lambda lista: em_lotes(cliente, cabecalhos, lista, args.tamanho_lote, False)),
+            ("lote ndjson", lambda lista: em_lotes(cliente, cabecalhos, lista, args.tamanho_lote, True)),
+        )
+        resultados = []
+        for prefixo, (forma, rodar) in enumerate(formas, 1):
+            lista = votos(f'{prefixo}{prefixo}', args.votos)
+            inicio = time.monotonic()
+            aceitos, latencias = await rodar(lista)
+            resultados.append((forma, aceitos, time.monotonic() - inicio, latencias))
+        return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servidor', default='waitress', choices=list(SERVIDORES))
+    parser.add_argument('--votos', type=int, default=20_000)
+    parser.add_argument('--concorrencia', type=int, default=32, help="clientes simultâneos em /votar")
+    parser.add_argument('--tamanho-lote', type=int, default=10_000)
+    parser.add_argument('--threads', type=int, default=64)
+    args = parser.parse_args()
+
+    broker = BrokerLocal()
+    porta_broker = broker.iniciar()
+    agregador = AgregadorFalso()
+    porta_agregador = agregador.iniciar()
+    processo, url, diretorio = subir(args.servidor, porta_broker, porta_agregador, args.threads,
+                                     {'VOTOS_LOTE_MAX': str(max(args.tamanho_lote, 50_000))})
+    try:
+        resultados = asyncio.run(medir(url, args))
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+        shutil.rmtree(diretorio, ignore_errors=True)
+        broker.parar()
+        agregador.parar()
+
+    print(f"{args.votos} votos por forma, servidor {args.servidor}")
+    print(f"{'forma':>12} | {'votos/s':>9} | {'req p50 ms':>10} | {'req p99 ms':>10} | {'aceitos':>8} | {'ganho':>6}")
+    base = None
+    for forma, aceitos, duracao, latencias in resultados:
+        vazao = aceitos / duracao
+        base = base or vazao
+        print(f"{forma:>12} | {vazao:>9.0f} | {percentil(latencias, 50) * 1e3:>10.1f} | "
+              f"{percentil(latencias, 99) * 1e3:>10.1f} | {aceitos:>8} | {vazao / base:>5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Teste de carga do EnviadorLote com o log de escrita antecipada (WAL).
+
+Várias threads adicionam votos ao mesmo tempo, como as threads do waitress. O
+publicador é substituído por um que confirma cada lote na hora, para medir só o
+custo do WAL: vazão, quantos registros cada fsync cobre (fsync em grupo) e a
+latência de enfileiramento (p50/p99) vista por quem chama `adicionar`.
+
+Uso:
+    python benchmarks/bench_wal.py
+    python benchmarks/bench_wal.py --votos 50000 --threads 32 --sem-wal
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enviador_lote import EnviadorLote
+from log_antecipado import LogAntecipado
+
+
+class FilaConfirmaNaHora:
+    def publicar(self, pacote):
+        futuro = Future()
+        futuro.set_result(True)
+        return futuro
+
+    def mandar(self, pacote, timeout=30):
+        return True
+
+
+def medir(votos, threads, usar_wal):
+    diretorio = tempfile.mkdtemp(prefix='bench_wal_')
+    try:
+        wal = LogAntecipado(os.path.join(diretorio, 'wal')) if usar_wal else None
+        # A fila sempre confirma, então o spool de reenvio nunca é usado
+        lote = EnviadorLote(FilaConfirmaNaHora(), 30, 20, None, wal=wal)
+        por_thread = votos // threads
+        agora = datetime.now().isoformat()
+
+        def votar():
+            for _ in range(por_thread):
+                lote.adicionar({"type": "eleicao", "objectIdentifier": "Bento Neves",
+                                "valor": 1, "eventDatetime": agora})
+
+        trabalhadores = [threading.Thread(target=votar) for _ in range(threads)]
+        inicio = time.perf_counter()
+        for t in trabalhadores:
+            t.start()
+        for t in trabalhadores:
+            t.join()
+        duracao = time.perf_counter() - inicio
+        metricas = lote.metricas()
+        lote.desligar()
+        return por_thread * threads / duracao, metricas.get("wal")
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--votos', type=int, default=20_000)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--sem-wal', action='store_true', help='mede também o EnviadorLote sem WAL')
+    args = parser.parse_args()
+
+    vazao, wal = medir(args.votos, args.threads, True)
+    print(f"com WAL: {vazao:,.0f} votos/s | {wal['fsyncs']:,} fsyncs | "
+          f"{wal['registros_por_fsync']:.1f} registros/fsync | "
+          f"p50 {wal['latencia_enfileiramento_p50_ms']:.2f} ms | "
+          f"p99 {wal['latencia_enfileiramento_p99_ms']:.2f} ms")
+    if args.sem_wal:
+        vazao, _ = medir(args.votos, args.threads, False)
+        print(f"sem WAL: {vazao:,.0f} votos/s")
+
+
+if __name__ == '__main__':
+    main()
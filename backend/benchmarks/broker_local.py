@@ -0,0 +1,207 @@
+"""
+Broker AMQP 0-9-1 mínimo para testes de carga locais, no lugar do CloudAMQP.
+
+Entende apenas o necessário para o FilaRabbit: handshake da conexão, abertura
+de canal, Queue.Declare, Confirm.Select e Basic.Publish (respondendo com
+Basic.Ack). As mensagens não são roteadas nem guardadas; o broker só conta e,
+se pedido, entrega cada corpo recebido, com as propriedades da mensagem
+(content_type, content_encoding, headers), a uma função de observação.
+
+Injeção de falhas:
+    atraso_ack   - segundos antes de confirmar cada publicação (simula RTT)
+    taxa_nack    - fração das publicações respondidas com Basic.Nack
+    derrubar(s)  - fecha todas as conexões e recusa novas por `s` segundos
+
+Uso isolado:
+    python benchmarks/broker_local.py --porta 5672 --atraso-ack 0.002
+"""
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+from pika import frame, spec
+from pika.exceptions import InvalidFrameError
+
+PROPRIEDADES_SERVIDOR = {
+    "product": "broker_local",
+    "capabilities": {
+        "publisher_confirms": True,
+        "basic.nack": True,
+        "consumer_cancel_notify": True,
+        "exchange_exchange_bindings": True,
+        "connection.blocked": True,
+        "authentication_failure_close": True,
+    },
+}
+
+
+class BrokerLocal:
+    def __init__(self, host='127.0.0.1', porta=0, atraso_ack=0.0, taxa_nack=0.0, observador=None):
+        self.host = host
+        self.porta = porta
+        self.atraso_ack = atraso_ack
+        self.taxa_nack = taxa_nack
+        self.observador = observador
+        self.mensagens = 0
+        self.bytes = 0
+        self.nacks = 0
+        self.conexoes = 0
+        self.fora_do_ar_ate = 0.0
+        self._escritores = set()
+        self._loop = None
+        self._servidor = None
+        self._pronto = threading.Event()
+
+    # === Ciclo de vida ===
+
+    def iniciar(self):
+        """Sobe o broker em uma thread própria e devolve a porta escolhida."""
+        threading.Thread(target=self._rodar, daemon=True).start()
+        self._pronto.wait(5)
+        return self.porta
+
+    def _rodar(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._servidor = self._loop.run_until_complete(
+            asyncio.start_server(self._atender, self.host, self.porta)
+        )
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        self._pronto.set()
+        self._loop.run_forever()
+
+    def parar(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def derrubar(self, segundos):
+        """Simula uma queda do broker: derruba as conexões e recusa novas por `segundos`."""
+        self.fora_do_ar_ate = time.monotonic() + segundos
+
+        def fechar_todas():
+            for escritor in list(self._escritores):
+                escritor.transport.abort()
+        self._loop.call_soon_threadsafe(fechar_todas)
+
+    # === Protocolo ===
+
+    async def _atender(self, leitor, escritor):
+        if time.monotonic() < self.fora_do_ar_ate:
+            escritor.transport.abort()
+            return
+        self.conexoes += 1
+        self._escritores.add(escritor)
+        buffer = b''
+        tags = {}
+        confirmacao = set()
+        publicacao = {}
+        try:
+            while True:
+                dados = await leitor.read(65536)
+                if not dados:
+                    break
+                buffer += dados
+                while buffer:
+                    try:
+                        consumidos, quadro = frame.decode_frame(buffer)
+                    except InvalidFrameError:
+                        return
+                    if not consumidos:
+                        break
+                    buffer = buffer[consumidos:]
+                    if quadro is None:
+                        continue
+                    if not await self._tratar(quadro, escritor, tags, confirmacao, publicacao):
+                        return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._escritores.discard(escritor)
+            escritor.close()
+
+    def _enviar(self, escritor, canal, metodo):
+        escritor.write(frame.Method(canal, metodo).marshal())
+
+    async def _tratar(self, quadro, escritor, tags, confirmacao, publicacao):
+        canal = getattr(quadro, "channel_number", 0)
+        if isinstance(quadro, frame.ProtocolHeader):
+            self._enviar(escritor, 0, spec.Connection.Start(server_properties=PROPRIEDADES_SERVIDOR))
+        elif isinstance(quadro, frame.Method):
+            metodo = quadro.method
+            if isinstance(metodo, spec.Connection.StartOk):
+                self._enviar(escritor, 0, spec.Connection.Tune(channel_max=2047, frame_max=131072, heartbeat=0))
+            elif isinstance(metodo, spec.Connection.Open):
+                self._enviar(escritor, 0, spec.Connection.OpenOk())
+            elif isinstance(metodo, spec.Connection.Close):
+                self._enviar(escritor, 0, spec.Connection.CloseOk())
+                await escritor.drain()
+                return False
+            elif isinstance(metodo, spec.Channel.Open):
+                tags[canal] = 0
+                self._enviar(escritor, canal, spec.Channel.OpenOk())
+            elif isinstance(metodo, spec.Channel.Close):
+                self._enviar(escritor, canal, spec.Channel.CloseOk())
+            elif isinstance(metodo, spec.Queue.Declare):
+                if not metodo.nowait:
+                    self._enviar(escritor, canal, spec.Queue.DeclareOk(metodo.queue, 0, 0))
+            elif isinstance(metodo, spec.Confirm.Select):
+                confirmacao.add(canal)
+                if not metodo.nowait:
+                    self._enviar(escritor, canal, spec.Confirm.SelectOk())
+            elif isinstance(metodo, spec.Basic.Publish):
+                publicacao[canal] = [0, [], None]
+        elif isinstance(quadro, frame.Header):
+            publicacao[canal][0] = quadro.body_size
+            publicacao[canal][2] = quadro.properties
+            if quadro.body_size == 0:
+                await self._publicado(escritor, canal, b'', quadro.properties, tags, confirmacao)
+        elif isinstance(quadro, frame.Body):
+            tamanho, partes, propriedades = publicacao[canal]
+            partes.append(quadro.fragment)
+            if sum(len(p) for p in partes) >= tamanho:
+                await self._publicado(escritor, canal, b''.join(partes), propriedades, tags, confirmacao)
+        await escritor.drain()
+        return True
+
+    async def _publicado(self, escritor, canal, corpo, propriedades, tags, confirmacao):
+        self.mensagens += 1
+        self.bytes += len(corpo)
+        if self.observador:
+            self.observador(corpo, propriedades)
+        if canal not in confirmacao:
+            return
+        tags[canal] += 1
+        tag = tags[canal]
+        nack = self.taxa_nack and random.random() < self.taxa_nack
+        if nack:
+            self.nacks += 1
+        resposta = spec.Basic.Nack(delivery_tag=tag) if nack else spec.Basic.Ack(delivery_tag=tag)
+        if self.atraso_ack:
+            # Confirma mais tarde, sem segurar a leitura das próximas publicações
+            self._loop.call_later(self.atraso_ack, self._enviar, escritor, canal, resposta)
+        else:
+            self._enviar(escritor, canal, resposta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=5672)
+    parser.add_argument('--atraso-ack', type=float, default=0.0)
+    parser.add_argument('--taxa-nack', type=float, default=0.0)
+    args = parser.parse_args()
+
+    broker = BrokerLocal(args.host, args.porta, args.atraso_ack, args.taxa_nack)
+    print(f"Broker local ouvindo em {args.host}:{broker.iniciar()}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"conexões={broker.conexoes} mensagens={broker.mensagens} bytes={broker.bytes} nacks={broker.nacks}")
+    except KeyboardInterrupt:
+        broker.parar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Resultado pronto para servir: dados, corpo JSON já serializado e ETag do corpo
+Snapshot = namedtuple('Snapshot', ['dados', 'corpo', 'etag'])
+
+
+def criar_snapshot(dados):
+    """Serializa os dados uma única vez; o ETag é o hash do corpo."""
+    corpo = json.dumps(dados).encode()
+    return Snapshot(dados, corpo, hashlib.blake2b(corpo, digest_size=16).hexdigest())
+
+
+class CacheResultados:
+    """
+    Cache dos resultados do agregador com busca única (single-flight),
+    atualização antecipada e entrega de dados obsoletos durante a revalidação.
+
+    - Só uma busca ao agregador acontece por vez; as outras threads não esperam
+      por ela se já existe algum dado para devolver.
+    - Passada a fração `antecipar` do TTL, a próxima leitura dispara uma
+      atualização em segundo plano e devolve o dado atual na hora.
+    - Depois do TTL o dado continua sendo servido (obsoleto) por até
+      `max_obsoleto` segundos enquanto a atualização roda.
+    - Respostas vazias ou falhas ficam em cache negativo por `ttl_negativo`
+      segundos, para não repetir a busca a cada requisição.
+    - Sem nenhum dado (cache frio), as leituras esperam a busca em andamento por
+      no máximo `espera_max` segundos.
+
+    Cada resultado novo é guardado como um Snapshot imutável, já serializado e
+    com ETag, para que servir uma leitura seja só devolver bytes. Com
+    `iniciar_poller` as buscas acontecem em intervalo fixo, em segundo plano,
+    e as leituras praticamente nunca disparam uma busca.
+    """
+
+    def __init__(self, buscar, ttl=30, ttl_negativo=5, antecipar=0.8, max_obsoleto=300, espera_max=2.0):
+        """
+        Args:
+            buscar: Função sem argumentos que devolve os dados, ou None se vierem vazios
+            ttl (float): Segundos em que um dado é considerado novo
+            ttl_negativo (float): Segundos até repetir uma busca vazia ou com erro
+            antecipar (float): Fração do TTL a partir da qual a atualização começa
+            max_obsoleto (float): Segundos além do TTL em que o dado ainda é servido
+            espera_max (float): Espera máxima (s) de uma leitura com o cache frio
+        """
+        self.buscar = buscar
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self.antecipar = antecipar
+        self.max_obsoleto = max_obsoleto
+        self.espera_max = espera_max
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.obtido_em = None
+        self.falhou_em = None
+        self._busca = None  # Event da busca em andamento, se houver
+        self.buscas = 0
+        self.falhas = 0
+        self.acertos = 0
+        self.obsoletos = 0
+        self.faltas = 0
+        self._parar = threading.Event()
+        self.ouvintes = []
+
+    def obter(self):
+        """Devolve os dados em cache (possivelmente obsoletos) ou None se não houver nenhum."""
+        snapshot = self.obter_snapshot()
+        return snapshot.dados if snapshot is not None else None
+
+    def obter_snapshot(self):
+        """Devolve o Snapshot em cache (possivelmente obsoleto) ou None se não houver nenhum."""
+        agora = time.monotonic()
+        with self.lock:
+            idade = agora - self.obtido_em if self.obtido_em is not None else None
+            negativo = self.falhou_em is not None and agora - self.falhou_em < self.ttl_negativo
+
+            if idade is not None and idade < self.ttl * self.antecipar:
+                self.acertos += 1
+                return self.snapshot
+            if idade is not None and idade < self.ttl + self.max_obsoleto:
+                if not negativo:
+                    self._iniciar_busca(em_segundo_plano=True)
+                if idade < self.ttl:
+                    self.acertos += 1
+                else:
+                    self.obsoletos += 1
+                return self.snapshot
+            self.faltas += 1
+            if negativo:
+                return None
+            # Cache frio (ou dado velho demais): espera a busca, mas só até espera_max
+            evento, lider = self._iniciar_busca(em_segundo_plano=False)
+
+        if lider:
+            self._executar_busca(evento)
+        else:
+            evento.wait(self.espera_max)
+        with self.lock:
+            return self.snapshot
+
+    def _iniciar_busca(self, em_segundo_plano):
+        """Com o lock adquirido: junta-se à busca em andamento ou começa uma. Devolve (evento, lider)."""
+        if self._busca is not None:
+            return self._busca, False
+        self._busca = threading.Event()
+        if em_segundo_plano:
+            threading.Thread(target=self._executar_busca, args=(self._busca,),
+                             name="cache-resultados", daemon=True).start()
+            return self._busca, False
+        return self._busca, True
+
+    def _executar_busca(self, evento):
+        try:
+            dados = self.buscar()
+        except Exception as e:
+            logger.error("Erro ao atualizar resultados: %s", e)
+            dados = None
+        snapshot = criar_snapshot(dados) if dados is not None else None
+        mudou = False
+        with self.lock:
+            self.buscas += 1
+            if snapshot is not None:
+                # Conteúdo igual mantém o mesmo objeto (e o mesmo ETag)
+                if self.snapshot is None or self.snapshot.etag != snapshot.etag:
+                    self.snapshot = snapshot
+                    mudou = True
+                self.obtido_em = time.monotonic()
+                self.falhou_em = None
+                logger.info("Resultados válidos armazenados no cache.")
+            else:
+                self.falhas += 1
+                self.falhou_em = time.monotonic()
+                logger.info("Resultados vazios. Nova tentativa em %ss; o cache anterior foi mantido.",
+                            self.ttl_negativo)
+            self._busca = None
+        evento.set()
+        if mudou:
+            for ouvinte in self.ouvintes:
+                try:
+                    ouvinte(snapshot)
+                except Exception as e:
+                    logger.error("Erro ao notificar atualização de resultados: %s", e)
+
+    def adicionar_ouvinte(self, ouvinte):
+        """Registra uma função chamada com o novo Snapshot sempre que o conteúdo muda."""
+        self.ouvintes.append(ouvinte)
+
+    def atualizar_agora(self):
+        """Dispara uma busca em segundo plano (ou se junta à que já está em andamento)."""
+        with self.lock:
+            self._iniciar_busca(em_segundo_plano=True)
+
+    def iniciar_poller(self, intervalo):
+        """Busca os resultados a cada `intervalo` segundos em uma thread de fundo."""
+        def rodar():
+            logger.info("🔄 Poller de resultados ativo a cada %ss.", intervalo)
+            while not self._parar.is_set():
+                with self.lock:
+                    evento, lider = self._iniciar_busca(em_segundo_plano=False)
+                if lider:
+                    self._executar_busca(evento)
+                else:
+                    evento.wait()
+                self._parar.wait(intervalo)
+        threading.Thread(target=rodar, name="poller-resultados", daemon=True).start()
+
+    def parar(self):
+        self._parar.set()
+
+    def metricas(self):
+        with self.lock:
+            return {
+                "status": "active" if self.obtido_em is not None else "empty",
+                "idade_s": round(time.monotonic() - self.obtido_em, 1) if self.obtido_em is not None else None,
+                "atualizando": self._busca is not None,
+                "etag": self.snapshot.etag if self.snapshot is not None else None,
+                "buscas": self.buscas,
+                "falhas": self.falhas,
+                "acertos": self.acertos,
+                "obsoletos": self.obsoletos,
+                "faltas": self.faltas
+            }
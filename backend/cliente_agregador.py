@@ -0,0 +1,205 @@
+import time
+import random
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metricas import Histograma
+
+logger = logging.getLogger(__name__)
+
+FECHADO = 'fechado'
+ABERTO = 'aberto'
+MEIO_ABERTO = 'meio_aberto'
+
+
+class AgregadorIndisponivel(requests.RequestException):
+    """Circuito aberto: o agregador falhou seguidamente e a chamada nem foi feita."""
+
+
+class ClienteAgregador:
+    """
+    Cliente HTTP compartilhado para as chamadas ao Aggregator Node.
+
+    - Uma Session com pool de conexões keep-alive: a conexão TCP/TLS é
+      reaproveitada entre chamadas em vez de refeita a cada `requests.get`.
+    - Timeouts separados de conexão e de leitura em toda chamada.
+    - Retentativas só para GET, em erro de conexão/timeout ou 502/503/504,
+      limitadas por um orçamento: cada chamada deposita `razao_retentativas`
+      e cada retentativa gasta 1, então com o agregador fora do ar as
+      retentativas não multiplicam a carga.
+    - Disjuntor: depois de `falhas_para_abrir` falhas seguidas as chamadas
+      falham na hora (AgregadorIndisponivel) por `tempo_aberto` segundos;
+      depois disso uma chamada de teste decide se ele fecha de novo.
+    - Respostas gzip/deflate são pedidas e descomprimidas pelo requests.
+    """
+
+    def __init__(self, url_base, timeout_conexao=3.0, timeout_leitura=10.0, tamanho_pool=10,
+                 max_retentativas=2, razao_retentativas=0.2, saldo_max_retentativas=10.0,
+                 falhas_para_abrir=5, tempo_aberto=30.0):
+        """
+        Args:
+            url_base: Endereço do agregador (ex.: https://agregador-node.onrender.com)
+            timeout_conexao (float): Segundos para abrir a conexão
+            timeout_leitura (float): Segundos de espera pela resposta (padrão das chamadas)
+            tamanho_pool (int): Conexões mantidas abertas com o agregador
+            max_retentativas (int): Retentativas por chamada, se houver orçamento
+            razao_retentativas (float): Orçamento ganho por chamada (0.2 = até 20% de retentativas)
+            saldo_max_retentativas (float): Orçamento máximo acumulado
+            falhas_para_abrir (int): Falhas seguidas que abrem o disjuntor
+            tempo_aberto (float): Segundos com o disjuntor aberto antes de testar de novo
+        """
+        self.url_base = url_base.rstrip('/')
+        self.timeout_conexao = timeout_conexao
+        self.timeout_leitura = timeout_leitura
+        self.max_retentativas = max_retentativas
+        self.razao_retentativas = razao_retentativas
+        self.saldo_max_retentativas = saldo_max_retentativas
+        self.falhas_para_abrir = falhas_para_abrir
+        self.tempo_aberto = tempo_aberto
+
+        self.sessao = requests.Session()
+        self.adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=tamanho_pool, max_retries=0)
+        self.sessao.mount('http://', self.adaptador)
+        self.sessao.mount('https://', self.adaptador)
+        self.sessao.headers['Accept-Encoding'] = 'gzip, deflate'
+
+        self.lock = threading.Lock()
+        self.estado = FECHADO
+        self.falhas_seguidas = 0
+        self.aberto_em = None
+        self._teste_em_andamento = False
+        self.saldo_retentativas = saldo_max_retentativas
+        self.requisicoes = 0
+        self.falhas = 0
+        self.retentativas = 0
+        self.retentativas_negadas = 0
+        self.rejeitadas = 0
+        self.latencias = {}
+
+    # === Disjuntor ===
+
+    def _permitir(self):
+        with self.lock:
+            if self.estado == FECHADO:
+                return True
+            if self.estado == ABERTO and time.monotonic() - self.aberto_em >= self.tempo_aberto:
+                self.estado = MEIO_ABERTO
+                self._teste_em_andamento = False
+            if self.estado == MEIO_ABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+            self.rejeitadas += 1
+            return False
+
+    def _registrar_resultado(self, sucesso):
+        with self.lock:
+            if sucesso:
+                if self.estado != FECHADO:
+                    logger.info("✅ Agregador respondendo de novo. Disjuntor fechado.")
+                self.estado = FECHADO
+                self.falhas_seguidas = 0
+                return
+            self.falhas += 1
+            self.falhas_seguidas += 1
+            if self.estado == MEIO_ABERTO or self.falhas_seguidas >= self.falhas_para_abrir:
+                if self.estado != ABERTO:
+                    logger.warning("⚠️ Agregador falhou %s vez(es) seguidas. Disjuntor aberto por %ss.",
+                                   self.falhas_seguidas, self.tempo_aberto)
+                self.estado = ABERTO
+                self.aberto_em = time.monotonic()
+                self._teste_em_andamento = False
+
+    def _gastar_retentativa(self):
+        with self.lock:
+            if self.saldo_retentativas >= 1:
+                self.saldo_retentativas -= 1
+                self.retentativas += 1
+                return True
+            self.retentativas_negadas += 1
+            return False
+
+    # === Chamadas ===
+
+    def get(self, caminho, timeout_leitura=None):
+        """
+        GET em `url_base + caminho`, com pool, timeouts, retentativas e disjuntor.
+
+        Returns:
+            requests.Response: Resposta recebida (qualquer status)
+
+        Raises:
+            AgregadorIndisponivel: Se o disjuntor estiver aberto
+            requests.RequestException: Se a chamada falhar depois das retentativas
+        """
+        with self.lock:
+            self.requisicoes += 1
+            self.saldo_retentativas = min(self.saldo_max_retentativas,
+                                          self.saldo_retentativas + self.razao_retentativas)
+        timeout = (self.timeout_conexao, timeout_leitura or self.timeout_leitura)
+        tentativa = 0
+        while True:
+            if not self._permitir():
+                raise AgregadorIndisponivel(f"Disjuntor aberto para {self.url_base}")
+            inicio = time.monotonic()
+            try:
+                resposta = self.sessao.get(self.url_base + caminho, timeout=timeout)
+                erro = None
+            except Exception as e:
+                resposta, erro = None, e
+            self._observar(caminho, time.monotonic() - inicio)
+
+            falhou = erro is not None or resposta.status_code >= 500
+            self._registrar_resultado(not falhou)
+            retentavel = erro is not None or resposta.status_code in (502, 503, 504)
+            if not (falhou and retentavel and tentativa < self.max_retentativas and self._gastar_retentativa()):
+                if erro is not None:
+                    raise erro
+                return resposta
+            tentativa += 1
+            # Backoff exponencial com jitter total: 0-100 ms, 0-200 ms...
+            time.sleep(random.uniform(0, 0.1 * 2 ** (tentativa - 1)))
+
+    def _observar(self, caminho, duracao):
+        with self.lock:
+            histograma = self.latencias.get(caminho)
+            if histograma is None:
+                histograma = self.latencias[caminho] = Histograma()
+            histograma.observar(duracao)
+
+    # === Métricas ===
+
+    def _conexoes(self):
+        """(conexões abertas no total, requisições feitas) somadas dos pools do urllib3."""
+        novas = requisicoes = 0
+        for chave in list(self.adaptador.poolmanager.pools.keys()):
+            pool = self.adaptador.poolmanager.pools.get(chave)
+            if pool is not None:
+                novas += pool.num_connections
+                requisicoes += pool.num_requests
+        return novas, requisicoes
+
+    def histogramas_latencia(self):
+        """Cópia dos histogramas de latência, por caminho."""
+        with self.lock:
+            return {caminho: h.copia() for caminho, h in self.latencias.items()}
+
+    def metricas(self):
+        novas, feitas = self._conexoes()
+        with self.lock:
+            return {
+                "disjuntor": self.estado,
+                "requisicoes": self.requisicoes,
+                "falhas": self.falhas,
+                "retentativas": self.retentativas,
+                "retentativas_negadas": self.retentativas_negadas,
+                "rejeitadas_disjuntor": self.rejeitadas,
+                "conexoes_abertas": novas,
+                "reuso_conexoes": round(1 - novas / feitas, 3) if feitas else None,
+                "latencia_s": {caminho: h.como_dict() for caminho, h in self.latencias.items()}
+            }
+
+    def fechar(self):
+        self.sessao.close()
@@ -0,0 +1,195 @@
+"""
+Codificação dos lotes publicados em `lotes_de_dados`.
+
+O formato padrão continua sendo JSON (content_type `application/json`). O
+formato colunar é opcional e negociado pelas propriedades da mensagem AMQP:
+content_type `application/x-lote-colunar`, content_encoding com a compressão
+(`zstd`, `zlib` ou ausente) e o cabeçalho `formato: colunar-v1`. Consumidores
+que não conhecem o formato devem continuar recebendo JSON.
+
+Layout colunar (little-endian), antes da compressão:
+
+    b'LTC1'                      magic
+    uint32                       tamanho do cabeçalho
+    cabeçalho JSON               batchId, sourceNodeId, n, tipos, objetos,
+                                 ts0 (µs desde 0001-01-01) e os dtypes das colunas
+    índices de `type`            n inteiros (dicionário `tipos`)
+    índices de `objectIdentifier` n inteiros (dicionário `objetos`)
+    valores                      n inteiros
+    deltas de `eventDatetime`    n int64 em µs, cada um em relação ao anterior
+
+Lotes que não cabem no esquema (outros campos, valores não inteiros, datas com
+fuso) são enviados em JSON, sem erro.
+
+A compressão zstd usa o pacote opcional `zstandard`; sem ele cai para zlib.
+"""
+import json
+import zlib
+import struct
+import logging
+from datetime import datetime, timedelta
+from operator import itemgetter
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+FORMATO_JSON = 'json'
+FORMATO_COLUNAR = 'colunar'
+TIPO_JSON = 'application/json'
+TIPO_COLUNAR = 'application/x-lote-colunar'
+CABECALHO_FORMATO = 'colunar-v1'
+
+MAGIC = b'LTC1'
+EPOCA = '0001-01-01T00:00:00'
+CAMPOS = ('type', 'objectIdentifier', 'valor', 'eventDatetime')
+_extrair = itemgetter(*CAMPOS)
+_separador = itemgetter(10)
+
+
+def _dtype_indices(tamanho):
+    if tamanho <= 0xFF:
+        return '<u1'
+    if tamanho <= 0xFFFF:
+        return '<u2'
+    return '<u4'
+
+
+class CodecLote:
+    """
+    Serializa pacotes de lote para publicação e os lê de volta.
+
+    Args:
+        formato: 'json' (padrão) ou 'colunar'
+        compressao: 'zstd', 'zlib' ou 'nenhuma' (só vale para o formato colunar)
+        nivel (int): Nível de compressão
+    """
+
+    def __init__(self, formato=FORMATO_JSON, compressao='zstd', nivel=3):
+        if formato not in (FORMATO_JSON, FORMATO_COLUNAR):
+            raise ValueError(f"Formato de lote desconhecido: {formato}")
+        if compressao == 'zstd' and zstandard is None:
+            if formato == FORMATO_COLUNAR:
+                logger.warning("⚠️ Pacote zstandard não instalado. Usando zlib para os lotes.")
+            compressao = 'zlib'
+        if compressao not in ('zstd', 'zlib', 'nenhuma'):
+            raise ValueError(f"Compressão desconhecida: {compressao}")
+        self.formato = formato
+        self.compressao = compressao
+        self.nivel = nivel
+        self._zstd = zstandard.ZstdCompressor(level=nivel) if compressao == 'zstd' else None
+
+    def codificar(self, pacote):
+        """
+        Returns:
+            tuple: (corpo em bytes, content_type, content_encoding, headers)
+        """
+        if self.formato == FORMATO_COLUNAR:
+            corpo = _colunar(pacote)
+            if corpo is not None:
+                if self.compressao == 'zstd':
+                    return self._zstd.compress(corpo), TIPO_COLUNAR, 'zstd', {'formato': CABECALHO_FORMATO}
+                if self.compressao == 'zlib':
+                    return zlib.compress(corpo, self.nivel), TIPO_COLUNAR, 'zlib', {'formato': CABECALHO_FORMATO}
+                return corpo, TIPO_COLUNAR, None, {'formato': CABECALHO_FORMATO}
+        return json.dumps(pacote).encode(), TIPO_JSON, None, None
+
+
+def _dicionario(coluna):
+    """Codifica a coluna por dicionário, na ordem de aparição: (valores distintos, índices)."""
+    indices = {}
+    posicoes = [indices.setdefault(valor, len(indices)) for valor in coluna]
+    return list(indices), posicoes
+
+
+def _colunar(pacote):
+    """Monta o corpo colunar sem compressão, ou None se o lote não couber no esquema."""
+    # NumPy só é carregado quando o formato colunar é usado, fora da partida do backend
+    import numpy as np
+    pontos = pacote.get('dataPoints') or []
+    if not pontos or set(map(len, pontos)) != {len(CAMPOS)}:
+        return None
+    try:
+        tipos, objetos, valores, momentos = zip(*map(_extrair, pontos))
+    except (KeyError, TypeError):
+        return None
+    if set(map(type, tipos)) | set(map(type, objetos)) != {str} or set(map(type, valores)) != {int}:
+        return None
+    # Só datas no formato de datetime.isoformat() sem fuso, para voltarem idênticas
+    if not set(map(len, momentos)) <= {19, 26} or set(map(_separador, momentos)) != {'T'}:
+        return None
+    try:
+        instantes = (np.array(momentos, dtype='datetime64[us]') - np.datetime64(EPOCA, 'us')).astype('<i8')
+        valores = np.asarray(valores, dtype='<i8')
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+    dicionario_tipos, indices_tipos = _dicionario(tipos)
+    dicionario_objetos, indices_objetos = _dicionario(objetos)
+    deltas = np.diff(instantes, prepend=instantes[0])
+    cabecalho = json.dumps({
+        "batchId": pacote.get("batchId"),
+        "sourceNodeId": pacote.get("sourceNodeId"),
+        "n": len(pontos),
+        "tipos": dicionario_tipos,
+        "objetos": dicionario_objetos,
+        "ts0": int(instantes[0]),
+        "dtypes": [_dtype_indices(len(dicionario_tipos)), _dtype_indices(len(dicionario_objetos)), '<i8', '<i8'],
+    }).encode()
+    return b''.join((
+        MAGIC,
+        struct.pack('<I', len(cabecalho)),
+        cabecalho,
+        np.array(indices_tipos, dtype=_dtype_indices(len(dicionario_tipos))).tobytes(),
+        np.array(indices_objetos, dtype=_dtype_indices(len(dicionario_objetos))).tobytes(),
+        valores.tobytes(),
+        deltas.tobytes(),
+    ))
+
+
+def decodificar(corpo, content_type=None, content_encoding=None):
+    """Lê um corpo publicado (JSON ou colunar) e devolve o pacote como dict."""
+    if content_type != TIPO_COLUNAR:
+        return json.loads(corpo)
+    import numpy as np
+    if content_encoding == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Lote comprimido com zstd, mas o pacote zstandard não está instalado")
+        corpo = zstandard.ZstdDecompressor().decompress(corpo)
+    elif content_encoding == 'zlib':
+        corpo = zlib.decompress(corpo)
+    if corpo[:4] != MAGIC:
+        raise ValueError("Corpo colunar inválido")
+    tamanho, = struct.unpack_from('<I', corpo, 4)
+    cabecalho = json.loads(corpo[8:8 + tamanho])
+    n = cabecalho["n"]
+    posicao = 8 + tamanho
+    colunas = []
+    for dtype in cabecalho["dtypes"]:
+        coluna = np.frombuffer(corpo, dtype=dtype, count=n, offset=posicao)
+        posicao += coluna.nbytes
+        colunas.append(coluna)
+    indices_tipos, indices_objetos, valores, deltas = colunas
+    deltas = deltas.copy()
+    deltas[0] = cabecalho["ts0"]
+    instantes = np.cumsum(deltas)
+    base = datetime(1, 1, 1)
+    tipos = cabecalho["tipos"]
+    objetos = cabecalho["objetos"]
+    return {
+        "batchId": cabecalho["batchId"],
+        "sourceNodeId": cabecalho["sourceNodeId"],
+        "dataPoints": [
+            {
+                "type": tipos[t],
+                "objectIdentifier": objetos[o],
+                "valor": v,
+                "eventDatetime": (base + timedelta(microseconds=us)).isoformat()
+            }
+            for t, o, v, us in zip(indices_tipos.tolist(), indices_objetos.tolist(),
+                                   valores.tolist(), instantes.tolist())
+        ]
+    }
@@ -0,0 +1,171 @@
+import os
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Espera (s) antes de tentar de novo depois de um fsync que falhou: dobra a cada falha seguida
+ESPERA_FALHA_MIN = 0.1
+ESPERA_FALHA_MAX = 5.0
+
+
+class CommitEmGrupo:
+    """
+    Agrupa as sincronizações (fsync) de um arquivo de log anexável.
+
+    Cada escritor grava seus bytes e recebe um número de sequência; uma thread
+    dedicada faz um único fsync cobrindo tudo que foi escrito até ali e libera
+    de uma vez todos os escritores que aguardavam. Enquanto um fsync está em
+    andamento, novas escritas se acumulam e entram no próximo.
+
+    Se um fsync falha (disco cheio, erro de E/S), só os escritores da faixa de
+    sequências que ele cobria recebem o erro; a thread espera um pouco, com
+    backoff, e tenta de novo com as escritas seguintes. O primeiro fsync que
+    der certo limpa `erro`.
+    """
+
+    def __init__(self, arquivo, espera=0.0):
+        """
+        Args:
+            arquivo: Arquivo binário aberto para escrita (modo 'ab')
+            espera (float): Tempo extra (s) para acumular escritas antes do fsync
+        """
+        self.arquivo = arquivo
+        self.espera = espera
+        self.lock = threading.Lock()
+        self._lock_fsync = threading.Lock()
+        self._tem_dados = threading.Condition(self.lock)
+        self._sincronizado = threading.Condition(self.lock)
+        self.seq_escrito = 0
+        self.seq_sincronizado = 0
+        self.fsyncs = 0
+        self.falhas = 0
+        self.erro = None
+        # Faixas (início, fim] de sequências cujo fsync falhou; as mais antigas são esquecidas
+        self._faixas_falhas = deque(maxlen=64)
+        self._seq_falhou = 0
+        self._espera_falha = 0.0
+        self._parar = threading.Event()
+        self._rodando = True
+        self._thread = threading.Thread(target=self._rodar, daemon=True)
+        self._thread.start()
+
+    def escrever(self, dados, registros=1):
+        """
+        Grava os bytes no buffer do arquivo e devolve a sequência a aguardar.
+
+        Args:
+            registros (int): Quantos registros (linhas) `dados` contém; a sequência avança esse tanto
+        """
+        with self.lock:
+            self.arquivo.write(dados)
+            self.seq_escrito += registros
+            self._tem_dados.notify()
+            return self.seq_escrito
+
+    def aguardar(self, seq):
+        """
+        Bloqueia até que a escrita de número `seq` esteja no disco.
+
+        Raises:
+            OSError: Se o fsync que cobria `seq` falhou
+        """
+        with self.lock:
+            while True:
+                for inicio, fim, erro in self._faixas_falhas:
+                    if inicio < seq <= fim:
+                        raise OSError(f"Falha no fsync do log: {erro}")
+                if self.seq_sincronizado >= seq:
+                    return
+                self._sincronizado.wait()
+
+    def _rodar(self):
+        while True:
+            with self.lock:
+                while self._rodando and self.seq_escrito == self.seq_sincronizado:
+                    self._tem_dados.wait()
+                # Ao fechar com o disco falhando não insiste: `fechar` ainda tenta um último fsync
+                if not self._rodando and (self.seq_escrito == self.seq_sincronizado or self.erro is not None):
+                    return
+            if self.espera:
+                self._parar.wait(self.espera)
+            self._sincronizar()
+            if self._espera_falha:
+                # Depois de uma falha não tenta de novo na hora: o erro costuma persistir
+                self._parar.wait(self._espera_falha)
+
+    def _sincronizar(self):
+        with self._lock_fsync:
+            with self.lock:
+                alvo = self.seq_escrito
+                try:
+                    self.arquivo.flush()
+                except Exception as e:
+                    self._falhar(e, alvo)
+                    return
+                fd = self.arquivo.fileno()
+            try:
+                os.fsync(fd)
+            except Exception as e:
+                with self.lock:
+                    self._falhar(e, alvo)
+                return
+            with self.lock:
+                if alvo > self.seq_sincronizado:
+                    self.seq_sincronizado = alvo
+                self.fsyncs += 1
+                if self.erro is not None:
+                    logger.warning("✅ fsync do log voltou a funcionar.")
+                    self.erro = None
+                self._espera_falha = 0.0
+                self._sincronizado.notify_all()
+
+    def _falhar(self, e, alvo):
+        """Falha os escritores ainda não sincronizados até `alvo`; os seguintes esperam a próxima tentativa."""
+        inicio = max(self.seq_sincronizado, self._seq_falhou)
+        if alvo > inicio:
+            self._faixas_falhas.append((inicio, alvo, e))
+            self._seq_falhou = alvo
+        logger.error("CRÍTICO: fsync do log falhou: %s", e)
+        self.falhas += 1
+        self.erro = e
+        self._espera_falha = min(ESPERA_FALHA_MAX, max(ESPERA_FALHA_MIN, self._espera_falha * 2))
+        self._sincronizado.notify_all()
+
+    def trocar_arquivo(self, novo):
+        """
+        Sincroniza tudo que está pendente no arquivo atual e passa a escrever em `novo`.
+
+        Returns:
+            O arquivo anterior, já sincronizado (cabe ao chamador fechá-lo).
+        """
+        with self._lock_fsync:
+            with self.lock:
+                antigo = self.arquivo
+                antigo.flush()
+                os.fsync(antigo.fileno())
+                self.seq_sincronizado = self.seq_escrito
+                self.fsyncs += 1
+                self.arquivo = novo
+                self._sincronizado.notify_all()
+        return antigo
+
+    def metricas(self):
+        return {
+            "fsyncs": self.fsyncs,
+            "falhas": self.falhas,
+            "erro": str(self.erro) if self.erro is not None else None,
+        }
+
+    def fechar(self):
+        self._parar.set()
+        with self.lock:
+            self._rodando = False
+            self._tem_dados.notify()
+        self._thread.join(timeout=5)
+        with self._lock_fsync, self.lock:
+            if not self.arquivo.closed:
+                self.arquivo.flush()
+                os.fsync(self.arquivo.fileno())
+                self.arquivo.close()
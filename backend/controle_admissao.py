@@ -0,0 +1,143 @@
+import math
+import logging
+import threading
+from collections import OrderedDict
+
+from balde_fichas import BaldeFichas
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissaoRecusada(Exception):
+    """A requisição foi recusada para proteger o caminho de publicação (HTTP 429)."""
+
+    def __init__(self, motivo, mensagem, retry_after):
+        super().__init__(mensagem)
+        self.motivo = motivo
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_s(self):
+        """Valor do header Retry-After: segundos inteiros, no mínimo 1."""
+        return max(1, math.ceil(self.retry_after))
+
+
+class ControleAdmissao:
+    """
+    Controle de admissão das rotas que escrevem votos.
+
+    Quando o broker cai ou fica lento os lotes que falham vão para o spool, e
+    um pico maior do que a publicação aguenta acumula itens no buffer do
+    EnviadorLote. Em vez de deixar os dois crescerem sem limite, novas
+    requisições são recusadas com 429 e Retry-After enquanto o buffer tiver
+    `max_buffer` itens ou mais, ou o spool passar de `max_spool_lotes` lotes ou
+    `max_spool_bytes` bytes. O que já foi aceito nunca é descartado: o limite
+    vale para a entrada, então cada fila passa do teto no máximo pelo que
+    estava em andamento quando ele foi atingido.
+
+    Com `taxa_cliente` > 0 cada cliente (endereço IP; atrás do nginx, o
+    repassado em X-Forwarded-For, ver PROXIES_CONFIAVEIS) também tem um balde de
+    fichas próprio, de `taxa_cliente` requisições por segundo e rajadas de
+    `rajada_cliente`. Só os `max_clientes` usados mais recentemente são
+    lembrados.
+    """
+
+    def __init__(self, enviador, spool, max_buffer=100_000, max_spool_lotes=10_000,
+                 max_spool_bytes=1024 ** 3, taxa_cliente=0.0, rajada_cliente=None,
+                 max_clientes=10_000, retry_after=5.0):
+        """
+        Args:
+            enviador: EnviadorLote cujo buffer é limitado
+            spool: SpoolReenvio cujo tamanho é limitado
+            max_buffer (int): Itens no buffer a partir dos quais novas escritas são recusadas (0 desliga)
+            max_spool_lotes (int): Lotes no spool a partir dos quais novas escritas são recusadas (0 desliga)
+            max_spool_bytes (int): Bytes no spool a partir dos quais novas escritas são recusadas (0 desliga)
+            taxa_cliente (float): Requisições por segundo por cliente (0 desliga o limite)
+            rajada_cliente (float): Rajada máxima por cliente (padrão: `taxa_cliente`)
+            max_clientes (int): Clientes com balde próprio guardados ao mesmo tempo
+            retry_after (float): Retry-After (s) sugerido quando o buffer ou o spool está cheio
+        """
+        self.enviador = enviador
+        self.spool = spool
+        self.max_buffer = max_buffer
+        self.max_spool_lotes = max_spool_lotes
+        self.max_spool_bytes = max_spool_bytes
+        self.taxa_cliente = taxa_cliente
+        self.rajada_cliente = rajada_cliente
+        self.max_clientes = max_clientes
+        self.retry_after = retry_after
+        self.clientes = OrderedDict()
+        self.lock = threading.Lock()
+        self.admitidas = 0
+        self.recusas = {"buffer": 0, "spool": 0, "taxa_cliente": 0}
+
+    def saturacao(self):
+        """
+        Verifica os limites globais, sem tocar em rede nem em disco.
+
+        Returns:
+            tuple: (motivo, mensagem) do primeiro limite atingido, ou None
+        """
+        buffer = len(self.enviador.buffer)
+        if self.max_buffer and buffer >= self.max_buffer:
+            return "buffer", f"Fila de envio cheia ({buffer} votos aguardando publicação)"
+        lotes = len(self.spool.indice)
+        if self.max_spool_lotes and lotes >= self.max_spool_lotes:
+            return "spool", f"Spool de reenvio cheio ({lotes} lotes aguardando o broker)"
+        if self.max_spool_bytes and self.spool.bytes >= self.max_spool_bytes:
+            return "spool", f"Spool de reenvio cheio ({self.spool.bytes} bytes aguardando o broker)"
+        return None
+
+    def _balde(self, cliente):
+        with self.lock:
+            balde = self.clientes.get(cliente)
+            if balde is None:
+                balde = BaldeFichas(self.taxa_cliente, self.rajada_cliente)
+                self.clientes[cliente] = balde
+                if len(self.clientes) > self.max_clientes:
+                    self.clientes.popitem(last=False)
+            else:
+                self.clientes.move_to_end(cliente)
+            return balde
+
+    def admitir(self, cliente=None):
+        """
+        Deixa a requisição passar ou levanta AdmissaoRecusada.
+
+        Os limites globais vêm primeiro, para uma recusa por saturação não
+        gastar as fichas do cliente.
+
+        Args:
+            cliente: Identificação do cliente (endereço IP); None não é limitado por taxa
+
+        Raises:
+            AdmissaoRecusada: Com o motivo ("buffer", "spool" ou "taxa_cliente") e o Retry-After
+        """
+        saturado = self.saturacao()
+        if saturado is not None:
+            motivo, mensagem = saturado
+            self.recusas[motivo] += 1
+            logger.warning("🚦 Escrita recusada: %s.", mensagem)
+            raise AdmissaoRecusada(motivo, mensagem, self.retry_after)
+        if self.taxa_cliente > 0 and cliente is not None:
+            espera = self._balde(cliente).tentar()
+            if espera > 0:
+                self.recusas["taxa_cliente"] += 1
+                logger.warning("🚦 Cliente %s acima de %s requisições/s.", cliente, self.taxa_cliente)
+                raise AdmissaoRecusada("taxa_cliente", "Limite de requisições por cliente atingido", espera)
+        self.admitidas += 1
+
+    def metricas(self):
+        saturado = self.saturacao()
+        return {
+            "saturado": saturado[0] if saturado else None,
+            "admitidas": self.admitidas,
+            "recusas": dict(self.recusas),
+            "clientes": len(self.clientes),
+            "limites": {
+                "buffer": self.max_buffer,
+                "spool_lotes": self.max_spool_lotes,
+                "spool_bytes": self.max_spool_bytes,
+                "taxa_cliente": self.taxa_cliente,
+            },
+        }
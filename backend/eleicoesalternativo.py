@@ -1,6 +1,4 @@
 from random import normalvariate, random, randint, gauss, uniform, sample
-import matplotlib
-matplotlib.use('Agg')  # Configurar o backend Agg para evitar problemas com threads
 import numpy as np
 
 
@@ -275,4 +273,213 @@ class eleicao:
                 "votos_por_partido": votos_por_partido
             })
 
-        return resultados_cidades
\ No newline at end of file
+        return resultados_cidades
+
+    # === MOTOR VETORIZADO ===
+    # Mesmo modelo de `votacao`/`simular_votos`, mas cada sorteio é feito para
+    # todas as cidades de uma vez como matrizes (cidades x partidos).
+
+    @staticmethod
+    def dividir_populacao_vetorizada(populacao_total, num_cidades, rng):
+        """
+        Divide a população entre as cidades (20% grandes, 30% médias, resto pequenas).
+
+        Equivale a `divide_populacao` de `processar_eleicao`: o limite pela população
+        restante, aplicado cidade a cidade, é o mesmo que limitar a soma acumulada.
+
+        Args:
+            populacao_total (int): População total de eleitores
+            num_cidades (int): Número de cidades
+            rng (np.random.Generator): Gerador de números aleatórios
+
+        Returns:
+            np.ndarray: População de cada cidade, embaralhada
+        """
+        if populacao_total < num_cidades:
+            raise ValueError("População total deve ser maior que o número de cidades")
+
+        cidades_grandes = max(1, int(num_cidades * 0.2))
+        cidades_medias = max(1, int(num_cidades * 0.3))
+        cidades_pequenas = num_cidades - cidades_grandes - cidades_medias
+        if cidades_pequenas < 1:
+            raise ValueError("São necessárias pelo menos 3 cidades para a simulação")
+
+        def limitar(populacoes, disponivel):
+            acumulado = np.minimum(np.cumsum(populacoes), disponivel)
+            return np.diff(acumulado, prepend=0), disponivel - (acumulado[-1] if acumulado.size else 0)
+
+        media_grandes = int(populacao_total * 0.5) // cidades_grandes
+        media_medias = int(populacao_total * 0.3) // cidades_medias
+        grandes_medias = np.concatenate([
+            (media_grandes * rng.uniform(0.8, 1.2, cidades_grandes)).astype(np.int64),
+            (media_medias * rng.uniform(0.8, 1.2, cidades_medias)).astype(np.int64),
+        ])
+        grandes_medias, populacao_restante = limitar(grandes_medias, populacao_total)
+
+        media_pequenas = populacao_restante // cidades_pequenas
+        pequenas = (media_pequenas * rng.uniform(0.8, 1.2, cidades_pequenas - 1)).astype(np.int64)
+        pequenas, populacao_restante = limitar(pequenas, populacao_restante)
+
+        # Última cidade recebe o resto para garantir soma total
+        populacao_cidades = np.concatenate([grandes_medias, pequenas, [populacao_restante]]).astype(np.int64)
+        rng.shuffle(populacao_cidades)
+        return populacao_cidades
+
+    @staticmethod
+    def simular_cidades(populacoes, num_partidos, rng, comparecimento=0.7):
+        """
+        Simula a votação federal de várias cidades de uma só vez.
+
+        Reproduz as etapas de `simular_votos` + `votacao` (influência local, viés de
+        campanha com onda, campanha negativa e virada de última hora, proporções de
+        Dirichlet e ruído gaussiano). As proporções não são arredondadas para duas
+        casas antes do ruído, o que não muda a distribuição dos votos.
+
+        Args:
+            populacoes: População de cada cidade
+            num_partidos (int): Número de partidos
+            rng (np.random.Generator): Gerador de números aleatórios
+            comparecimento (float): Taxa esperada de comparecimento
+
+        Returns:
+            np.ndarray: Matriz (cidades x partidos) com os votos; cada linha soma
+                a população efetiva da cidade
+        """
+        populacoes = np.asarray(populacoes, dtype=np.int64)
+        num_cidades = populacoes.size
+        forma = (num_cidades, num_partidos)
+
+        def sortear_linhas(probabilidade, mascara=None):
+            sorteio = rng.random(num_cidades) < probabilidade
+            return np.nonzero(sorteio if mascara is None else sorteio & mascara)[0]
+
+        def outro_partido(partidos):
+            # Sorteia uniformemente um partido diferente do informado
+            return (partidos + rng.integers(1, num_partidos, partidos.size)) % num_partidos
+
+        # Influência local, com 30% de chance de um partido dominante
+        influencia = rng.uniform(0.7, 1.3, forma)
+        linhas = sortear_linhas(0.3)
+        influencia[linhas, rng.integers(0, num_partidos, linhas.size)] *= rng.uniform(1.3, 1.8, linhas.size)
+
+        # Eventos de última hora no comparecimento
+        populacao_efetiva = np.round(populacoes * comparecimento * rng.uniform(0.95, 1.05, num_cidades)).astype(np.int64)
+
+        vies = rng.uniform(0.1, 3.0, forma)
+
+        # Onda (30%) com efeito secundário em outro partido (20% das ondas)
+        onda = np.zeros(num_cidades, dtype=bool)
+        linhas = sortear_linhas(0.3)
+        onda[linhas] = True
+        momentum = rng.integers(0, num_partidos, num_cidades)
+        vies[linhas, momentum[linhas]] *= rng.uniform(1.5, 2.5, linhas.size)
+        if num_partidos > 1:
+            linhas = sortear_linhas(0.2, onda)
+            vies[linhas, outro_partido(momentum[linhas])] *= rng.uniform(1.1, 1.3, linhas.size)
+
+        # Campanha negativa (40%) contra 1 a 3 partidos distintos
+        linhas = sortear_linhas(0.4)
+        num_alvos = np.minimum(rng.integers(1, 4, linhas.size), num_partidos)
+        posicao = rng.random((linhas.size, num_partidos)).argsort(axis=1).argsort(axis=1)
+        alvos = posicao < num_alvos[:, None]
+        vies[linhas] = np.where(alvos, vies[linhas] * rng.uniform(0.6, 0.9, alvos.shape), vies[linhas])
+
+        # Decisões de última hora (15%): parte do viés migra para outro partido
+        if num_partidos > 1:
+            linhas = sortear_linhas(0.15)
+            origem = rng.integers(0, num_partidos, linhas.size)
+            destino = outro_partido(origem)
+            valor_mudanca = vies[linhas, origem] * rng.uniform(0.05, 0.15, linhas.size)
+            vies[linhas, origem] -= valor_mudanca
+            vies[linhas, destino] += valor_mudanca
+
+        pesos_popularidade = rng.uniform(0.1, 4.0, forma) * vies * influencia
+
+        # Dirichlet por linha via amostras gama normalizadas
+        amostras = rng.gamma(pesos_popularidade)
+        somas = amostras.sum(axis=1, keepdims=True)
+        vazias = somas[:, 0] == 0
+        if vazias.any():
+            amostras[vazias] = pesos_popularidade[vazias]
+            somas[vazias] = amostras[vazias].sum(axis=1, keepdims=True)
+        proporcoes = amostras / somas
+
+        # Ruído nos votos
+        votos_estimados = np.round(proporcoes * populacao_efetiva[:, None])
+        votos = np.maximum(0, np.round(rng.normal(votos_estimados, votos_estimados * 0.15))).astype(np.int64)
+
+        return eleicao._ajustar_soma(votos, populacao_efetiva, rng)
+
+    @staticmethod
+    def _ajustar_soma(votos, alvo, rng):
+        """
+        Ajuste final para a população efetiva, equivalente ao laço voto a voto de `votacao`.
+
+        A diferença de cada cidade é repartida igualmente entre os partidos
+        (ao retirar, só entre os que ainda têm votos) e a sobra da divisão vai
+        para partidos sorteados.
+        """
+        residuo = alvo - votos.sum(axis=1)
+        linhas = np.nonzero(residuo)[0]
+        while linhas.size:
+            parcial = votos[linhas]
+            falta = residuo[linhas]
+            elegiveis = (falta[:, None] > 0) | (parcial > 0)
+            quantidade = np.maximum(elegiveis.sum(axis=1), 1)
+            base, sobra = np.divmod(np.abs(falta), quantidade)
+
+            sorteio = np.where(elegiveis, rng.random(parcial.shape), 2.0)
+            posicao = sorteio.argsort(axis=1).argsort(axis=1)
+            passo = np.where(elegiveis, base[:, None] + (posicao < sobra[:, None]), 0)
+            passo = np.where(falta[:, None] < 0, -np.minimum(passo, parcial), passo)
+
+            votos[linhas] = parcial + passo
+            residuo[linhas] = falta - passo.sum(axis=1)
+            linhas = linhas[residuo[linhas] != 0]
+        return votos
+
+    @staticmethod
+    def formatar_resultados(nomes_cidades, populacoes, votos, partidos):
+        """Monta a mesma lista de dicionários devolvida por `processar_eleicao`."""
+        totais = votos.sum(axis=1)
+        vencedores = votos.argmax(axis=1)
+        resultados_cidades = []
+        for i, nome in enumerate(nomes_cidades):
+            total_votos_cidade = int(totais[i])
+            if total_votos_cidade > 0:
+                vencedor = partidos[vencedores[i]]
+                porcentagem_vencedor = round(float(votos[i, vencedores[i]] / total_votos_cidade * 100), 2)
+            else:
+                vencedor = "N/A"
+                porcentagem_vencedor = 0
+            resultados_cidades.append({
+                "nome": nome,
+                "populacao": int(populacoes[i]),
+                "total_votos": total_votos_cidade,
+                "vencedor": vencedor,
+                "porcentagem_vencedor": porcentagem_vencedor,
+                "votos_por_partido": dict(zip(partidos, votos[i].tolist()))
+            })
+        return resultados_cidades
+
+    @staticmethod
+    def processar_eleicao_vetorizada(cidades, partidos, populacao_total, semente=None):
+        """
+        Versão vetorizada de `processar_eleicao`, com o mesmo formato de saída.
+
+        Args:
+            cidades: Lista de nomes das cidades ou número inteiro de cidades
+            partidos: Lista de nomes dos partidos
+            populacao_total: População total de eleitores
+            semente (int): Semente opcional para resultados reprodutíveis
+
+        Returns:
+            list: Lista de dicionários com os resultados de cada cidade
+        """
+        rng = np.random.default_rng(semente)
+        num_cidades = cidades if isinstance(cidades, int) else len(cidades)
+        nomes_cidades = cidades if isinstance(cidades, list) else [f"Cidade {i+1}" for i in range(num_cidades)]
+
+        populacao_cidades = eleicao.dividir_populacao_vetorizada(populacao_total, num_cidades, rng)
+        votos = eleicao.simular_cidades(populacao_cidades, len(partidos), rng)
+        return eleicao.formatar_resultados(nomes_cidades, populacao_cidades, votos, partidos)
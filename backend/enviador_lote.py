@@ -0,0 +1,305 @@
+import math
+import time
+import uuid
+import queue
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Peso da medição mais recente nas médias móveis exponenciais (EWMA)
+ALFA_EWMA = 0.2
+# Intervalo mínimo (s) entre recálculos da taxa de chegada
+JANELA_TAXA = 0.25
+
+
+class EnviadorLote:
+    """
+    Acumula itens e os publica em lotes, por tamanho ou por tempo de espera.
+
+    Uma única thread agendadora, de vida longa, decide quando enviar: quando o
+    buffer atinge o tamanho alvo ou quando o item mais antigo já esperou o
+    tempo alvo. No modo fixo esses alvos são `tamanho_max` e `intervalo`. No
+    modo adaptativo o tamanho é o menor que mantém as publicações por segundo
+    em `publicacoes_alvo` para a taxa de chegada observada (entre `tamanho_min`
+    e `tamanho_max`), e `intervalo` é o atraso alvo de ponta a ponta (chegada
+    até a confirmação do broker): um lote incompleto espera só o que sobra dele
+    depois da latência de publicação observada. Com tráfego baixo cada voto sai
+    quase na hora; em picos os lotes crescem. O alvo decide só quando enviar: o
+    que já se acumulou no buffer sai em lotes de até `tamanho_max`.
+
+    Com um LogAntecipado (WAL), cada item é gravado em disco antes de entrar no
+    buffer e só é descartado do log depois que o broker confirma o lote (ou o
+    lote é guardado no spool de reenvio). Itens não confirmados de uma execução
+    anterior voltam para o buffer na inicialização.
+
+    O resultado de cada publicação chega na thread do publicador (o ioloop do
+    pika), que não pode esperar disco. Gravar no spool um lote que falhou e
+    confirmar a faixa no WAL fazem fsync, então ficam com uma segunda thread,
+    que recebe os resultados por uma fila.
+    """
+
+    def __init__(self, fila, tamanho_max, intervalo, spool, wal=None,
+                 adaptativo=False, tamanho_min=1, publicacoes_alvo=50.0, amostras_atraso=10_000):
+        """
+        Args:
+            tamanho_max (int): Tamanho máximo de um lote
+            intervalo (float): Espera máxima (s) no modo fixo; atraso alvo (s) no adaptativo
+            spool: SpoolReenvio onde vão os lotes que falharam
+            wal: LogAntecipado opcional
+            adaptativo (bool): Ajusta tamanho e espera pela carga observada
+            tamanho_min (int): Menor tamanho alvo no modo adaptativo
+            publicacoes_alvo (float): Publicações por segundo desejadas sob carga alta
+            amostras_atraso (int): Quantos atrasos de ponta a ponta guardar para os percentis
+        """
+        self.fila = fila
+        self.tamanho_max = tamanho_max
+        self.intervalo = intervalo
+        self.spool = spool
+        self.wal = wal
+        self.adaptativo = adaptativo
+        self.tamanho_min = max(1, tamanho_min)
+        self.publicacoes_alvo = publicacoes_alvo
+        # deque: `_retirar` tira do início sem mover o resto do buffer (um `del lista[:n]` por lote
+        # deixaria um buffer grande, drenado em lotes pequenos, quadrático)
+        self.buffer = deque()
+        self.chegadas = deque()  # momento de chegada de cada item do buffer
+        # Sequência do WAL correspondente a buffer[0]; os itens do buffer são contíguos
+        self.seq_buffer = None
+        if wal is not None:
+            self.buffer.extend(wal.pendentes_recuperados)
+            wal.pendentes_recuperados = []
+            self.seq_buffer = wal.primeira_pendente
+            self.chegadas.extend([time.monotonic()] * len(self.buffer))
+
+        self.tamanho_alvo = self.tamanho_min if adaptativo else tamanho_max
+        self.espera = intervalo
+        self.taxa_chegada = 0.0
+        self.latencia_publicacao = 0.0
+        self.lotes_enviados = 0
+        self.itens_enviados = 0
+        # Lotes fechados por motivo: buffer cheio, espera vencida ou desligamento
+        self.envios = {"tamanho": 0, "tempo": 0, "desligamento": 0}
+        self.atrasos = deque(maxlen=amostras_atraso)
+        self._chegadas_janela = 0
+        self._inicio_janela = time.monotonic()
+
+        self.lock = threading.RLock()
+        self.condicao = threading.Condition(self.lock)
+        # (ok, pacote, faixa) de cada publicação, tratados fora da thread do publicador; None encerra
+        self._resultados = queue.Queue()
+        self._thread_resultados = threading.Thread(target=self._tratar_resultados,
+                                                   name="enviador-resultados", daemon=True)
+        self._thread_resultados.start()
+        self._rodando = True
+        self._thread = threading.Thread(target=self._agendar_envios, name="enviador-lote", daemon=True)
+        self._thread.start()
+
+    def adicionar(self, item):
+        self.adicionar_varios([item])
+
+    def adicionar_varios(self, itens):
+        """
+        Adiciona itens ao buffer; a thread agendadora envia quando o lote fecha.
+
+        Com WAL, só retorna depois que os itens estão no disco (fsync em grupo).
+        """
+        itens = list(itens)
+        if not itens:
+            return
+        inicio = time.perf_counter()
+        agora = time.monotonic()
+        ticket = None
+        with self.condicao:
+            if self.wal is not None:
+                _, _, ticket = self.wal.anexar(itens)
+            vazio = not self.buffer
+            self.buffer.extend(itens)
+            self.chegadas.extend([agora] * len(itens))
+            self._chegadas_janela += len(itens)
+            if vazio or len(self.buffer) >= self.tamanho_alvo:
+                self.condicao.notify()
+        if ticket is not None:
+            self.wal.aguardar(ticket, inicio)
+
+    def _retirar(self, quantidade):
+        """Tira até `quantidade` itens do início do buffer, com a faixa de sequências no WAL."""
+        quantidade = min(quantidade, len(self.buffer))
+        dados = [self.buffer.popleft() for _ in range(quantidade)]
+        chegada = self.chegadas[0]
+        for _ in range(quantidade):
+            self.chegadas.popleft()
+        faixa = None
+        if self.seq_buffer is not None:
+            faixa = (self.seq_buffer, self.seq_buffer + len(dados) - 1)
+            self.seq_buffer += len(dados)
+        return dados, faixa, chegada
+
+    def _ajustar(self, agora):
+        """Atualiza a taxa de chegada e, no modo adaptativo, o tamanho e a espera alvo."""
+        decorrido = agora - self._inicio_janela
+        if decorrido < JANELA_TAXA:
+            return
+        taxa = self._chegadas_janela / decorrido
+        self.taxa_chegada = ALFA_EWMA * taxa + (1 - ALFA_EWMA) * self.taxa_chegada
+        self._chegadas_janela = 0
+        self._inicio_janela = agora
+        if not self.adaptativo:
+            return
+        # Menor lote que mantém as publicações por segundo no alvo: sob pouca carga
+        # cada voto sai sozinho, em picos os lotes crescem
+        tamanho = math.ceil(self.taxa_chegada / self.publicacoes_alvo)
+        self.tamanho_alvo = max(self.tamanho_min, min(self.tamanho_max, tamanho))
+        # Um lote incompleto espera no máximo o que sobra do atraso alvo depois da publicação
+        espera_minima = min(self.intervalo, 1.0 / self.publicacoes_alvo)
+        self.espera = max(espera_minima, self.intervalo - self.latencia_publicacao)
+
+    def _proximos_lotes(self):
+        """Espera, com a condição adquirida, até algum lote fechar. Devolve (lotes, origem) ou None ao desligar."""
+        while self._rodando:
+            agora = time.monotonic()
+            self._ajustar(agora)
+            # O alvo só decide quando um lote fecha; o que já está acumulado sai em lotes de até
+            # `tamanho_max`. Depois de um período ocioso o alvo ainda está perto de `tamanho_min`
+            # e cortar uma rajada nele viraria uma publicação (ou um arquivo no spool) por item
+            if len(self.buffer) >= self.tamanho_alvo:
+                lotes = []
+                while len(self.buffer) >= self.tamanho_alvo:
+                    lotes.append(self._retirar(self.tamanho_max))
+                return lotes, "tamanho"
+            if self.buffer:
+                vence = self.chegadas[0] + self.espera
+                if agora >= vence:
+                    lotes = []
+                    while self.buffer:
+                        lotes.append(self._retirar(self.tamanho_max))
+                    return lotes, "tempo"
+                self.condicao.wait(min(vence - agora, JANELA_TAXA))
+            else:
+                self.condicao.wait(JANELA_TAXA if self.adaptativo else None)
+        return None
+
+    def _agendar_envios(self):
+        while True:
+            with self.condicao:
+                proximos = self._proximos_lotes()
+            if proximos is None:
+                return
+            lotes, origem = proximos
+            for dados, faixa, chegada in lotes:
+                self._publicar(dados, faixa, chegada, origem)
+
+    def enviar(self, por_tamanho=False):
+        """Envia já o que houver no buffer (um lote se `por_tamanho`, senão tudo)."""
+        with self.lock:
+            lotes = []
+            while self.buffer:
+                lotes.append(self._retirar(self.tamanho_alvo if por_tamanho else self.tamanho_max))
+                if por_tamanho:
+                    break
+        origem = "tamanho" if por_tamanho else "tempo"
+        for dados, faixa, chegada in lotes:
+            self._publicar(dados, faixa, chegada, origem)
+
+    def _publicar(self, dados, faixa, chegada, origem):
+        pacote = {
+            "batchId": f"BATCH_{uuid.uuid4().hex[:12]}",
+            "sourceNodeId": "GRUPO_1",
+            "dataPoints": dados
+        }
+        publicado = time.monotonic()
+        self.envios[origem] += 1
+
+        def ao_confirmar(futuro):
+            ok = futuro.result()
+            if ok:
+                agora = time.monotonic()
+                self.latencia_publicacao = (ALFA_EWMA * (agora - publicado)
+                                            + (1 - ALFA_EWMA) * self.latencia_publicacao)
+                self.atrasos.append(agora - chegada)
+                self.lotes_enviados += 1
+                self.itens_enviados += len(dados)
+                logger.info("📤 %s itens enviados (%s)", len(dados), origem)
+                if self.wal is None or faixa is None:
+                    return
+            # Spool e WAL fazem fsync: ficam com a thread de resultados, não com o ioloop
+            self._resultados.put((ok, pacote, faixa))
+
+        # Não espera o broker: a confirmação chega na thread do publicador
+        self.fila.publicar(pacote).add_done_callback(ao_confirmar)
+
+    def _tratar_resultados(self):
+        """Guarda no spool os lotes que falharam e confirma as faixas no WAL, na ordem de chegada."""
+        while True:
+            resultado = self._resultados.get()
+            if resultado is None:
+                return
+            ok, pacote, faixa = resultado
+            try:
+                if not ok:
+                    logger.error("❌ Falha no envio. %s itens serão persistidos.", len(pacote["dataPoints"]))
+                    if not self.persistir_lote(pacote):
+                        continue
+                self._confirmar_wal(faixa)
+            except Exception as e:
+                # Sem confirmação no WAL os itens voltam na próxima partida; a thread segue viva
+                logger.error("💥 Erro ao tratar o resultado do lote %s: %s", pacote.get("batchId"), e)
+
+    def _confirmar_wal(self, faixa):
+        if self.wal is not None and faixa is not None:
+            self.wal.confirmar(*faixa)
+
+    def persistir_lote(self, pacote):
+        return self.spool.guardar(pacote)
+
+    def metricas(self):
+        atrasos = sorted(self.atrasos)
+        def percentil(p):
+            return atrasos[min(len(atrasos) - 1, int(len(atrasos) * p))] * 1000 if atrasos else 0.0
+        dados = {
+            "modo": "adaptativo" if self.adaptativo else "fixo",
+            "buffer": len(self.buffer),
+            "tamanho_alvo": self.tamanho_alvo,
+            "espera_ms": self.espera * 1000,
+            "taxa_chegada": round(self.taxa_chegada, 1),
+            "latencia_publicacao_ms": self.latencia_publicacao * 1000,
+            "lotes_enviados": self.lotes_enviados,
+            "itens_enviados": self.itens_enviados,
+            "envios": dict(self.envios),
+            "resultados_pendentes": self._resultados.qsize(),
+            "atraso_p50_ms": percentil(0.50),
+            "atraso_p99_ms": percentil(0.99),
+        }
+        if self.wal is not None:
+            dados["wal"] = self.wal.metricas()
+        return dados
+
+    def desligar(self):
+        logger.info("Finalizando EnviadorLote. Enviando o restante...")
+        with self.condicao:
+            self._rodando = False
+            self.condicao.notify_all()
+        self._thread.join(timeout=5)
+        with self.lock:
+            if self.buffer:
+                dados, faixa, _ = self._retirar(len(self.buffer))
+                pacote = {
+                    "batchId": f"SHUTDOWN_{uuid.uuid4().hex[:12]}",
+                    "sourceNodeId": "GRUPO_1",
+                    "dataPoints": dados
+                }
+                self.envios["desligamento"] += 1
+                if self.fila.mandar(pacote):
+                    logger.info("📤 Lote final com %s itens enviado.", len(dados))
+                    self._confirmar_wal(faixa)
+                else:
+                    logger.error("❌ Falha no envio do lote final. %s itens serão persistidos.", len(dados))
+                    if self.persistir_lote(pacote):
+                        self._confirmar_wal(faixa)
+        # Termina o que já chegou do publicador antes de fechar o WAL
+        self._resultados.put(None)
+        self._thread_resultados.join(timeout=10)
+        with self.lock:
+            if self.wal is not None:
+                self.wal.fechar()
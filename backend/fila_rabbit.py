@@ -0,0 +1,288 @@
+import ssl
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+import pika
+
+from codec_lote import CodecLote
+from metricas import Histograma
+
+logger = logging.getLogger(__name__)
+
+
+def _futuro_resolvido(valor):
+    futuro = Future()
+    futuro.set_result(valor)
+    return futuro
+
+
+class FilaRabbit:
+    """
+    Publicador de lotes no RabbitMQ com confirmação do broker.
+
+    Uma única thread é dona da conexão (pika.SelectConnection) e de todo o uso do
+    canal. As demais threads entregam pacotes por uma fila limitada e recebem um
+    Future que resolve True quando o broker confirma (Basic.Ack) e False em caso
+    de Nack, queda de conexão ou fila cheia. Várias publicações ficam em voo ao
+    mesmo tempo, sem esperar a confirmação de uma para enviar a próxima.
+
+    Reconexões acontecem só na thread do publicador; enquanto a conexão não está
+    pronta, `publicar` falha na hora para que o chamador persista o lote.
+
+    `latencia_confirmacao` mede de `publicar` até o Ack/Nack do broker (inclui a
+    espera na fila interna) e `falhas` conta os lotes que não chegaram ao broker.
+    """
+
+    def __init__(self, host, port, username, password, virtual_host, fila,
+                 usar_ssl=True, max_pendentes=1000, max_em_voo=256, intervalo_reconexao=5, codec=None):
+        """
+        Args:
+            fila: Nome da fila durável onde os lotes são publicados
+            usar_ssl (bool): Conecta com TLS (CloudAMQP usa a porta 5671)
+            max_pendentes (int): Tamanho da fila de pacotes aguardando publicação
+            max_em_voo (int): Publicações aguardando confirmação do broker ao mesmo tempo
+            intervalo_reconexao (float): Espera (s) entre tentativas de reconexão
+            codec: CodecLote usado para serializar os pacotes (padrão: JSON)
+        """
+        self.fila = fila
+        self.codec = codec or CodecLote()
+        self.max_em_voo = max_em_voo
+        self.intervalo_reconexao = intervalo_reconexao
+        self.params = pika.ConnectionParameters(
+            host=host,
+            port=port,
+            virtual_host=virtual_host,
+            credentials=pika.PlainCredentials(username, password),
+            ssl_options=pika.SSLOptions(ssl.create_default_context()) if usar_ssl else None,
+            heartbeat=300,
+            blocked_connection_timeout=150
+        )
+
+        self.pendentes = queue.Queue(maxsize=max_pendentes)
+        self.conn = None
+        self.ch = None
+        self.pronto = False
+        self.confirmados = 0
+        self.rejeitados = 0
+        self.falhas = 0
+        self.latencia_confirmacao = Histograma()
+        self.ouvintes = []
+        self._em_voo = {}
+        self._tag = 0
+        self._rodando = True
+        self._parado = threading.Event()
+        self._primeira_tentativa = threading.Event()
+        self._thread = threading.Thread(target=self._rodar, name="publicador-rabbit", daemon=True)
+        self._thread.start()
+
+    # === API usada pelas outras threads ===
+
+    def publicar(self, pacote):
+        """Agenda a publicação e devolve um Future[bool] resolvido na confirmação do broker."""
+        if not self.pronto:
+            self.falhas += 1
+            return _futuro_resolvido(False)
+        inicio = time.monotonic()
+        futuro = Future()
+        # Serializa aqui, na thread de quem publica, para não ocupar a thread da conexão
+        corpo, tipo, codificacao, cabecalhos = self.codec.codificar(pacote)
+        propriedades = pika.BasicProperties(
+            delivery_mode=2,
+            content_type=tipo,
+            content_encoding=codificacao,
+            headers=cabecalhos
+        )
+        try:
+            self.pendentes.put_nowait((futuro, pacote['batchId'], corpo, propriedades, inicio))
+        except queue.Full:
+            self.falhas += 1
+            logger.warning("⚠️ Fila do publicador cheia. Lote recusado.")
+            return _futuro_resolvido(False)
+        self._acordar()
+        if self.ouvintes:
+            futuro.add_done_callback(lambda f: f.result() and self._avisar_ouvintes(pacote))
+        return futuro
+
+    def mandar(self, pacote, timeout=30):
+        """Publica e espera a confirmação. Retorna True só se o broker confirmou."""
+        futuro = self.publicar(pacote)
+        try:
+            return futuro.result(timeout=timeout)
+        except Exception:
+            futuro.cancel()
+            return False
+
+    def adicionar_ouvinte(self, ouvinte):
+        """Registra uma função chamada com cada pacote confirmado pelo broker (na thread do publicador)."""
+        self.ouvintes.append(ouvinte)
+
+    def _avisar_ouvintes(self, pacote):
+        for ouvinte in self.ouvintes:
+            try:
+                ouvinte(pacote)
+            except Exception as e:
+                logger.error("Erro ao avisar confirmação do lote %s: %s", pacote.get('batchId'), e)
+
+    @property
+    def conectado(self):
+        return self.pronto
+
+    @property
+    def iniciando(self):
+        """True até a primeira tentativa de conexão terminar (com sucesso ou não)."""
+        return not self._primeira_tentativa.is_set()
+
+    def estado(self):
+        return {
+            "conectado": self.pronto,
+            "iniciando": self.iniciando,
+            "pendentes": self.pendentes.qsize(),
+            "em_voo": len(self._em_voo),
+            "confirmados": self.confirmados,
+            "rejeitados": self.rejeitados,
+            "falhas": self.falhas
+        }
+
+    def fechar(self):
+        self._rodando = False
+        conn = self.conn
+        if conn is not None:
+            logger.info("Encerrando conexão com RabbitMQ...")
+            try:
+                conn.ioloop.add_callback_threadsafe(self._fechar_conexao)
+            except Exception:
+                pass
+        self._parado.set()
+        self._thread.join(timeout=10)
+
+    def _acordar(self):
+        conn = self.conn
+        if conn is None:
+            return
+        try:
+            conn.ioloop.add_callback_threadsafe(self._drenar)
+        except Exception:
+            pass
+
+    # === Thread do publicador ===
+
+    def _rodar(self):
+        while self._rodando:
+            try:
+                logger.info("🔌 Conectando ao RabbitMQ...")
+                self.conn = pika.SelectConnection(
+                    self.params,
+                    on_open_callback=self._ao_abrir_conexao,
+                    on_open_error_callback=self._ao_falhar_conexao,
+                    on_close_callback=self._ao_fechar_conexao
+                )
+                self.conn.ioloop.start()
+            except Exception as e:
+                logger.error("💥 Erro na conexão: %s", e)
+            self._encerrar_sessao()
+            self._primeira_tentativa.set()
+            if self._rodando:
+                self._parado.wait(self.intervalo_reconexao)
+
+    def _ao_abrir_conexao(self, conn):
+        conn.channel(on_open_callback=self._ao_abrir_canal)
+
+    def _ao_falhar_conexao(self, conn, erro):
+        logger.error("💥 Erro na conexão: %s", erro)
+        conn.ioloop.stop()
+
+    def _ao_fechar_conexao(self, conn, motivo):
+        if self._rodando:
+            logger.warning("⚠️ Conexão perdida (%s). Tentando reconectar...", motivo)
+        conn.ioloop.stop()
+
+    def _ao_abrir_canal(self, ch):
+        self.ch = ch
+        ch.add_on_close_callback(self._ao_fechar_canal)
+        ch.confirm_delivery(self._ao_confirmar, callback=lambda _: ch.queue_declare(
+            queue=self.fila, durable=True, callback=self._ao_declarar_fila
+        ))
+
+    def _ao_fechar_canal(self, ch, motivo):
+        if self._rodando:
+            logger.warning("⚠️ Canal fechado: %s", motivo)
+        self.pronto = False
+        if self.conn and self.conn.is_open:
+            self.conn.close()
+
+    def _ao_declarar_fila(self, _):
+        self._tag = 0
+        self.pronto = True
+        self._primeira_tentativa.set()
+        logger.info("✅ Conectado com sucesso!")
+        self._drenar()
+
+    def _drenar(self):
+        while self.pronto and len(self._em_voo) < self.max_em_voo:
+            try:
+                futuro, batch_id, corpo, propriedades, inicio = self.pendentes.get_nowait()
+            except queue.Empty:
+                return
+            if not futuro.set_running_or_notify_cancel():
+                continue
+            try:
+                self.ch.basic_publish(
+                    exchange='',
+                    routing_key=self.fila,
+                    body=corpo,
+                    properties=propriedades
+                )
+            except Exception as e:
+                logger.error("❌ Erro no envio: %s", e)
+                self.falhas += 1
+                futuro.set_result(False)
+                continue
+            self._tag += 1
+            self._em_voo[self._tag] = (futuro, batch_id, inicio)
+
+    def _ao_confirmar(self, quadro):
+        metodo = quadro.method
+        ack = isinstance(metodo, pika.spec.Basic.Ack)
+        if metodo.multiple:
+            tags = [t for t in self._em_voo if t <= metodo.delivery_tag]
+        else:
+            tags = [metodo.delivery_tag]
+        for tag in tags:
+            futuro, batch_id, inicio = self._em_voo.pop(tag, (None, None, None))
+            if futuro is None:
+                continue
+            self.latencia_confirmacao.observar(time.monotonic() - inicio)
+            if ack:
+                self.confirmados += 1
+                logger.info("📨 Lote confirmado pelo broker: %s", batch_id)
+            else:
+                self.rejeitados += 1
+                logger.error("❌ Broker rejeitou o lote %s", batch_id)
+            futuro.set_result(ack)
+        self._drenar()
+
+    def _encerrar_sessao(self):
+        """Falha tudo que estava em voo ou na fila: sem conexão não há confirmação possível."""
+        self.pronto = False
+        self.ch = None
+        em_voo, self._em_voo = self._em_voo, {}
+        for futuro, _, _ in em_voo.values():
+            self.falhas += 1
+            futuro.set_result(False)
+        while True:
+            try:
+                futuro = self.pendentes.get_nowait()[0]
+            except queue.Empty:
+                break
+            if futuro.set_running_or_notify_cancel():
+                self.falhas += 1
+                futuro.set_result(False)
+
+    def _fechar_conexao(self):
+        if self.conn and self.conn.is_open:
+            self.conn.close()
+        else:
+            self.conn.ioloop.stop()
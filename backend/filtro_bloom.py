@@ -0,0 +1,104 @@
+import os
+import math
+import mmap
+import struct
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAGICO = b'BLOOMCPF'
+CABECALHO = struct.Struct('<8sQQQ')  # mágico, bits, hashes, encerrado_limpo
+
+
+class FiltroBloom:
+    """
+    Filtro de Bloom persistido em um arquivo mapeado em memória (mmap).
+
+    Responde "com certeza não está" sem falsos negativos; um "talvez esteja"
+    precisa ser confirmado no armazenamento exato. Os bits vivem no arquivo, de
+    modo que um reinício limpo reaproveita o filtro sem reconstruí-lo.
+    """
+
+    def __init__(self, caminho, capacidade, taxa_fp=0.001):
+        """
+        Args:
+            caminho: Arquivo onde os bits são persistidos
+            capacidade (int): Número de chaves esperado
+            taxa_fp (float): Taxa de falsos positivos desejada na capacidade máxima
+        """
+        self.caminho = caminho
+        self.capacidade = capacidade
+        self.bits = max(8, math.ceil(-capacidade * math.log(taxa_fp) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacidade * math.log(2)))
+        self.lock = threading.Lock()
+
+        tamanho = CABECALHO.size + (self.bits + 7) // 8
+        existente = os.path.exists(caminho) and os.path.getsize(caminho) == tamanho
+        self._arquivo = open(caminho, 'r+b' if existente else 'w+b')
+        if not existente:
+            self._arquivo.truncate(tamanho)
+        self._mapa = mmap.mmap(self._arquivo.fileno(), tamanho)
+
+        magico, bits, hashes, limpo = CABECALHO.unpack_from(self._mapa, 0)
+        self.reaproveitado = magico == MAGICO and bits == self.bits and hashes == self.hashes and limpo == 1
+        if existente and not self.reaproveitado:
+            # Arquivo novo já nasce zerado pelo truncate; zerar de novo tocaria cada página à toa
+            self._mapa[CABECALHO.size:] = bytes(tamanho - CABECALHO.size)
+        # Enquanto aberto, o filtro é marcado como "sujo": um crash obriga a reconstrução.
+        CABECALHO.pack_into(self._mapa, 0, MAGICO, self.bits, self.hashes, 0)
+        self._mapa.flush()
+        # Um filtro novo ou zerado começa vazio; num reaproveitado a contagem (percorrer o arquivo
+        # inteiro) fica para a primeira vez que a taxa de falsos positivos for pedida
+        self._bits_ligados = None if self.reaproveitado else 0
+
+    def _posicoes(self, chave):
+        digest = hashlib.blake2b(chave.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def adicionar(self, chave):
+        base = CABECALHO.size
+        with self.lock:
+            for pos in self._posicoes(chave):
+                indice = base + (pos >> 3)
+                mascara = 1 << (pos & 7)
+                byte = self._mapa[indice]
+                if not byte & mascara:
+                    self._mapa[indice] = byte | mascara
+                    if self._bits_ligados is not None:
+                        self._bits_ligados += 1
+
+    def pode_conter(self, chave):
+        base = CABECALHO.size
+        mapa = self._mapa
+        for pos in self._posicoes(chave):
+            if not mapa[base + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    @property
+    def bits_ligados(self):
+        with self.lock:
+            if self._bits_ligados is None:
+                self._bits_ligados = int.from_bytes(self._mapa[CABECALHO.size:], 'little').bit_count()
+            return self._bits_ligados
+
+    def taxa_falsos_positivos(self):
+        """Taxa estimada a partir da fração de bits ligados: (ligados / bits) ^ hashes."""
+        return (self.bits_ligados / self.bits) ** self.hashes
+
+    def memoria_bytes(self):
+        return len(self._mapa)
+
+    def fechar(self):
+        with self.lock:
+            if self._mapa.closed:
+                return
+            CABECALHO.pack_into(self._mapa, 0, MAGICO, self.bits, self.hashes, 1)
+            self._mapa.flush()
+            self._mapa.close()
+            self._arquivo.close()
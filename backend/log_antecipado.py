@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+from commit_grupo import CommitEmGrupo
+
+logger = logging.getLogger(__name__)
+
+
+class LogAntecipado:
+    """
+    Log de escrita antecipada (WAL) dos itens aceitos pelo EnviadorLote.
+
+    Cada item recebe um número de sequência e é gravado em um segmento
+    (`segmento_<n>.log`, uma linha JSON por item) com fsync em grupo. Quando o
+    broker confirma um lote (ou ele é persistido para reenvio), a faixa de
+    sequências é confirmada; segmentos totalmente confirmados são apagados e a
+    maior sequência confirmada em ordem fica no arquivo `confirmado` (gravado
+    com fsync, antes de qualquer segmento ser apagado). Na inicialização, tudo
+    acima dela é devolvido para ser reenfileirado.
+    """
+
+    def __init__(self, diretorio, tamanho_segmento=4 * 1024 * 1024, amostras_latencia=10_000):
+        """
+        Args:
+            diretorio: Pasta dos segmentos
+            tamanho_segmento (int): Bytes a partir dos quais um novo segmento é aberto
+            amostras_latencia (int): Quantas latências de escrita guardar para os percentis
+        """
+        self.diretorio = diretorio
+        self.tamanho_segmento = tamanho_segmento
+        self.caminho_confirmado = os.path.join(diretorio, 'confirmado')
+        self.lock = threading.Lock()
+        self._lock_confirmado = threading.Lock()
+        self.latencias = deque(maxlen=amostras_latencia)
+        self.registros = 0
+
+        os.makedirs(diretorio, exist_ok=True)
+        self.confirmado_ate = self._confirmado_gravado = self._ler_confirmado()
+        self._confirmados_fora_de_ordem = {}
+        self.segmentos = []  # [numero, primeira_seq, ultima_seq]
+        self.pendentes_recuperados, primeira = self._recuperar()
+        self.seq = max([self.confirmado_ate] + [s[2] for s in self.segmentos])
+        # Sequência do primeiro item devolvido. O cursor parte dela, não do arquivo `confirmado`:
+        # se ele ficou para trás (ou vazio) num crash, as sequências abaixo já não existem em
+        # segmento nenhum e `confirmado_ate + 1` nunca mais casaria com uma faixa confirmada
+        self.primeira_pendente = primeira if primeira is not None else self.seq + 1
+        self.confirmado_ate = max(self.confirmado_ate, self.primeira_pendente - 1)
+
+        numero = self.segmentos[-1][0] + 1 if self.segmentos else 1
+        self.segmentos.append([numero, self.seq + 1, self.seq])
+        self._bytes_segmento = 0
+        self.commit = CommitEmGrupo(open(self._caminho(numero), 'ab'))
+        self._gravar_confirmado()
+        with self.lock:
+            self._apagar_confirmados()
+
+    def _caminho(self, numero):
+        return os.path.join(self.diretorio, f'segmento_{numero:08d}.log')
+
+    def _ler_confirmado(self):
+        try:
+            with open(self.caminho_confirmado, 'r') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _recuperar(self):
+        """
+        Lê os segmentos existentes.
+
+        Returns:
+            tuple: (itens ainda não confirmados, em ordem; sequência do primeiro deles ou None)
+        """
+        numeros = sorted(
+            int(nome[len('segmento_'):-len('.log')])
+            for nome in os.listdir(self.diretorio)
+            if nome.startswith('segmento_') and nome.endswith('.log')
+        )
+        itens = []
+        primeira_pendente = None
+        for numero in numeros:
+            caminho = self._caminho(numero)
+            primeira = ultima = None
+            valido = 0
+            with open(caminho, 'rb') as f:
+                for linha in f:
+                    if not linha.endswith(b'\n'):
+                        break
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        break
+                    valido += len(linha)
+                    primeira = registro["seq"] if primeira is None else primeira
+                    ultima = registro["seq"]
+                    if registro["seq"] > self.confirmado_ate:
+                        if primeira_pendente is None:
+                            primeira_pendente = registro["seq"]
+                        itens.append(registro["item"])
+            if valido != os.path.getsize(caminho):
+                logger.warning("⚠️ Registro incompleto descartado no fim de %s.", caminho)
+                with open(caminho, 'r+b') as f:
+                    f.truncate(valido)
+            if primeira is None:
+                os.remove(caminho)
+                continue
+            self.segmentos.append([numero, primeira, ultima])
+        if itens:
+            logger.info("♻️ %s item(ns) não confirmados recuperados do WAL.", len(itens))
+        return itens, primeira_pendente
+
+    def anexar(self, itens):
+        """
+        Grava os itens no segmento atual (ainda sem esperar o fsync).
+
+        Deve ser chamado sob o lock de quem mantém a ordem do buffer, para que as
+        sequências acompanhem a ordem dos itens.
+
+        Returns:
+            tuple: (primeira_seq, ultima_seq, ticket) — o ticket é passado para `aguardar`
+        """
+        with self.lock:
+            primeira = self.seq + 1
+            dados = bytearray()
+            for item in itens:
+                self.seq += 1
+                dados += json.dumps({"seq": self.seq, "item": item}).encode() + b'\n'
+            ticket = self.commit.escrever(bytes(dados))
+            self.registros += len(itens)
+            self.segmentos[-1][2] = self.seq
+            self._bytes_segmento += len(dados)
+            if self._bytes_segmento >= self.tamanho_segmento:
+                self._rotacionar()
+            return primeira, self.seq, ticket
+
+    def aguardar(self, ticket, inicio=None):
+        """Espera o fsync do ticket; se `inicio` for dado, registra a latência total."""
+        self.commit.aguardar(ticket)
+        if inicio is not None:
+            self.latencias.append(time.perf_counter() - inicio)
+
+    def _rotacionar(self):
+        numero = self.segmentos[-1][0] + 1
+        self.commit.trocar_arquivo(open(self._caminho(numero), 'ab')).close()
+        self.segmentos.append([numero, self.seq + 1, self.seq])
+        self._bytes_segmento = 0
+
+    def confirmar(self, primeira, ultima):
+        """Marca a faixa [primeira, ultima] como entregue e libera o que for possível."""
+        with self.lock:
+            self._confirmados_fora_de_ordem[primeira] = ultima
+            avancou = False
+            while self.confirmado_ate + 1 in self._confirmados_fora_de_ordem:
+                self.confirmado_ate = self._confirmados_fora_de_ordem.pop(self.confirmado_ate + 1)
+                avancou = True
+        if avancou:
+            self._gravar_confirmado()
+
+    def _gravar_confirmado(self):
+        """
+        Grava `confirmado_ate` de forma durável (arquivo e diretório com fsync) e
+        só então apaga os segmentos cobertos por ele. Roda fora de `self.lock`,
+        para o fsync não segurar as escritas de novos itens.
+        """
+        with self._lock_confirmado:
+            valor = self.confirmado_ate
+            if valor <= self._confirmado_gravado:
+                return
+            temporario = self.caminho_confirmado + '.tmp'
+            try:
+                with open(temporario, 'w') as f:
+                    f.write(str(valor))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temporario, self.caminho_confirmado)
+                self._sincronizar_diretorio()
+            except OSError as e:
+                # Os segmentos ficam: na pior das hipóteses a próxima partida reenvia itens já entregues
+                logger.error("💥 Falha ao gravar a confirmação do WAL: %s", e)
+                return
+            self._confirmado_gravado = valor
+            with self.lock:
+                self._apagar_confirmados()
+
+    def _sincronizar_diretorio(self):
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        descritor = os.open(self.diretorio, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descritor)
+        finally:
+            os.close(descritor)
+
+    def _apagar_confirmados(self):
+        while len(self.segmentos) > 1 and self.segmentos[0][2] <= self._confirmado_gravado:
+            numero = self.segmentos.pop(0)[0]
+            try:
+                os.remove(self._caminho(numero))
+            except FileNotFoundError:
+                pass
+
+    def metricas(self):
+        latencias = sorted(self.latencias)
+        def percentil(p):
+            return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000 if latencias else 0.0
+        return {
+            "segmentos": len(self.segmentos),
+            "nao_confirmados": self.seq - self.confirmado_ate,
+            "registros": self.registros,
+            "fsyncs": self.commit.fsyncs,
+            "registros_por_fsync": self.registros / self.commit.fsyncs if self.commit.fsyncs else 0.0,
+            "latencia_enfileiramento_p50_ms": percentil(0.50),
+            "latencia_enfileiramento_p99_ms": percentil(0.99),
+            "commit": self.commit.metricas(),
+        }
+
+    def fechar(self):
+        self.commit.fechar()
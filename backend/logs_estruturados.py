@@ -0,0 +1,187 @@
+import sys
+import json
+import queue
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from balde_fichas import BaldeFichas
+
+FORMATO_TEXTO = "%(asctime)s %(levelname)s %(message)s"
+
+# Atributos que todo LogRecord tem; o resto veio de `extra=` e vai para o JSON
+_ATRIBUTOS_PADRAO = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class FormatadorJson(logging.Formatter):
+    """Um objeto JSON por linha, com os campos passados em `extra=` no nível de cima."""
+
+    def format(self, record):
+        dados = {
+            "momento": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensagem": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO:
+                dados[chave] = valor
+        if record.exc_info:
+            dados["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class FormatadorTexto(logging.Formatter):
+    """Formato de texto de sempre, avisando quantas mensagens iguais foram suprimidas antes desta."""
+
+    def format(self, record):
+        texto = super().format(record)
+        suprimidas = getattr(record, "suprimidas", 0)
+        if suprimidas:
+            texto += f" (+{suprimidas} suprimidas)"
+        return texto
+
+
+class FiltroTaxa(logging.Filter):
+    """
+    Limita cada categoria de mensagem a `taxa` por segundo, com rajadas de até `rajada`.
+
+    A categoria é o `extra={"categoria": ...}` da chamada ou, sem ele, o logger
+    mais o texto-modelo da mensagem (com formatação preguiçosa, "📤 %s itens
+    enviados" é uma categoria só, seja qual for o número). As mensagens que
+    passam levam em `suprimidas` quantas da mesma categoria foram descartadas
+    desde a anterior. ERROR e CRITICAL nunca são limitados: num incidente são
+    justamente os erros repetidos que precisam aparecer.
+    """
+
+    def __init__(self, taxa=10.0, rajada=20, max_categorias=1000):
+        """
+        Args:
+            taxa (float): Mensagens por segundo por categoria (0 desliga o limite)
+            rajada (int): Mensagens seguidas aceitas antes de limitar
+            max_categorias (int): Categorias acompanhadas; além disso agrupa pelo nome do logger
+        """
+        super().__init__()
+        self.taxa = taxa
+        self.rajada = rajada
+        self.max_categorias = max_categorias
+        self.categorias = {}
+        self.suprimidas = 0
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if self.taxa <= 0 or record.levelno >= logging.ERROR:
+            return True
+        categoria = getattr(record, "categoria", None) or (record.name, record.levelno, record.msg)
+        with self.lock:
+            estado = self.categorias.get(categoria)
+            if estado is None:
+                if len(self.categorias) >= self.max_categorias:
+                    categoria = (record.name,)
+                    estado = self.categorias.get(categoria)
+                if estado is None:
+                    estado = self.categorias[categoria] = [BaldeFichas(self.taxa, self.rajada), 0]
+            if estado[0].tentar() > 0:
+                estado[1] += 1
+                self.suprimidas += 1
+                return False
+            if estado[1]:
+                record.suprimidas = estado[1]
+                estado[1] = 0
+        return True
+
+
+class ManipuladorFila(QueueHandler):
+    """
+    Entrega os registros a uma fila limitada sem formatar nada na thread de quem loga.
+
+    A fila é do mesmo processo, então o registro vai inteiro: a mensagem só é
+    montada (msg % args) e escrita na thread do QueueListener. Com a fila
+    cheia o registro é descartado e contado, em vez de bloquear a requisição.
+    """
+
+    def __init__(self, fila):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+class OuvinteFila(QueueListener):
+    def enqueue_sentinel(self):
+        # A fila pode estar cheia no desligamento; o ouvinte a esvazia enquanto esperamos
+        self.queue.put(self._sentinel, timeout=5)
+
+
+class SaidaLogs:
+    """
+    Configura o logger raiz: texto ou JSON, limite por categoria e, no modo
+    assíncrono, formatação e escrita no stdout numa thread de fundo.
+
+    No modo assíncrono o custo de um log na thread da requisição é o filtro de
+    taxa e um `put_nowait`, independente do volume de tráfego e da velocidade
+    do stdout.
+    """
+
+    def __init__(self, formato='texto', nivel='INFO', assincrono=True, taxa_categoria=10.0,
+                 rajada_categoria=20, tamanho_fila=10_000, localizar_chamada=True, saida=None):
+        """
+        Args:
+            formato (str): 'texto' (padrão) ou 'json' (um objeto por linha)
+            nivel (str): Nível mínimo do logger raiz
+            assincrono (bool): Formata e escreve numa thread de fundo
+            taxa_categoria (float): Mensagens por segundo por categoria (0 desliga o limite)
+            rajada_categoria (int): Rajada aceita por categoria antes de limitar
+            tamanho_fila (int): Registros aguardando escrita antes de começar a descartar
+            localizar_chamada (bool): Preenche arquivo/linha de cada registro (percorre a pilha).
+                False desliga isso em `logging` para o processo inteiro, não só neste logger
+            saida: Stream de destino (padrão: sys.stdout)
+        """
+        self.formato = formato
+        # Nenhum dos formatos usa arquivo/linha nem processo; sem eles cada registro sai bem mais barato.
+        # Zerar `_srcfile` muda o findCaller de todos os loggers do processo: só quando pedido
+        if not localizar_chamada:
+            logging._srcfile = None
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+        destino = logging.StreamHandler(saida or sys.stdout)
+        destino.setFormatter(FormatadorJson() if formato == 'json' else FormatadorTexto(FORMATO_TEXTO))
+        self.filtro = FiltroTaxa(taxa_categoria, rajada_categoria)
+        self.ouvinte = None
+        if assincrono:
+            self.manipulador = ManipuladorFila(queue.Queue(maxsize=tamanho_fila))
+            self.ouvinte = OuvinteFila(self.manipulador.queue, destino, respect_handler_level=True)
+            self.ouvinte.start()
+        else:
+            self.manipulador = destino
+        self.manipulador.addFilter(self.filtro)
+
+        raiz = logging.getLogger()
+        for antigo in list(raiz.handlers):
+            raiz.removeHandler(antigo)
+        raiz.addHandler(self.manipulador)
+        raiz.setLevel(nivel.upper())
+
+    def metricas(self):
+        return {
+            "formato": self.formato,
+            "assincrono": self.ouvinte is not None,
+            "fila": self.manipulador.queue.qsize() if self.ouvinte is not None else 0,
+            "descartados": getattr(self.manipulador, "descartados", 0),
+            "suprimidas": self.filtro.suprimidas
+        }
+
+    def parar(self):
+        """Escreve o que ainda está na fila e para a thread de fundo."""
+        if self.ouvinte is not None:
+            self.ouvinte.stop()
+            self.ouvinte = None
@@ -0,0 +1,176 @@
+import bisect
+import threading
+
+# Limites (em segundos) dos baldes do histograma de latência
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Limites para operações em memória/disco local (consulta de CPF, fsync)
+LIMITES_RAPIDOS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+# Limites para trabalhos longos (simulações)
+LIMITES_LONGOS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+TIPO_CONTADOR = 'counter'
+TIPO_MEDIDOR = 'gauge'
+TIPO_HISTOGRAMA = 'histogram'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histograma:
+    """Histograma de baldes fixos (acumulado só na leitura), com soma e contagem."""
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = limites
+        self.baldes = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.contagem = 0
+
+    def observar(self, valor):
+        self.baldes[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.contagem += 1
+
+    def copia(self):
+        copia = Histograma(self.limites)
+        copia.baldes = list(self.baldes)
+        copia.soma = self.soma
+        copia.contagem = self.contagem
+        return copia
+
+    def acumulados(self):
+        """Pares (limite, contagem acumulada), terminando em '+Inf'."""
+        acumulado = 0
+        for limite, quantidade in zip(self.limites + ('+Inf',), self.baldes):
+            acumulado += quantidade
+            yield limite, acumulado
+
+    def como_dict(self):
+        baldes = {str(limite): quantidade for limite, quantidade in self.acumulados()}
+        return {"baldes": baldes, "soma": round(self.soma, 6), "contagem": self.contagem}
+
+
+class Contador:
+    """Contador monotônico, com uma série por combinação de rótulos."""
+
+    def __init__(self):
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def incrementar(self, *rotulos, quantidade=1):
+        with self.lock:
+            self.series[rotulos] = self.series.get(rotulos, 0) + quantidade
+
+    def ler(self):
+        with self.lock:
+            return dict(self.series)
+
+
+class HistogramaRotulado:
+    """Um Histograma por combinação de rótulos, seguro entre threads."""
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = limites
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observar(self, valor, *rotulos):
+        with self.lock:
+            histograma = self.series.get(rotulos)
+            if histograma is None:
+                histograma = self.series[rotulos] = Histograma(self.limites)
+            histograma.observar(valor)
+
+    def ler(self):
+        with self.lock:
+            return {rotulos: h.copia() for rotulos, h in self.series.items()}
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(nomes, valores, extra=None):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra is not None:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    if isinstance(valor, bool):
+        return '1' if valor else '0'
+    if isinstance(valor, float):
+        return repr(valor) if valor == valor else 'NaN'
+    return str(valor)
+
+
+class RegistroMetricas:
+    """
+    Conjunto de métricas exportadas no formato texto do Prometheus (/metrics).
+
+    Cada métrica é uma função de leitura chamada só na hora da coleta, que
+    devolve um número, um Histograma ou um dict {tupla de rótulos: valor}.
+    Assim os componentes continuam só incrementando os próprios contadores e
+    nada é calculado no caminho do voto; o custo fica todo na coleta.
+    """
+
+    def __init__(self, prefixo=''):
+        """
+        Args:
+            prefixo (str): Prefixo aplicado ao nome de todas as métricas (ex.: 'votacao_')
+        """
+        self.prefixo = prefixo
+        self.metricas = []
+        self.lock = threading.Lock()
+
+    def registrar(self, nome, ajuda, tipo, ler, rotulos=()):
+        """
+        Args:
+            nome (str): Nome da métrica, sem o prefixo
+            ajuda (str): Texto de # HELP
+            tipo (str): TIPO_CONTADOR, TIPO_MEDIDOR ou TIPO_HISTOGRAMA
+            ler: Função sem argumentos chamada na coleta
+            rotulos (tuple): Nomes dos rótulos, na ordem das tuplas devolvidas por `ler`
+        """
+        with self.lock:
+            self.metricas.append((self.prefixo + nome, ajuda, tipo, ler, tuple(rotulos)))
+
+    def contador(self, nome, ajuda, rotulos=()):
+        """Cria, registra e devolve um Contador."""
+        contador = Contador()
+        self.registrar(nome, ajuda, TIPO_CONTADOR, contador.ler, rotulos)
+        return contador
+
+    def histograma(self, nome, ajuda, rotulos=(), limites=LIMITES_LATENCIA):
+        """Cria, registra e devolve um HistogramaRotulado."""
+        histograma = HistogramaRotulado(limites)
+        self.registrar(nome, ajuda, TIPO_HISTOGRAMA, histograma.ler, rotulos)
+        return histograma
+
+    def exportar(self):
+        """Texto de /metrics. Uma leitura que falha omite só aquela métrica."""
+        with self.lock:
+            metricas = list(self.metricas)
+        linhas = []
+        for nome, ajuda, tipo, ler, rotulos in metricas:
+            try:
+                valores = ler()
+            except Exception:
+                continue
+            if valores is None:
+                continue
+            if not isinstance(valores, dict):
+                valores = {(): valores}
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for chave, valor in valores.items():
+                if not isinstance(chave, tuple):
+                    chave = (chave,)
+                if tipo == TIPO_HISTOGRAMA:
+                    for limite, acumulado in valor.acumulados():
+                        le = f'le="{limite}"'
+                        linhas.append(f"{nome}_bucket{_rotulos(rotulos, chave, le)} {acumulado}")
+                    linhas.append(f"{nome}_sum{_rotulos(rotulos, chave)} {_numero(float(valor.soma))}")
+                    linhas.append(f"{nome}_count{_rotulos(rotulos, chave)} {valor.contagem}")
+                elif valor is not None:
+                    linhas.append(f"{nome}{_rotulos(rotulos, chave)} {_numero(valor)}")
+        return '\n'.join(linhas) + '\n'
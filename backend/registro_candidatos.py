@@ -0,0 +1,131 @@
+import os
+import json
+import logging
+import threading
+from collections import namedtuple
+
+from cache_resultados import criar_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Eleição usada quando a requisição não diz qual (é também o `type` dos votos)
+ELEICAO_PADRAO = 'eleicao'
+
+# Candidatos de uma eleição: id -> candidato, mais a lista já serializada com ETag
+Eleicao = namedtuple('Eleicao', ['nome', 'candidatos', 'snapshot'])
+
+
+class RegistroCandidatos:
+    """
+    Candidatos das eleições, carregados uma vez em memória.
+
+    O arquivo pode ser uma lista de candidatos (formato original, vira a
+    eleição padrão) ou um objeto `{nome_da_eleicao: [candidatos]}`. Cada
+    eleição guarda um dict id -> candidato para a validação do voto e a lista
+    já serializada (Snapshot com ETag) para `/candidatos`.
+
+    Uma thread confere o arquivo (mtime, tamanho e inode) a cada
+    `intervalo_verificacao` segundos. Se mudou, monta um catálogo novo e troca
+    a referência de uma vez: as leituras nunca veem um catálogo pela metade e
+    não usam lock. Um arquivo inválido é ignorado e o catálogo anterior fica.
+    """
+
+    def __init__(self, caminho, intervalo_verificacao=2.0):
+        """
+        Args:
+            caminho: Arquivo JSON dos candidatos
+            intervalo_verificacao (float): Segundos entre verificações do arquivo (0 desliga)
+        """
+        self.caminho = caminho
+        self.intervalo_verificacao = intervalo_verificacao
+        self.catalogo = {}
+        self._assinatura = False  # nada lido ainda (None significa arquivo ausente)
+        self._assinatura_invalida = None
+        self.recargas = 0
+        self.falhas = 0
+        self._parar = threading.Event()
+        self.recarregar_se_mudou()
+        if intervalo_verificacao > 0:
+            threading.Thread(target=self._monitorar, name="registro-candidatos", daemon=True).start()
+
+    def _ler_assinatura(self):
+        try:
+            estado = os.stat(self.caminho)
+        except FileNotFoundError:
+            return None
+        return (estado.st_mtime_ns, estado.st_size, estado.st_ino)
+
+    def recarregar_se_mudou(self):
+        """
+        Relê o arquivo se ele mudou desde a última leitura.
+
+        Returns:
+            bool: True se um catálogo novo entrou em uso
+        """
+        assinatura = self._ler_assinatura()
+        if assinatura == self._assinatura or assinatura == self._assinatura_invalida:
+            return False
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                conteudo = json.load(f)
+            catalogo = self._montar_catalogo(conteudo)
+        except FileNotFoundError:
+            logger.error("Arquivo de candidatos não encontrado: %s", self.caminho)
+            catalogo = {}
+        except (ValueError, KeyError, TypeError) as e:
+            # Provavelmente um arquivo no meio da edição: tenta de novo quando ele mudar
+            self._assinatura_invalida = assinatura
+            self.falhas += 1
+            logger.error("Erro ao carregar candidatos: %s. Mantendo a lista anterior.", e)
+            return False
+        self.catalogo = catalogo
+        self._assinatura = assinatura
+        self.recargas += 1
+        total = sum(len(e.candidatos) for e in catalogo.values())
+        logger.info("🗳️ Candidatos carregados: %s em %s eleição(ões).", total, len(catalogo))
+        return True
+
+    @staticmethod
+    def _montar_catalogo(conteudo):
+        if isinstance(conteudo, list):
+            conteudo = {ELEICAO_PADRAO: conteudo}
+        if not isinstance(conteudo, dict):
+            raise ValueError("o arquivo deve ser uma lista de candidatos ou um objeto com uma lista por eleição")
+        catalogo = {}
+        for nome, lista in conteudo.items():
+            if not isinstance(lista, list):
+                raise ValueError(f"a eleição '{nome}' deve ter uma lista de candidatos")
+            candidatos = {candidato["id"]: candidato for candidato in lista}
+            catalogo[nome] = Eleicao(nome, candidatos, criar_snapshot(lista))
+        return catalogo
+
+    def _monitorar(self):
+        while not self._parar.wait(self.intervalo_verificacao):
+            try:
+                self.recarregar_se_mudou()
+            except Exception as e:
+                logger.error("Erro ao verificar arquivo de candidatos: %s", e)
+
+    def eleicao(self, nome=ELEICAO_PADRAO):
+        """Devolve a Eleicao com esse nome, ou None se ela não existir."""
+        # Nomes vêm do corpo da requisição: uma lista ou um objeto não é uma eleição (nem hashável)
+        return self.catalogo.get(nome) if isinstance(nome, str) else None
+
+    def existe(self, candidato_id, eleicao=ELEICAO_PADRAO):
+        registro = self.eleicao(eleicao)
+        return registro is not None and isinstance(candidato_id, str) and candidato_id in registro.candidatos
+
+    def ids(self, eleicao=ELEICAO_PADRAO):
+        registro = self.catalogo.get(eleicao)
+        return list(registro.candidatos) if registro is not None else []
+
+    def parar(self):
+        self._parar.set()
+
+    def metricas(self):
+        catalogo = self.catalogo
+        return {
+            "eleicoes": {nome: len(e.candidatos) for nome, e in catalogo.items()},
+            "recargas": self.recargas,
+            "falhas": self.falhas
+        }
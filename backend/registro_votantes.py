@@ -0,0 +1,280 @@
+import os
+import json
+import threading
+import logging
+from commit_grupo import CommitEmGrupo
+from filtro_bloom import FiltroBloom
+
+logger = logging.getLogger(__name__)
+
+
+class Fragmento:
+    """Parte do armazenamento exato: um conjunto de CPFs com o próprio lock."""
+    __slots__ = ('cpfs', 'lock')
+
+    def __init__(self):
+        self.cpfs = set()
+        self.lock = threading.Lock()
+
+
+class RegistroVotantes:
+    """
+    Registro dos CPFs que já votaram.
+
+    Na frente fica um filtro de Bloom (`cpfs_votantes.bloom`): um CPF que nunca
+    votou é respondido sem tocar em lock nenhum. Atrás dele fica o armazenamento
+    exato, dividido em fragmentos pelo prefixo do CPF para espalhar a disputa de
+    locks entre as threads do waitress. Cada novo CPF é anexado a um log
+    (`cpfs_votantes.log`) com fsync em grupo. De tempos em tempos o log é
+    compactado no snapshot `cpfs_votantes.json`, que mantém o mesmo formato
+    (lista JSON) usado antes do registro existir.
+    """
+
+    def __init__(self, diretorio, limite_compactacao=100_000, num_fragmentos=32,
+                 capacidade_filtro=10_000_000, taxa_fp_filtro=0.001):
+        """
+        Args:
+            diretorio: Pasta onde ficam o snapshot, o log e o filtro
+            limite_compactacao (int): Número de linhas no log que dispara a compactação
+            num_fragmentos (int): Quantidade de fragmentos do armazenamento exato
+            capacidade_filtro (int): Número de CPFs para o qual o filtro é dimensionado
+            taxa_fp_filtro (float): Taxa de falsos positivos do filtro na capacidade máxima
+        """
+        self.caminho_snapshot = os.path.join(diretorio, 'cpfs_votantes.json')
+        self.caminho_log = os.path.join(diretorio, 'cpfs_votantes.log')
+        self.caminho_log_antigo = self.caminho_log + '.antigo'
+        self.limite_compactacao = limite_compactacao
+        self.lock = threading.Lock()
+        self.fragmentos = [Fragmento() for _ in range(num_fragmentos)]
+        self._seq_rotacao = 0
+        self._compactando = False
+        self.consultas = 0
+        self.negativos_filtro = 0
+        self.falsos_positivos = 0
+
+        os.makedirs(diretorio, exist_ok=True)
+        self.filtro = FiltroBloom(os.path.join(diretorio, 'cpfs_votantes.bloom'),
+                                  capacidade_filtro, taxa_fp_filtro)
+        linhas_log = self._recuperar()
+        self.commit = CommitEmGrupo(open(self.caminho_log, 'ab'))
+        self._seq_rotacao = -linhas_log
+
+        if os.path.exists(self.caminho_log_antigo) or linhas_log >= self.limite_compactacao:
+            self.compactar()
+
+    def _fragmento(self, cpf):
+        prefixo = cpf[:4]
+        indice = int(prefixo) if prefixo.isdigit() else hash(prefixo)
+        return self.fragmentos[indice % len(self.fragmentos)]
+
+    def _adicionar_recuperado(self, cpf):
+        self._fragmento(cpf).cpfs.add(cpf)
+        if not self.filtro.reaproveitado:
+            self.filtro.adicionar(cpf)
+
+    def _recuperar(self):
+        if os.path.exists(self.caminho_snapshot):
+            try:
+                with open(self.caminho_snapshot, 'r') as f:
+                    for cpf in json.load(f):
+                        self._adicionar_recuperado(cpf)
+            except json.JSONDecodeError:
+                logger.error("Snapshot de CPFs corrompido em %s. Ignorando.", self.caminho_snapshot)
+
+        if os.path.exists(self.caminho_log_antigo):
+            self._ler_log(self.caminho_log_antigo)
+        linhas = self._ler_log(self.caminho_log)
+        origem = "reaproveitado" if self.filtro.reaproveitado else "reconstruído"
+        logger.info("🗂️ Registro de votantes carregado com %s CPFs (filtro %s).", len(self), origem)
+        return linhas
+
+    def _ler_log(self, caminho):
+        """Reaplica um log de CPFs, descartando uma última linha incompleta (crash no meio da escrita)."""
+        if not os.path.exists(caminho):
+            return 0
+        linhas = 0
+        valido = 0
+        with open(caminho, 'rb') as f:
+            for linha in f:
+                if not linha.endswith(b'\n'):
+                    break
+                valido += len(linha)
+                cpf = linha.strip()
+                if cpf:
+                    self._adicionar_recuperado(cpf.decode())
+                    linhas += 1
+        if valido != os.path.getsize(caminho):
+            logger.warning("⚠️ Linha incompleta descartada no fim de %s.", caminho)
+            with open(caminho, 'r+b') as f:
+                f.truncate(valido)
+        return linhas
+
+    def contem(self, cpf):
+        self.consultas += 1
+        if not self.filtro.pode_conter(cpf):
+            self.negativos_filtro += 1
+            return False
+        if cpf in self._fragmento(cpf).cpfs:
+            return True
+        self.falsos_positivos += 1
+        return False
+
+    def registrar(self, cpf):
+        """
+        Marca o CPF como votante de forma atômica e durável.
+
+        Returns:
+            bool: False se o CPF já tinha votado, True depois que o registro chegou ao disco
+
+        Raises:
+            OSError: Se o fsync falhou; o CPF volta a poder votar
+        """
+        fragmento = self._fragmento(cpf)
+        with fragmento.lock:
+            if cpf in fragmento.cpfs:
+                return False
+            fragmento.cpfs.add(cpf)
+            self.filtro.adicionar(cpf)
+            seq = self.commit.escrever(f"{cpf}\n".encode())
+        try:
+            self._aguardar_e_compactar(seq)
+        except OSError:
+            self._desfazer([cpf])
+            raise
+        return True
+
+    def registrar_varios(self, cpfs):
+        """
+        Marca vários CPFs de uma vez: cada fragmento é travado uma vez só e
+        todos os CPFs novos vão ao log numa única escrita, com um único fsync.
+
+        Args:
+            cpfs (list): CPFs já normalizados
+
+        Returns:
+            list[bool]: Para cada CPF, na mesma ordem, False se ele já tinha votado
+            (inclusive se repetido na própria lista)
+
+        Raises:
+            OSError: Se o fsync falhou; nenhum dos CPFs novos fica registrado
+        """
+        resultado = [False] * len(cpfs)
+        por_fragmento = {}
+        for posicao, cpf in enumerate(cpfs):
+            fragmento = self._fragmento(cpf)
+            por_fragmento.setdefault(id(fragmento), (fragmento, []))[1].append(posicao)
+        novos = []
+        # Os CPFs entram nos fragmentos antes do log, como em `registrar`: a compactação nunca
+        # perde um CPF que já está no log renomeado
+        for fragmento, posicoes in por_fragmento.values():
+            with fragmento.lock:
+                for posicao in posicoes:
+                    cpf = cpfs[posicao]
+                    if cpf in fragmento.cpfs:
+                        continue
+                    fragmento.cpfs.add(cpf)
+                    self.filtro.adicionar(cpf)
+                    novos.append(cpf)
+                    resultado[posicao] = True
+        if novos:
+            seq = self.commit.escrever(''.join(f"{cpf}\n" for cpf in novos).encode(), len(novos))
+            try:
+                self._aguardar_e_compactar(seq)
+            except OSError:
+                self._desfazer(novos)
+                raise
+        return resultado
+
+    def _desfazer(self, cpfs):
+        """
+        Tira do armazenamento exato CPFs cujo registro não chegou ao disco, para o
+        eleitor poder tentar de novo. O filtro de Bloom fica com os bits: só um
+        falso positivo a mais, que o armazenamento exato desmente.
+        """
+        logger.error("💥 Registro de %s CPF(s) não chegou ao disco; desfeito.", len(cpfs))
+        for cpf in cpfs:
+            fragmento = self._fragmento(cpf)
+            with fragmento.lock:
+                fragmento.cpfs.discard(cpf)
+
+    def _aguardar_e_compactar(self, seq):
+        compactar = seq - self._seq_rotacao >= self.limite_compactacao and not self._compactando
+        self.commit.aguardar(seq)
+        if compactar:
+            threading.Thread(target=self.compactar, daemon=True).start()
+
+    def compactar(self):
+        """
+        Grava todos os CPFs no snapshot e descarta o log já coberto por ele.
+
+        O log atual é renomeado para `.antigo` e um novo log é aberto; só depois
+        os fragmentos são copiados, então todo CPF do log antigo está na cópia.
+        A escrita do snapshot acontece sem lock, sem bloquear novos votos. Se o
+        processo cair no meio, a recuperação lê snapshot + `.antigo` + log.
+        """
+        with self.lock:
+            if self._compactando:
+                return
+            self._compactando = True
+        if not os.path.exists(self.caminho_log_antigo):
+            with self.commit.lock:
+                os.replace(self.caminho_log, self.caminho_log_antigo)
+                self._seq_rotacao = self.commit.seq_escrito
+            self.commit.trocar_arquivo(open(self.caminho_log, 'ab')).close()
+        copia = []
+        for fragmento in self.fragmentos:
+            with fragmento.lock:
+                copia.extend(fragmento.cpfs)
+
+        try:
+            temporario = self.caminho_snapshot + '.tmp'
+            with open(temporario, 'w') as f:
+                json.dump(copia, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.caminho_snapshot)
+            self._sincronizar_diretorio()
+            os.remove(self.caminho_log_antigo)
+            logger.info("🗜️ Registro de votantes compactado (%s CPFs).", len(copia))
+        except Exception as e:
+            logger.error("💥 Falha ao compactar registro de votantes: %s", e)
+        finally:
+            with self.lock:
+                self._compactando = False
+
+    def _sincronizar_diretorio(self):
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(os.path.dirname(self.caminho_snapshot), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def metricas(self):
+        tamanhos = [len(f.cpfs) for f in self.fragmentos]
+        positivos = self.consultas - self.negativos_filtro
+        return {
+            "cpfs": sum(tamanhos),
+            "fragmentos": len(tamanhos),
+            "maior_fragmento": max(tamanhos),
+            "menor_fragmento": min(tamanhos),
+            "consultas": self.consultas,
+            "commit": self.commit.metricas(),
+            "filtro": {
+                "bits": self.filtro.bits,
+                "hashes": self.filtro.hashes,
+                "capacidade": self.filtro.capacidade,
+                "memoria_bytes": self.filtro.memoria_bytes(),
+                "taxa_falsos_positivos_estimada": self.filtro.taxa_falsos_positivos(),
+                "taxa_falsos_positivos_observada": self.falsos_positivos / positivos if positivos else 0.0,
+                "negativos": self.negativos_filtro,
+            },
+        }
+
+    def __len__(self):
+        return sum(len(f.cpfs) for f in self.fragmentos)
+
+    def fechar(self):
+        self.commit.fechar()
+        self.filtro.fechar()
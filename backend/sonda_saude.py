@@ -0,0 +1,130 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Verificacao:
+    """Uma dependência verificada pela sonda e o último resultado dela."""
+    __slots__ = ('nome', 'verificar', 'intervalo', 'critica', 'ok', 'detalhe',
+                 'verificado_em', 'duracao', 'falhando_desde', 'proxima')
+
+    def __init__(self, nome, verificar, intervalo, critica):
+        self.nome = nome
+        self.verificar = verificar
+        self.intervalo = intervalo
+        self.critica = critica
+        self.ok = None
+        self.detalhe = None
+        self.verificado_em = None
+        self.duracao = 0.0
+        self.falhando_desde = None
+        self.proxima = 0.0
+
+
+class SondaSaude:
+    """
+    Verifica as dependências em segundo plano e guarda o último resultado.
+
+    Cada verificação é uma função sem argumentos que devolve `(ok, detalhe)`
+    (uma exceção conta como falha) e roda no próprio intervalo, na thread da
+    sonda. Os endpoints de saúde só leem os resultados guardados, então uma
+    sondagem do balanceador nunca gera chamada ao agregador nem espera por ela.
+
+    A instância está pronta quando todas as verificações críticas já rodaram
+    ao menos uma vez e a última deu certo.
+    """
+
+    def __init__(self, intervalo_padrao=10.0):
+        """
+        Args:
+            intervalo_padrao (float): Segundos entre execuções de uma verificação sem intervalo próprio
+        """
+        self.intervalo_padrao = intervalo_padrao
+        self.verificacoes = {}
+        self.iniciado_em = time.monotonic()
+        self.condicao = threading.Condition()
+        self._parar = False
+        self._thread = None
+
+    def registrar(self, nome, verificar, intervalo=None, critica=False):
+        """
+        Args:
+            nome (str): Nome exibido nos endpoints de saúde
+            verificar: Função sem argumentos que devolve (ok, detalhe)
+            intervalo (float): Segundos entre execuções (padrão: intervalo_padrao)
+            critica (bool): Se uma falha tira a instância de "pronta"
+        """
+        with self.condicao:
+            self.verificacoes[nome] = Verificacao(nome, verificar, intervalo or self.intervalo_padrao, critica)
+            self.condicao.notify()
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._rodar, name="sonda-saude", daemon=True)
+        self._thread.start()
+
+    def _rodar(self):
+        while True:
+            with self.condicao:
+                while not self._parar:
+                    agora = time.monotonic()
+                    vencidas = [v for v in self.verificacoes.values() if v.proxima <= agora]
+                    if vencidas:
+                        break
+                    proxima = min((v.proxima for v in self.verificacoes.values()), default=agora + self.intervalo_padrao)
+                    self.condicao.wait(proxima - agora)
+                if self._parar:
+                    return
+            for verificacao in vencidas:
+                self._executar(verificacao)
+
+    def _executar(self, verificacao):
+        inicio = time.monotonic()
+        try:
+            ok, detalhe = verificacao.verificar()
+        except Exception as e:
+            ok, detalhe = False, str(e)
+        fim = time.monotonic()
+        with self.condicao:
+            if not ok and verificacao.ok is not False:
+                logger.warning("⚠️ Verificação de saúde '%s' falhou: %s", verificacao.nome, detalhe)
+            elif ok and verificacao.ok is False:
+                logger.info("✅ Verificação de saúde '%s' voltou ao normal.", verificacao.nome)
+            if not ok and verificacao.falhando_desde is None:
+                verificacao.falhando_desde = fim
+            elif ok:
+                verificacao.falhando_desde = None
+            verificacao.ok = bool(ok)
+            verificacao.detalhe = detalhe
+            verificacao.verificado_em = fim
+            verificacao.duracao = fim - inicio
+            verificacao.proxima = fim + verificacao.intervalo
+
+    def estado(self):
+        """Último resultado de cada verificação, com a idade (s) de cada uma."""
+        agora = time.monotonic()
+        with self.condicao:
+            return {
+                v.nome: {
+                    "ok": v.ok,
+                    "detalhe": v.detalhe,
+                    "critica": v.critica,
+                    "idade_s": round(agora - v.verificado_em, 1) if v.verificado_em is not None else None,
+                    "duracao_ms": round(v.duracao * 1000, 1),
+                    "falhando_ha_s": round(agora - v.falhando_desde, 1) if v.falhando_desde is not None else None
+                }
+                for v in self.verificacoes.values()
+            }
+
+    def pronto(self):
+        with self.condicao:
+            return all(v.ok for v in self.verificacoes.values() if v.critica)
+
+    def tempo_no_ar(self):
+        return time.monotonic() - self.iniciado_em
+
+    def parar(self):
+        with self.condicao:
+            self._parar = True
+            self.condicao.notify()
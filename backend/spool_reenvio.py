@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import uuid
+import heapq
+import random
+import logging
+import threading
+
+from balde_fichas import BaldeFichas
+
+logger = logging.getLogger(__name__)
+
+EXTENSAO = '.lote'
+# Arquivos com nome fora do padrão são renomeados com este sufixo e deixados de lado
+QUARENTENA = '.invalido'
+
+
+class _Registro:
+    __slots__ = ('batch_id', 'tentativas', 'proxima', 'criado_em', 'tamanho', 'em_voo')
+
+    def __init__(self, batch_id, tentativas, proxima, criado_em, tamanho):
+        self.batch_id = batch_id
+        self.tentativas = tentativas
+        self.proxima = proxima
+        self.criado_em = criado_em
+        self.tamanho = tamanho
+        self.em_voo = False
+
+
+class SpoolReenvio:
+    """
+    Spool de lotes que falharam no envio, com reenvio incremental.
+
+    Cada lote vira um arquivo próprio (`<batchId>.<tentativas>.lote`), gravado
+    com fsync antes de `guardar` retornar; o número de tentativas fica no nome e
+    é atualizado com um rename atômico. Em memória fica só um índice com os
+    metadados (tentativas, próxima tentativa, idade, tamanho): o corpo do lote é
+    lido do disco na hora de reenviar e o arquivo só é apagado depois da
+    confirmação do broker, então uma queda no meio do reenvio não perde nada.
+
+    O reenvio usa backoff exponencial com jitter completo por lote, respeita um
+    limite de taxa (BaldeFichas) e um máximo de lotes em voo, para não inundar
+    um broker que acabou de voltar.
+    """
+
+    def __init__(self, diretorio, fila, backoff_base=1.0, backoff_max=300.0,
+                 taxa_max=50.0, max_em_voo=32, caminho_legado=None):
+        """
+        Args:
+            diretorio: Pasta dos arquivos do spool
+            fila: FilaRabbit usada para reenviar
+            backoff_base (float): Espera (s) base após a primeira falha
+            backoff_max (float): Teto (s) da espera entre tentativas de um lote
+            taxa_max (float): Lotes reenviados por segundo, no máximo
+            max_em_voo (int): Lotes reenviados aguardando confirmação ao mesmo tempo
+            caminho_legado: Arquivo `lotes_pendentes.json` antigo, migrado para o spool
+        """
+        self.diretorio = diretorio
+        self.fila = fila
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_em_voo = max_em_voo
+        self.balde = BaldeFichas(taxa_max)
+        self.condicao = threading.Condition()
+        self.indice = {}
+        self.agenda = []  # heap de (proxima, batch_id)
+        self.em_voo = 0
+        self.bytes = 0  # soma dos tamanhos no índice, mantida a cada entrada e saída
+        self.reenviados = 0
+        self.falhas = 0
+        self._parar = threading.Event()
+
+        os.makedirs(diretorio, exist_ok=True)
+        self._recuperar()
+        if caminho_legado:
+            self._migrar(caminho_legado)
+        self._thread = threading.Thread(target=self._rodar, name="spool-reenvio", daemon=True)
+        self._thread.start()
+
+    def _caminho(self, batch_id, tentativas):
+        return os.path.join(self.diretorio, f'{batch_id}.{tentativas}{EXTENSAO}')
+
+    def _recuperar(self):
+        agora = time.time()
+        for nome in os.listdir(self.diretorio):
+            caminho = os.path.join(self.diretorio, nome)
+            if nome.endswith('.tmp'):
+                os.remove(caminho)
+                continue
+            if not nome.endswith(EXTENSAO):
+                continue
+            batch_id, _, tentativas = nome[:-len(EXTENSAO)].rpartition('.')
+            if not batch_id or not tentativas.isdigit():
+                self._quarentena(caminho)
+                continue
+            info = os.stat(caminho)
+            self._indexar(_Registro(batch_id, int(tentativas), agora, info.st_mtime, info.st_size))
+        if self.indice:
+            logger.info("♻️ %s lote(s) pendentes encontrados no spool.", len(self.indice))
+
+    def _quarentena(self, caminho):
+        """Tira do caminho um arquivo que não segue `<batchId>.<tentativas>.lote`, sem apagá-lo."""
+        try:
+            os.replace(caminho, caminho + QUARENTENA)
+            logger.warning("⚠️ Arquivo fora do padrão no spool movido para %s.",
+                           os.path.basename(caminho + QUARENTENA))
+        except OSError as e:
+            logger.warning("⚠️ Arquivo fora do padrão no spool ignorado (%s): %s", os.path.basename(caminho), e)
+
+    def _migrar(self, caminho_legado):
+        """Move os lotes do antigo `lotes_pendentes.json` (um JSON por linha) para o spool."""
+        if not os.path.exists(caminho_legado):
+            return
+        migrados = 0
+        try:
+            with open(caminho_legado, 'r') as f:
+                for linha in f:
+                    linha = linha.strip()
+                    if not linha:
+                        continue
+                    try:
+                        pacote = json.loads(linha)
+                    except json.JSONDecodeError:
+                        logger.warning("⚠️ Linha inválida ignorada na migração de pendências.")
+                        continue
+                    if self.guardar(pacote):
+                        migrados += 1
+            os.remove(caminho_legado)
+        except OSError as e:
+            logger.error("💥 Falha ao migrar %s: %s", caminho_legado, e)
+            return
+        if migrados:
+            logger.info("📦 %s lote(s) migrados de %s para o spool.",
+                        migrados, os.path.basename(caminho_legado))
+
+    def _indexar(self, registro):
+        with self.condicao:
+            self.indice[registro.batch_id] = registro
+            self.bytes += registro.tamanho
+            heapq.heappush(self.agenda, (registro.proxima, registro.batch_id))
+            self.condicao.notify()
+
+    # === API ===
+
+    def guardar(self, pacote):
+        """
+        Grava o lote no spool de forma durável.
+
+        Returns:
+            bool: True se o lote está no disco
+        """
+        batch_id = str(pacote.get('batchId') or f"BATCH_{uuid.uuid4().hex[:12]}").replace('.', '_')
+        if batch_id in self.indice:
+            return True
+        caminho = self._caminho(batch_id, 0)
+        temporario = caminho + '.tmp'
+        try:
+            dados = json.dumps(pacote).encode()
+            with open(temporario, 'wb') as f:
+                f.write(dados)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, caminho)
+            self._sincronizar_diretorio()
+        except OSError as e:
+            logger.error("CRÍTICO: Não foi possível persistir o lote no disco: %s", e)
+            return False
+        self._indexar(_Registro(batch_id, 0, time.time(), time.time(), len(dados)))
+        logger.info("💾 Lote %s salvo para reenvio futuro.", batch_id)
+        return True
+
+    def _sincronizar_diretorio(self):
+        descritor = os.open(self.diretorio, os.O_RDONLY)
+        try:
+            os.fsync(descritor)
+        finally:
+            os.close(descritor)
+
+    def metricas(self):
+        agora = time.time()
+        with self.condicao:
+            registros = list(self.indice.values())
+            proxima = self.agenda[0][0] - agora if self.agenda else None
+            em_voo = self.em_voo
+            tamanho = self.bytes
+        return {
+            "profundidade": len(registros),
+            "bytes": tamanho,
+            "idade_mais_antigo_s": round(agora - min(r.criado_em for r in registros), 1) if registros else 0.0,
+            "max_tentativas": max((r.tentativas for r in registros), default=0),
+            "em_voo": em_voo,
+            "reenviados": self.reenviados,
+            "falhas": self.falhas,
+            "proxima_tentativa_em_s": round(max(0.0, proxima), 1) if proxima is not None else None
+        }
+
+    def parar(self):
+        self._parar.set()
+        with self.condicao:
+            self.condicao.notify_all()
+        self._thread.join(timeout=5)
+
+    # === Thread de reenvio ===
+
+    def _proximo(self):
+        """Espera até haver um lote vencido e vaga em voo; devolve o registro ou None ao parar."""
+        with self.condicao:
+            while not self._parar.is_set():
+                if self.em_voo >= self.max_em_voo or not self.agenda:
+                    self.condicao.wait(1.0)
+                    continue
+                proxima, batch_id = self.agenda[0]
+                registro = self.indice.get(batch_id)
+                if registro is None or registro.proxima != proxima or registro.em_voo:
+                    heapq.heappop(self.agenda)  # entrada antiga de um lote já reagendado ou removido
+                    continue
+                espera = proxima - time.time()
+                if espera > 0:
+                    self.condicao.wait(min(espera, 1.0))
+                    continue
+                heapq.heappop(self.agenda)
+                registro.em_voo = True
+                self.em_voo += 1
+                return registro
+        return None
+
+    def _rodar(self):
+        logger.info("🔄 Spool de reenvio ativo em %s.", self.diretorio)
+        while not self._parar.is_set():
+            if not self.fila.conectado:
+                # Sem conexão nenhuma tentativa pode dar certo: não gasta o backoff dos lotes
+                self._parar.wait(1.0)
+                continue
+            registro = self._proximo()
+            if registro is None:
+                return
+            if not self.balde.retirar(parar=self._parar):
+                self._reagendar(registro, falhou=False)
+                return
+            try:
+                with open(self._caminho(registro.batch_id, registro.tentativas), 'rb') as f:
+                    pacote = json.loads(f.read())
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error("💥 Lote %s ilegível no spool, descartando: %s", registro.batch_id, e)
+                self._remover(registro)
+                continue
+            self.fila.publicar(pacote).add_done_callback(
+                lambda futuro, registro=registro: self._ao_confirmar(registro, futuro.result())
+            )
+
+    def _ao_confirmar(self, registro, ok):
+        if ok:
+            self.reenviados += 1
+            logger.info("📤 Lote %s reenviado com sucesso.", registro.batch_id)
+            self._remover(registro)
+        else:
+            self.falhas += 1
+            logger.warning("❌ Falha ao reenviar lote %s (tentativa %s).",
+                           registro.batch_id, registro.tentativas + 1)
+            self._reagendar(registro, falhou=True)
+
+    def _remover(self, registro):
+        try:
+            os.remove(self._caminho(registro.batch_id, registro.tentativas))
+        except FileNotFoundError:
+            pass
+        with self.condicao:
+            if self.indice.pop(registro.batch_id, None) is not None:
+                self.bytes -= registro.tamanho
+            if registro.em_voo:
+                registro.em_voo = False
+                self.em_voo -= 1
+            self.condicao.notify()
+
+    def _reagendar(self, registro, falhou):
+        if falhou:
+            antigo = self._caminho(registro.batch_id, registro.tentativas)
+            try:
+                os.replace(antigo, self._caminho(registro.batch_id, registro.tentativas + 1))
+                registro.tentativas += 1
+            except OSError as e:
+                logger.warning("⚠️ Não foi possível atualizar as tentativas de %s: %s",
+                               registro.batch_id, e)
+            # Backoff exponencial com jitter completo: espalha os reenvios no tempo
+            teto = min(self.backoff_max, self.backoff_base * (2 ** registro.tentativas))
+            registro.proxima = time.time() + random.uniform(0, teto)
+        with self.condicao:
+            registro.em_voo = False
+            self.em_voo -= 1
+            heapq.heappush(self.agenda, (registro.proxima, registro.batch_id))
+            self.condicao.notify()
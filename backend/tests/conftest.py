@@ -0,0 +1,31 @@
+import os
+import sys
+import errno
+
+import pytest
+
+# Os módulos do backend são importados direto (como no app.py), sem pacote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FsyncFalho:
+    """Substituto de os.fsync que falha com EIO enquanto `ativo` for True."""
+
+    def __init__(self, original):
+        self.original = original
+        self.ativo = False
+        self.falhas = 0
+
+    def __call__(self, fd):
+        if self.ativo:
+            self.falhas += 1
+            raise OSError(errno.EIO, "erro de E/S simulado")
+        return self.original(fd)
+
+
+@pytest.fixture
+def fsync_falho(monkeypatch):
+    """Troca os.fsync em todo o processo; o teste liga e desliga a falha com `.ativo`."""
+    substituto = FsyncFalho(os.fsync)
+    monkeypatch.setattr(os, 'fsync', substituto)
+    return substituto
@@ -0,0 +1,53 @@
+import pytest
+
+from commit_grupo import CommitEmGrupo
+
+
+@pytest.fixture
+def commit(tmp_path):
+    commit = CommitEmGrupo(open(tmp_path / 'log', 'ab'))
+    yield commit
+    commit.fechar()
+
+
+def test_aguardar_retorna_depois_do_fsync(commit, tmp_path):
+    seq = commit.escrever(b"a\n")
+    commit.aguardar(seq)
+
+    assert commit.seq_sincronizado >= seq
+    assert commit.fsyncs >= 1
+    assert (tmp_path / 'log').read_bytes() == b"a\n"
+
+
+def test_escrita_com_varios_registros_avanca_a_sequencia(commit):
+    assert commit.escrever(b"a\nb\nc\n", registros=3) == 3
+    assert commit.escrever(b"d\n") == 4
+
+
+def test_falha_de_fsync_chega_so_a_faixa_que_ele_cobria(commit, fsync_falho):
+    fsync_falho.ativo = True
+    seq = commit.escrever(b"a\n")
+    with pytest.raises(OSError):
+        commit.aguardar(seq)
+    assert commit.metricas()["falhas"] >= 1
+    assert commit.metricas()["erro"] is not None
+
+    fsync_falho.ativo = False
+    seguinte = commit.escrever(b"b\n")
+    commit.aguardar(seguinte)
+
+    assert commit.metricas()["erro"] is None
+    # A escrita que falhou continua falhando para quem ainda a espera
+    with pytest.raises(OSError):
+        commit.aguardar(seq)
+
+
+def test_trocar_arquivo_sincroniza_o_anterior(commit, tmp_path):
+    commit.escrever(b"a\n")
+    antigo = commit.trocar_arquivo(open(tmp_path / 'novo', 'ab'))
+    antigo.close()
+    seq = commit.escrever(b"b\n")
+    commit.aguardar(seq)
+
+    assert (tmp_path / 'log').read_bytes() == b"a\n"
+    assert (tmp_path / 'novo').read_bytes() == b"b\n"
@@ -0,0 +1,105 @@
+import time
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from enviador_lote import EnviadorLote
+from log_antecipado import LogAntecipado
+
+
+class FilaFalsa:
+    """Resolve cada publicação numa thread própria, como o ioloop do publicador."""
+
+    def __init__(self, ack):
+        self.ack = ack
+        self.publicados = []
+
+    def publicar(self, pacote):
+        self.publicados.append(pacote)
+        futuro = Future()
+        threading.Thread(target=futuro.set_result, args=(self.ack,), name="publicador").start()
+        return futuro
+
+    def mandar(self, pacote, timeout=30):
+        self.publicados.append(pacote)
+        return self.ack
+
+
+class SpoolFalso:
+    def __init__(self, ok=True):
+        self.ok = ok
+        self.guardados = []
+        self.threads = []
+
+    def guardar(self, pacote):
+        self.threads.append(threading.current_thread().name)
+        self.guardados.append(pacote)
+        return self.ok
+
+
+def _esperar(condicao, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while not condicao():
+        if time.monotonic() > limite:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def diretorio(tmp_path):
+    return tmp_path / 'wal'
+
+
+def test_lote_rejeitado_vai_para_o_spool_fora_da_thread_do_publicador(diretorio):
+    spool = SpoolFalso()
+    wal = LogAntecipado(str(diretorio))
+    lote = EnviadorLote(FilaFalsa(ack=False), 10, 0.01, spool, wal=wal)
+    lote.adicionar_varios(["a", "b", "c"])
+
+    assert _esperar(lambda: wal.confirmado_ate == 3)
+    lote.desligar()
+    assert [p["dataPoints"] for p in spool.guardados] == [["a", "b", "c"]]
+    assert spool.threads == ["enviador-resultados"]
+
+
+def test_sem_spool_os_itens_ficam_no_wal(diretorio):
+    spool = SpoolFalso(ok=False)
+    wal = LogAntecipado(str(diretorio))
+    lote = EnviadorLote(FilaFalsa(ack=False), 10, 0.01, spool, wal=wal)
+    lote.adicionar_varios(["a", "b"])
+    assert _esperar(lambda: spool.guardados)
+    lote.desligar()
+
+    wal = LogAntecipado(str(diretorio))
+    assert wal.pendentes_recuperados == ["a", "b"]
+    wal.fechar()
+
+
+def test_itens_recuperados_do_wal_sao_publicados_e_confirmados(diretorio):
+    wal = LogAntecipado(str(diretorio))
+    wal.aguardar(wal.anexar(["a", "b", "c"])[2])
+    wal.fechar()
+
+    fila = FilaFalsa(ack=True)
+    wal = LogAntecipado(str(diretorio))
+    lote = EnviadorLote(fila, 2, 0.01, SpoolFalso(), wal=wal)
+
+    assert _esperar(lambda: wal.confirmado_ate == 3)
+    lote.desligar()
+    assert [item for p in fila.publicados for item in p["dataPoints"]] == ["a", "b", "c"]
+    wal = LogAntecipado(str(diretorio))
+    assert wal.pendentes_recuperados == []
+    wal.fechar()
+
+
+def test_buffer_grande_sai_em_lotes_de_tamanho_max():
+    fila = FilaFalsa(ack=True)
+    lote = EnviadorLote(fila, 100, 3600, SpoolFalso())
+    lote.adicionar_varios(range(250))
+    lote.enviar()
+
+    assert [len(p["dataPoints"]) for p in fila.publicados] == [100, 100, 50]
+    assert not lote.buffer
+    lote.desligar()
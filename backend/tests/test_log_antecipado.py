@@ -0,0 +1,98 @@
+import pytest
+
+from log_antecipado import LogAntecipado
+
+
+def _anexar(wal, itens):
+    primeira, ultima, ticket = wal.anexar(itens)
+    wal.aguardar(ticket)
+    return primeira, ultima
+
+
+def _reabrir(diretorio, **kwargs):
+    wal = LogAntecipado(str(diretorio), **kwargs)
+    return wal, wal.pendentes_recuperados
+
+
+@pytest.fixture
+def diretorio(tmp_path):
+    return tmp_path / 'wal'
+
+
+def test_devolve_so_o_que_nao_foi_confirmado(diretorio):
+    wal = LogAntecipado(str(diretorio))
+    primeira, _ = _anexar(wal, ["a", "b", "c"])
+    wal.confirmar(primeira, primeira)
+    wal.fechar()
+
+    wal, pendentes = _reabrir(diretorio)
+    assert pendentes == ["b", "c"]
+    assert wal.primeira_pendente == primeira + 1
+    wal.fechar()
+
+
+def test_confirmacoes_fora_de_ordem(diretorio):
+    wal = LogAntecipado(str(diretorio))
+    _anexar(wal, ["a"])
+    _anexar(wal, ["b"])
+    _anexar(wal, ["c"])
+    wal.confirmar(3, 3)
+    assert wal.confirmado_ate == 0
+    wal.confirmar(1, 2)
+    assert wal.confirmado_ate == 3
+    wal.fechar()
+
+    wal, pendentes = _reabrir(diretorio)
+    assert pendentes == []
+    assert wal.primeira_pendente == 4
+    wal.fechar()
+
+
+def test_registro_incompleto_no_fim_e_descartado(diretorio):
+    wal = LogAntecipado(str(diretorio))
+    _anexar(wal, ["a", "b"])
+    wal.fechar()
+    segmento = max(diretorio.glob('segmento_*.log'))
+    tamanho = segmento.stat().st_size
+    with open(segmento, 'ab') as f:
+        f.write(b'{"seq": 3, "it')
+
+    wal, pendentes = _reabrir(diretorio)
+    assert pendentes == ["a", "b"]
+    assert segmento.stat().st_size == tamanho
+    # A sequência continua de onde o último registro inteiro parou
+    assert _anexar(wal, ["c"]) == (3, 3)
+    wal.fechar()
+
+
+def test_arquivo_confirmado_atrasado_nao_trava_o_cursor(diretorio):
+    # Um segmento por anexação: confirmar a primeira apaga o segmento dela
+    wal = LogAntecipado(str(diretorio), tamanho_segmento=1)
+    _anexar(wal, ["a"])
+    _anexar(wal, ["b"])
+    wal.confirmar(1, 1)
+    wal.fechar()
+    # Simula o `confirmado` de antes da confirmação (ex.: perdido numa queda)
+    (diretorio / 'confirmado').write_text('')
+
+    wal, pendentes = _reabrir(diretorio, tamanho_segmento=1)
+    assert pendentes == ["b"]
+    assert wal.primeira_pendente == 2
+    wal.confirmar(2, 2)
+    assert wal.confirmado_ate == 2
+    wal.fechar()
+
+    wal, pendentes = _reabrir(diretorio, tamanho_segmento=1)
+    assert pendentes == []
+    wal.fechar()
+
+
+def test_segmentos_confirmados_sao_apagados(diretorio):
+    wal = LogAntecipado(str(diretorio), tamanho_segmento=1)
+    for item in ["a", "b", "c"]:
+        _anexar(wal, [item])
+    wal.confirmar(1, 3)
+
+    assert len(wal.segmentos) == 1
+    assert (diretorio / 'confirmado').read_text() == '3'
+    wal.fechar()
@@ -0,0 +1,101 @@
+import pytest
+
+from registro_votantes import RegistroVotantes
+
+
+def _abrir(diretorio, **kwargs):
+    return RegistroVotantes(str(diretorio), num_fragmentos=4, capacidade_filtro=1000, **kwargs)
+
+
+@pytest.fixture
+def diretorio(tmp_path):
+    return tmp_path / 'votantes'
+
+
+@pytest.fixture
+def registro(diretorio):
+    registro = _abrir(diretorio)
+    yield registro
+    registro.fechar()
+
+
+def test_cpf_so_vota_uma_vez(registro):
+    assert registro.registrar("11111111111")
+    assert not registro.registrar("11111111111")
+    assert registro.contem("11111111111")
+    assert not registro.contem("22222222222")
+
+
+def test_registrar_varios_marca_repetidos_da_propria_lista(registro):
+    registro.registrar("11111111111")
+    resultado = registro.registrar_varios(["11111111111", "22222222222", "22222222222", "33333333333"])
+
+    assert resultado == [False, True, False, True]
+    assert len(registro) == 3
+
+
+def test_registros_voltam_na_proxima_partida(diretorio):
+    registro = _abrir(diretorio)
+    registro.registrar("11111111111")
+    registro.registrar_varios(["22222222222", "33333333333"])
+    registro.fechar()
+
+    registro = _abrir(diretorio)
+    assert len(registro) == 3
+    assert all(registro.contem(cpf) for cpf in ["11111111111", "22222222222", "33333333333"])
+    assert not registro.contem("44444444444")
+    registro.fechar()
+
+
+def test_compactacao_preserva_os_cpfs(diretorio):
+    registro = _abrir(diretorio, limite_compactacao=5)
+    cpfs = [f"{i:011d}" for i in range(12)]
+    registro.registrar_varios(cpfs[:6])
+    registro.compactar()
+    registro.registrar_varios(cpfs[6:])
+    registro.fechar()
+
+    registro = _abrir(diretorio, limite_compactacao=5)
+    assert len(registro) == len(cpfs)
+    assert all(registro.contem(cpf) for cpf in cpfs)
+    registro.fechar()
+
+
+def test_registrar_desfaz_o_cpf_se_o_fsync_falhar(registro, fsync_falho):
+    fsync_falho.ativo = True
+    with pytest.raises(OSError):
+        registro.registrar("11111111111")
+    fsync_falho.ativo = False
+
+    # O eleitor pode tentar de novo: o filtro de Bloom ainda tem os bits, o armazenamento exato não
+    assert not registro.contem("11111111111")
+    assert registro.registrar("11111111111")
+    assert registro.contem("11111111111")
+
+
+def test_registrar_varios_desfaz_so_os_novos_se_o_fsync_falhar(registro, fsync_falho):
+    registro.registrar("11111111111")
+    fsync_falho.ativo = True
+    with pytest.raises(OSError):
+        registro.registrar_varios(["11111111111", "22222222222", "33333333333"])
+    fsync_falho.ativo = False
+
+    assert registro.contem("11111111111")
+    assert not registro.contem("22222222222")
+    assert not registro.contem("33333333333")
+    assert registro.registrar_varios(["22222222222", "33333333333"]) == [True, True]
+
+
+def test_cpf_desfeito_e_registrado_de_novo_sobrevive_a_reinicio(diretorio, fsync_falho):
+    registro = _abrir(diretorio)
+    fsync_falho.ativo = True
+    with pytest.raises(OSError):
+        registro.registrar("11111111111")
+    fsync_falho.ativo = False
+    assert registro.registrar("11111111111")
+    registro.fechar()
+
+    registro = _abrir(diretorio)
+    assert len(registro) == 1
+    assert not registro.registrar("11111111111")
+    registro.fechar()
@@ -0,0 +1,105 @@
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from spool_reenvio import SpoolReenvio, QUARENTENA
+
+
+class FilaFalsa:
+    """Publicador que responde na hora com `ack`; desconectado, o spool não tenta reenviar."""
+
+    def __init__(self, conectado=False, ack=True):
+        self.conectado = conectado
+        self.ack = ack
+        self.publicados = []
+
+    def publicar(self, pacote):
+        self.publicados.append(pacote)
+        futuro = Future()
+        futuro.set_result(self.ack)
+        return futuro
+
+
+def _esperar(condicao, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while not condicao():
+        if time.monotonic() > limite:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def diretorio(tmp_path):
+    return tmp_path / 'spool'
+
+
+def test_lote_guardado_volta_na_proxima_partida(diretorio):
+    spool = SpoolReenvio(str(diretorio), FilaFalsa())
+    assert spool.guardar({"batchId": "BATCH_1", "dataPoints": [1, 2]})
+    assert spool.guardar({"batchId": "BATCH_1", "dataPoints": [1, 2]})  # repetido não duplica
+    bytes_guardados = spool.bytes
+    spool.parar()
+
+    assert [p.name for p in diretorio.iterdir()] == ['BATCH_1.0.lote']
+    spool = SpoolReenvio(str(diretorio), FilaFalsa())
+    assert list(spool.indice) == ['BATCH_1']
+    assert spool.bytes == bytes_guardados
+    spool.parar()
+
+
+def test_arquivos_fora_do_padrao_vao_para_quarentena(diretorio):
+    diretorio.mkdir()
+    (diretorio / 'BATCH_2.0.lote').write_text('{"batchId": "BATCH_2"}')
+    (diretorio / 'sem_tentativas.lote').write_text('{}')
+    (diretorio / 'BATCH_3.x.lote').write_text('{}')
+    (diretorio / 'BATCH_4.0.lote.tmp').write_text('{}')
+
+    spool = SpoolReenvio(str(diretorio), FilaFalsa())
+    spool.parar()
+
+    assert list(spool.indice) == ['BATCH_2']
+    assert sorted(p.name for p in diretorio.iterdir()) == [
+        'BATCH_2.0.lote',
+        'BATCH_3.x.lote' + QUARENTENA,
+        'sem_tentativas.lote' + QUARENTENA,
+    ]
+
+
+def test_guardar_com_fsync_falhando_devolve_false(diretorio, fsync_falho):
+    spool = SpoolReenvio(str(diretorio), FilaFalsa())
+    fsync_falho.ativo = True
+    assert not spool.guardar({"batchId": "BATCH_5", "dataPoints": [1]})
+    fsync_falho.ativo = False
+    spool.parar()
+
+    assert spool.indice == {}
+    assert not list(diretorio.glob('*.lote'))
+    # A sobra da escrita interrompida some na próxima partida
+    spool = SpoolReenvio(str(diretorio), FilaFalsa())
+    spool.parar()
+    assert not list(diretorio.iterdir())
+
+
+def test_lote_confirmado_sai_do_spool(diretorio):
+    fila = FilaFalsa(conectado=True)
+    spool = SpoolReenvio(str(diretorio), fila)
+    spool.guardar({"batchId": "BATCH_6", "dataPoints": [1]})
+
+    assert _esperar(lambda: not spool.indice)
+    spool.parar()
+    assert fila.publicados == [{"batchId": "BATCH_6", "dataPoints": [1]}]
+    assert spool.bytes == 0
+    assert not list(diretorio.iterdir())
+
+
+def test_lote_rejeitado_fica_com_a_tentativa_no_nome(diretorio):
+    fila = FilaFalsa(conectado=True, ack=False)
+    spool = SpoolReenvio(str(diretorio), fila, backoff_base=60.0)
+    spool.guardar({"batchId": "BATCH_7", "dataPoints": [1]})
+
+    assert _esperar(lambda: spool.indice["BATCH_7"].tentativas == 1)
+    spool.parar()
+    assert spool.falhas == 1
+    assert [p.name for p in diretorio.iterdir()] == ['BATCH_7.1.lote']
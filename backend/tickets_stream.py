@@ -0,0 +1,77 @@
+import time
+import secrets
+import threading
+from collections import OrderedDict
+
+
+class EmissorTickets:
+    """
+    Tickets curtos e de uso único para abrir /resultados/stream.
+
+    O EventSource não envia headers, então a credencial do stream vai na URL,
+    e URLs acabam em logs de acesso e no histórico do navegador. Em vez do JWT
+    (que vale por horas e abre todas as rotas), o cliente troca o JWT por um
+    ticket opaco em uma rota autenticada por header e usa o ticket na URL: ele
+    vale só para o stream, por `validade` segundos e uma única vez.
+
+    Os tickets ficam só em memória: quem reinicia o servidor só perde tickets
+    que ainda não foram usados, e o cliente pede outro. Só os `max_tickets`
+    emitidos mais recentemente são guardados.
+    """
+
+    def __init__(self, validade=30.0, max_tickets=10_000):
+        """
+        Args:
+            validade (float): Segundos entre a emissão e o último uso aceito
+            max_tickets (int): Tickets não usados guardados ao mesmo tempo
+        """
+        self.validade = validade
+        self.max_tickets = max_tickets
+        self.tickets = OrderedDict()  # ticket -> (identidade, expira_em)
+        self.lock = threading.Lock()
+        self.emitidos = 0
+        self.resgatados = 0
+        self.recusados = 0
+
+    def emitir(self, identidade):
+        """Cria um ticket para `identidade` e devolve o valor opaco."""
+        ticket = secrets.token_urlsafe(24)
+        agora = time.monotonic()
+        with self.lock:
+            self._limpar(agora)
+            self.tickets[ticket] = (identidade, agora + self.validade)
+            if len(self.tickets) > self.max_tickets:
+                self.tickets.popitem(last=False)
+            self.emitidos += 1
+        return ticket
+
+    def resgatar(self, ticket):
+        """
+        Consome o ticket.
+
+        Returns:
+            A identidade de quem pediu o ticket, ou None se ele não existe, já foi usado ou venceu
+        """
+        with self.lock:
+            identidade, expira_em = self.tickets.pop(ticket, (None, 0.0))
+            if identidade is None or time.monotonic() > expira_em:
+                self.recusados += 1
+                return None
+            self.resgatados += 1
+            return identidade
+
+    def _limpar(self, agora):
+        """Com o lock: descarta os vencidos do início (a ordem de emissão é a de vencimento)."""
+        while self.tickets:
+            _, expira_em = next(iter(self.tickets.values()))
+            if expira_em > agora:
+                return
+            self.tickets.popitem(last=False)
+
+    def metricas(self):
+        return {
+            "pendentes": len(self.tickets),
+            "emitidos": self.emitidos,
+            "resgatados": self.resgatados,
+            "recusados": self.recusados,
+        }
@@ -0,0 +1,138 @@
+import json
+import time
+import threading
+
+
+class LimiteConexoesAtingido(Exception):
+    pass
+
+
+class _Conexao:
+    """Iterável da resposta SSE; `close` (chamado pelo servidor WSGI) libera a vaga uma única vez."""
+
+    def __init__(self, transmissor, eventos):
+        self.transmissor = transmissor
+        self.eventos = eventos
+        self.aberta = True
+
+    def __iter__(self):
+        return self.eventos
+
+    def close(self):
+        self.eventos.close()
+        with self.transmissor.condicao:
+            if self.aberta:
+                self.aberta = False
+                self.transmissor.conexoes -= 1
+
+
+class TransmissorResultados:
+    """
+    Distribui os resultados para os clientes conectados via Server-Sent Events.
+
+    Cada mudança é serializada uma única vez, em dois eventos prontos: o
+    completo (`resultados`, com todo o snapshot) e o delta (`delta`, só com as
+    eleições que mudaram). Os clientes não têm fila própria: todos esperam na
+    mesma Condition e, ao acordar, quem estava na versão anterior recebe o
+    delta e quem ficou para trás (ou acabou de conectar) recebe o completo. O
+    `id` de cada evento é o ETag do snapshot, então uma reconexão com
+    Last-Event-ID igual ao atual não reenvia nada.
+
+    Cada conexão ocupa uma thread do servidor enquanto está aberta; por isso o
+    número de conexões é limitado e cada uma dura no máximo `duracao_max`
+    segundos (o EventSource reconecta sozinho).
+    """
+
+    def __init__(self, snapshot_inicial, max_conexoes=32, duracao_max=300, intervalo_keepalive=15):
+        """
+        Args:
+            snapshot_inicial: Snapshot enviado enquanto não houver resultados
+            max_conexoes (int): Conexões simultâneas aceitas
+            duracao_max (float): Segundos até encerrar uma conexão (o cliente reconecta)
+            intervalo_keepalive (float): Segundos sem eventos até mandar um comentário de keepalive
+        """
+        self.max_conexoes = max_conexoes
+        self.duracao_max = duracao_max
+        self.intervalo_keepalive = intervalo_keepalive
+        self.condicao = threading.Condition()
+        self.conexoes = 0
+        self.eventos_enviados = 0
+        self.versao = 0
+        self.snapshot = None
+        self.evento_completo = b''
+        self.evento_delta = b''
+        self.ouvintes = []
+        self.publicar(snapshot_inicial)
+
+    @staticmethod
+    def _evento(nome, etag, dados_json):
+        return f"id: {etag}\nevent: {nome}\ndata: ".encode() + dados_json + b"\n\n"
+
+    def publicar(self, snapshot):
+        """Registra um novo snapshot e acorda todos os clientes."""
+        with self.condicao:
+            if self.snapshot is not None and self.snapshot.etag == snapshot.etag:
+                return
+            anterior = self.snapshot.dados if self.snapshot is not None else {}
+            delta = {chave: valor for chave, valor in snapshot.dados.items() if anterior.get(chave) != valor}
+            self.evento_completo = self._evento("resultados", snapshot.etag, snapshot.corpo)
+            self.evento_delta = self._evento("delta", snapshot.etag, json.dumps(delta).encode())
+            self.snapshot = snapshot
+            self.versao += 1
+            self.condicao.notify_all()
+        for ouvinte in self.ouvintes:
+            ouvinte()
+
+    def adicionar_ouvinte(self, ouvinte):
+        """Registra uma função sem argumentos chamada a cada nova versão (ex.: para acordar um event loop)."""
+        self.ouvintes.append(ouvinte)
+
+    def primeiro_evento(self, ultimo_id):
+        """Com a condicao adquirida: (versão atual, evento completo ou None se o cliente já tem essa versão)."""
+        return self.versao, (self.evento_completo if self.snapshot.etag != ultimo_id else None)
+
+    def proximo_evento(self, versao):
+        """Com a condicao adquirida: (evento para quem está em `versao`, nova versão); keepalive se nada mudou."""
+        if self.versao == versao:
+            return b": keepalive\n\n", versao
+        if self.versao == versao + 1:
+            return self.evento_delta, self.versao
+        return self.evento_completo, self.versao
+
+    def assinar(self, ultimo_id=None):
+        """
+        Reserva uma conexão e devolve o iterável de eventos SSE (com `close`).
+
+        Raises:
+            LimiteConexoesAtingido: Se já houver `max_conexoes` clientes
+        """
+        with self.condicao:
+            if self.conexoes >= self.max_conexoes:
+                raise LimiteConexoesAtingido(f"Limite de {self.max_conexoes} conexões de resultados atingido")
+            self.conexoes += 1
+        return _Conexao(self, self._eventos(ultimo_id))
+
+    def _eventos(self, ultimo_id):
+        fim = time.monotonic() + self.duracao_max
+        yield b"retry: 3000\n\n"
+        with self.condicao:
+            versao, evento = self.primeiro_evento(ultimo_id)
+        while True:
+            if evento:
+                self.eventos_enviados += 1
+                yield evento
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                return
+            with self.condicao:
+                if self.versao == versao:
+                    self.condicao.wait(min(self.intervalo_keepalive, restante))
+                evento, versao = self.proximo_evento(versao)
+
+    def metricas(self):
+        return {
+            "conexoes": self.conexoes,
+            "max_conexoes": self.max_conexoes,
+            "versao": self.versao,
+            "eventos_enviados": self.eventos_enviados
+        }
@@ -63,6 +63,7 @@ export class ResultsComponent implements OnInit, OnDestroy {
   loading = true;
   error: string | null = null;
   private pollingSubscription: any;
+  private streamSubscription: any;
   private readonly POLLING_INTERVAL = 3000;  // 3 segundos
 
   protected readonly Object = Object;
@@ -70,13 +71,38 @@ export class ResultsComponent implements OnInit, OnDestroy {
   constructor(private apiService: ApiService, private router: Router) {}
 
   ngOnInit() {
-    this.startPolling();
+    this.startStream();
   }
 
   ngOnDestroy() {
+    this.stopStream();
     this.stopPolling();
   }
 
+  // Resultados ao vivo pelo backend (uma conexão, atualizações empurradas);
+  // se o stream não estiver disponível, volta ao polling
+  private startStream() {
+    this.streamSubscription = this.apiService.streamResults().subscribe({
+      next: (results) => {
+        this.electionResults = results;
+        this.loading = false;
+        this.error = null;
+      },
+      error: (err) => {
+        console.warn('Resultados ao vivo indisponíveis, usando polling:', err);
+        this.streamSubscription = null;
+        this.startPolling();
+      }
+    });
+  }
+
+  private stopStream() {
+    if (this.streamSubscription) {
+      this.streamSubscription.unsubscribe();
+      this.streamSubscription = null;
+    }
+  }
+
   private startPolling() {
     // Primeira requisição imediata
     this.fetchResults();
@@ -1,6 +1,6 @@
 import { HttpClient, HttpHeaders } from '@angular/common/http';
 import { Injectable } from '@angular/core';
-import { Observable, tap } from 'rxjs';
+import { Observable, Subscription, tap } from 'rxjs';
 import { environment } from '../../environments/environment';
 
 interface Candidate {
@@ -69,6 +69,11 @@ interface Results {
   eleicaoativa: boolean;
 }
 
+interface StreamTicket {
+  ticket: string;
+  validade_s: number;
+}
+
 interface CreateElection {
   message: string;
 }
@@ -79,6 +84,9 @@ interface CreateElection {
 export class ApiService {
   private apiUrl = environment.apiUrl;
   private endpoints = environment.endpoints;
+  // Reconexões seguidas sem abrir o stream antes de desistir e voltar ao polling
+  private readonly STREAM_FALHAS_MAX = 3;
+  private readonly STREAM_RECONEXAO_MS = 3000;
 
   constructor(private http: HttpClient) {}
 
@@ -132,6 +140,83 @@ export class ApiService {
     });
   }
 
+  // Resultados ao vivo via Server-Sent Events. O EventSource não envia headers,
+  // então cada conexão abre com um ticket de uso único (POST no endpoint de
+  // ticket, autenticado pelo header) em vez do token na URL. O ticket não serve
+  // para a reconexão automática do EventSource: ao cair, a conexão é fechada e
+  // reaberta aqui com um ticket novo. Eventos 'delta' trazem só as eleições que mudaram.
+  // Emite erro se o navegador não suporta SSE, se o ticket for negado ou se o
+  // stream não abrir STREAM_FALHAS_MAX vezes seguidas (ex.: limite de conexões
+  // do backend); quem assina deve voltar ao polling.
+  streamResults(): Observable<Results> {
+    return new Observable<Results>(subscriber => {
+      if (typeof EventSource === 'undefined') {
+        subscriber.error(new Error('EventSource indisponível'));
+        return;
+      }
+      let source: EventSource | null = null;
+      let pedidoTicket: Subscription | null = null;
+      let espera: ReturnType<typeof setTimeout> | null = null;
+      let atual: Results | null = null;
+      let ultimoId = '';
+      let falhas = 0;
+
+      const abrir = (ticket: string) => {
+        const params = new URLSearchParams({ ticket });
+        if (ultimoId) {
+          // Uma reconexão manual não manda Last-Event-ID; sem mudança, o backend não reenvia tudo
+          params.set('ultimo_id', ultimoId);
+        }
+        source = new EventSource(`${this.apiUrl}${this.endpoints.resultadosStream}?${params}`);
+        source.onopen = () => {
+          falhas = 0;
+        };
+        source.addEventListener('resultados', (event: MessageEvent) => {
+          ultimoId = event.lastEventId;
+          atual = JSON.parse(event.data);
+          subscriber.next(atual!);
+        });
+        source.addEventListener('delta', (event: MessageEvent) => {
+          if (!atual) {
+            return;
+          }
+          ultimoId = event.lastEventId;
+          atual = { ...atual, ...JSON.parse(event.data) };
+          subscriber.next(atual!);
+        });
+        source.onerror = () => {
+          source?.close();
+          source = null;
+          falhas += 1;
+          if (falhas >= this.STREAM_FALHAS_MAX) {
+            subscriber.error(new Error('Conexão de resultados ao vivo encerrada'));
+            return;
+          }
+          espera = setTimeout(conectar, this.STREAM_RECONEXAO_MS);
+        };
+      };
+
+      const conectar = () => {
+        pedidoTicket = this.http.post<StreamTicket>(`${this.apiUrl}${this.endpoints.resultadosStreamTicket}`, {}, {
+          headers: this.getAuthHeaders()
+        }).subscribe({
+          next: (resposta) => abrir(resposta.ticket),
+          error: (err) => subscriber.error(err)
+        });
+      };
+
+      conectar();
+
+      return () => {
+        pedidoTicket?.unsubscribe();
+        if (espera) {
+          clearTimeout(espera);
+        }
+        source?.close();
+      };
+    });
+  }
+
   // Listar candidatos
   getCandidates(): Observable<Candidate[]> {
     console.log('Frontend: Fazendo requisição GET para /candidatos');
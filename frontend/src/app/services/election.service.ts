@@ -9,7 +9,7 @@ import { environment } from '../../environments/environment';
   providedIn: 'root'
 })
 export class ElectionService {
-  private readonly API_URL = 'http://localhost:5001/electionalternative';
+  private readonly API_URL = `${environment.apiUrl}/electionalternative`;
 
   constructor(private http: HttpClient) {}
 
@@ -5,6 +5,8 @@ export const environment = {
   endpoints: {
     votar: '/votar',
     resultados: '/resultados',
+    resultadosStream: '/resultados/stream',
+    resultadosStreamTicket: '/resultados/stream/ticket',
     candidatos: '/candidatos',
     cadastrar: '/cadastrar',
     electionalternative: '/electionalternative'